@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多云节点聚合立方体
+一次扫描所有供应商的规范化节点（见 node_schema.py），按 供应商 × 国家 × 大洲 × 启用年份 × 状态
+汇总节点数、可用区数以及延迟/可用性的和与计数，输出为一个紧凑的 JSON 产物。
+页面和分析脚本读取该产物后，筛选供应商只需对单元格切片求和，无需重新扫描节点。
+
+用法:
+    python scripts/aggregate_cube.py [--output data/aggregate-cube.json]
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+from node_dataset import PROJECT_ROOT, load_merged_nodes, source_fingerprint
+
+DEFAULT_OUTPUT = PROJECT_ROOT / 'data' / 'aggregate-cube.json'
+
+# 国家 -> 大洲
+CONTINENT_MAPPING = {
+    '中国': '亚洲',
+    '中国台湾': '亚洲',
+    '新加坡': '亚洲',
+    '马来西亚': '亚洲',
+    '印度尼西亚': '亚洲',
+    '菲律宾': '亚洲',
+    '泰国': '亚洲',
+    '日本': '亚洲',
+    '韩国': '亚洲',
+    '印度': '亚洲',
+    '阿联酋': '亚洲',
+    '沙特阿拉伯': '亚洲',
+    '以色列': '亚洲',
+    '巴林': '亚洲',
+    '卡塔尔': '亚洲',
+    '美国': '北美洲',
+    '加拿大': '北美洲',
+    '墨西哥': '北美洲',
+    '巴西': '南美洲',
+    '阿根廷': '南美洲',
+    '智利': '南美洲',
+    '哥伦比亚': '南美洲',
+    '德国': '欧洲',
+    '英国': '欧洲',
+    '法国': '欧洲',
+    '爱尔兰': '欧洲',
+    '瑞典': '欧洲',
+    '荷兰': '欧洲',
+    '瑞士': '欧洲',
+    '意大利': '欧洲',
+    '西班牙': '欧洲',
+    '波兰': '欧洲',
+    '比利时': '欧洲',
+    '挪威': '欧洲',
+    '芬兰': '欧洲',
+    '奥地利': '欧洲',
+    '俄罗斯': '欧洲',
+    '澳大利亚': '大洋洲',
+    '新西兰': '大洋洲',
+    '南非': '非洲',
+    '尼日利亚': '非洲'
+}
+
+DIMENSIONS = ('provider', 'country', 'continent', 'year', 'status')
+MEASURES = ('nodes', 'az_sum', 'latency_sum', 'latency_count', 'uptime_sum', 'uptime_count')
+FIELDS = DIMENSIONS + MEASURES
+
+
+def continent_of(country):
+    """国家所属大洲，未收录的国家归为“其他”"""
+    return CONTINENT_MAPPING.get(country, '其他')
+
+
+def build_cube(nodes, providers=None, source_hash=None):
+    """一次扫描节点列表，构建聚合立方体；source_hash 标识生成该立方体的源数据版本"""
+    values = {dim: {} for dim in DIMENSIONS}
+    if providers:
+        for provider in providers:
+            values['provider'].setdefault(provider, len(values['provider']))
+
+    def code(dim, value):
+        return values[dim].setdefault(value, len(values[dim]))
+
+    cells = {}
+    for node in nodes:
+        country = node['location']['country']
+        key = (
+            code('provider', node['provider']),
+            code('country', country),
+            code('continent', continent_of(country)),
+            code('year', node['launch_year']),
+            code('status', node['status']),
+        )
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0, 0, 0.0, 0, 0.0, 0]
+
+        cell[0] += 1
+        cell[1] += node['availability_zones']
+        network = node['network_info']
+        if network['latency'] is not None:
+            cell[2] += network['latency']
+            cell[3] += 1
+        if network['uptime'] is not None:
+            cell[4] += network['uptime']
+            cell[5] += 1
+
+    cube = {
+        'schema': 1,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'dimensions': {dim: list(mapping) for dim, mapping in values.items()},
+        'fields': list(FIELDS),
+        'cells': [list(key) + [round(v, 4) if isinstance(v, float) else v for v in measures]
+                  for key, measures in sorted(cells.items())],
+    }
+    cube['source_hash'] = source_hash or hashlib.sha1(json.dumps(cube['cells']).encode('utf-8')).hexdigest()[:16]
+    return cube
+
+
+def iter_cells(cube, **filters):
+    """遍历立方体单元格（维度已解码），filters 为 维度名=取值集合"""
+    dims = cube['dimensions']
+    allowed = {dim: set(values) for dim, values in filters.items() if values is not None}
+    for cell in cube['cells']:
+        row = {dim: dims[dim][cell[i]] for i, dim in enumerate(DIMENSIONS)}
+        if all(row[dim] in values for dim, values in allowed.items()):
+            row.update(zip(MEASURES, cell[len(DIMENSIONS):]))
+            yield row
+
+
+def rollup(cube, by, **filters):
+    """按 by 中的维度汇总度量，返回 {维度取值元组: {度量: 和}}"""
+    result = {}
+    for row in iter_cells(cube, **filters):
+        key = tuple(row[dim] for dim in by)
+        totals = result.get(key)
+        if totals is None:
+            totals = result[key] = dict.fromkeys(MEASURES, 0)
+        for measure in MEASURES:
+            totals[measure] += row[measure]
+    return result
+
+
+def distinct_count(cube, by, of, **filters):
+    """统计每个 by 取值下 of 维度的不同取值个数（如各供应商覆盖的国家数）"""
+    seen = {}
+    for row in iter_cells(cube, **filters):
+        seen.setdefault(row[by], set()).add(row[of])
+    return {key: len(values) for key, values in seen.items()}
+
+
+def load_cube(path=DEFAULT_OUTPUT):
+    """读取聚合立方体产物"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cube(cube, path=DEFAULT_OUTPUT):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cube, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_from_sources(root=PROJECT_ROOT):
+    """扫描所有供应商数据文件构建立方体"""
+    providers, nodes = load_merged_nodes(root)
+    return build_cube(nodes, providers, source_hash=source_fingerprint(root))
+
+
+def load_or_build_cube(path=DEFAULT_OUTPUT, root=PROJECT_ROOT):
+    """读取立方体产物；产物缺失或与源数据不一致时重新构建并写回"""
+    fingerprint = source_fingerprint(root)
+    try:
+        cube = load_cube(path)
+        if cube.get('source_hash') == fingerprint:
+            return cube
+    except (OSError, ValueError):
+        pass
+
+    cube = build_from_sources(root)
+    save_cube(cube, path)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成多云节点聚合立方体')
+    parser.add_argument('--output', '-o', type=Path, default=DEFAULT_OUTPUT, help='输出文件路径')
+    args = parser.parse_args()
+
+    print("正在扫描所有供应商节点数据并构建聚合立方体...")
+    cube = build_from_sources()
+    save_cube(cube, args.output)
+
+    total_nodes = sum(cell[len(DIMENSIONS)] for cell in cube['cells'])
+    print(f"聚合立方体已生成: {args.output}（{total_nodes} 个节点 -> {len(cube['cells'])} 个单元格）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,182 +1,396 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-阿里云全球节点数据分析脚本
+云服务商全球节点数据分析脚本
 生成各种统计信息和可视化数据
+
+最初只分析阿里云，现支持供应商注册表（provider_registry.py）中的任意供应商，只加载指定的供应商：
+所有供应商的规范化节点（见 node_schema.py）一次性载入同一张列式表（pandas），
+按供应商分组后以向量化的分组汇总生成总览、时间线和地理分布统计，并为每个供应商输出
+docs/<provider_id>_*.json 与 docs/<provider_id>_*.md。
+
+数据文件很大时可以使用 --stream：逐条流式解析节点（见 node_stream.py），由 StreamingReports
+单次遍历累加出相同的报告，逐节点的地图数据与年度节点列表暂存在临时文件中，内存占用与节点数无关。
+
+用法:
+    python scripts/alibaba_cloud_analysis.py                      # 所有供应商
+    python scripts/alibaba_cloud_analysis.py --providers alibaba_cloud,aws
+    python scripts/alibaba_cloud_analysis.py --snapshot 10           # 历史快照（见 snapshot_db.py）
+    python scripts/alibaba_cloud_analysis.py --stream                # 流式解析，恒定内存
 """
 
-import json
+import argparse
+from pathlib import Path
+
 import pandas as pd
-from datetime import datetime
-from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib import rcParams
-import seaborn as sns
-import numpy as np
-
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
-
-def load_data():
-    """加载阿里云节点数据"""
-    with open('data/alibaba-cloud/nodes.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
 
-def create_overview_report(data):
-    """创建总览报告"""
-    nodes = data['nodes']
-    
-    # 基础统计
-    total_nodes = len(nodes)
-    total_availability_zones = sum(node['availability_zones'] for node in nodes)
-    
-    # 按国家统计
-    countries = Counter(node['location']['country'] for node in nodes)
-    
-    # 按地区统计
-    regions = Counter(node['location']['region'] for node in nodes)
-    
-    # 按年份统计
-    years = Counter()
-    for node in nodes:
-        year = datetime.fromisoformat(node['launch_date'].replace('Z', '+00:00')).year
-        years[year] += 1
-    
-    # 生成地图数据
-    map_data = []
+from aggregate_cube import continent_of, load_or_build_cube, rollup
+from instrumentation import add_argument as add_profile_argument, configure as configure_profiling, stage
+from node_stream import RecordSpool, dump_json, iter_normalized
+from provider_registry import PROJECT_ROOT, ProviderRegistry
+from snapshot_db import DEFAULT_PATH as SNAPSHOT_DB_PATH, SnapshotDB
+
+DEFAULT_PROVIDER = 'alibaba_cloud'
+DOCS_DIR = PROJECT_ROOT / 'docs'
+# 供应商注册表：只加载本次分析涉及的供应商
+REGISTRY = ProviderRegistry()
+
+TABLE_COLUMNS = ['provider', 'name', 'country', 'region', 'city', 'lat', 'lng',
+                 'availability_zones', 'launch_date', 'year']
+
+
+def load_data(provider_id=DEFAULT_PROVIDER, registry=None, stream=False):
+    """加载单个供应商的规范化节点数据（默认阿里云）
+    stream=True 时 nodes 为逐条解析的迭代器（不经过规范化缓存，只能遍历一次）"""
+    registry = registry or REGISTRY
+    if stream:
+        return {'provider': provider_id, 'nodes': iter_normalized(provider_id, registry.data_path(provider_id))}
+    return {'provider': provider_id, 'nodes': registry.nodes(provider_id)}
+
+
+def nodes_to_table(nodes, provider_id):
+    """把规范化节点列表转换为列式表"""
+    rows = {column: [] for column in TABLE_COLUMNS}
     for node in nodes:
-        map_data.append({
-            'name': node['name'],
-            'city': node['location']['city'],
-            'country': node['location']['country'],
-            'lat': node['location']['latitude'],
-            'lng': node['location']['longitude'],
-            'availability_zones': node['availability_zones'],
-            'launch_date': node['launch_date'],
-            'year': datetime.fromisoformat(node['launch_date'].replace('Z', '+00:00')).year
-        })
-    
+        location = node['location']
+        rows['provider'].append(provider_id)
+        rows['name'].append(node['name'])
+        rows['country'].append(location['country'])
+        rows['region'].append(location['region'])
+        rows['city'].append(location['city'])
+        rows['lat'].append(location['latitude'])
+        rows['lng'].append(location['longitude'])
+        rows['availability_zones'].append(node['availability_zones'])
+        rows['launch_date'].append(node['launch_date'])
+        rows['year'].append(node['launch_year'])
+
+    table = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+    table['year'] = table['year'].astype('Int64')
+    return table
+
+
+def load_table(provider_ids=None, registry=None):
+    """加载多个供应商（默认全部）到同一张列式表，每个文件只读取一次"""
+    registry = registry or REGISTRY
+    tables = []
+    for pid in registry.select(provider_ids):
+        with stage('load_data', provider=pid):
+            nodes = load_data(pid, registry)['nodes']
+        with stage('to_table', provider=pid, nodes=len(nodes)):
+            tables.append(nodes_to_table(nodes, pid))
+    return pd.concat(tables, ignore_index=True) if tables else nodes_to_table([], None)
+
+
+def load_history_table(provider_ids=None, registry=None, at=None, db_path=SNAPSHOT_DB_PATH):
+    """从历史快照库（见 snapshot_db.py）加载快照 at（默认最新）时的节点到列式表"""
+    provider_ids = (registry or REGISTRY).select(provider_ids)
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"未找到历史快照库 {db_path}，请先运行 scripts/snapshot_db.py ingest")
+    grouped = {pid: [] for pid in provider_ids}
+    for node in SnapshotDB(db_path).nodes(at=at, provider=provider_ids):
+        grouped[node['provider']].append(node)
+    tables = [nodes_to_table(nodes, pid) for pid, nodes in grouped.items() if nodes]
+    return pd.concat(tables, ignore_index=True) if tables else nodes_to_table([], None)
+
+
+def _provider_table(data):
+    return nodes_to_table(data['nodes'], data.get('provider', DEFAULT_PROVIDER))
+
+
+def _counts(series, key_type=str):
+    """按首次出现顺序计数（与 collections.Counter 的顺序一致）"""
+    return {key_type(key): int(value) for key, value in series.value_counts(sort=False).items()}
+
+
+def _native(value):
+    """把 pandas/NumPy 标量转换为可 JSON 序列化的 Python 值"""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def build_overview(table):
+    """由单个供应商的列式表生成总览报告"""
+    map_data = table[['name', 'city', 'country', 'lat', 'lng', 'availability_zones', 'launch_date', 'year']]
     return {
-        'total_nodes': total_nodes,
-        'total_availability_zones': total_availability_zones,
-        'countries': dict(countries),
-        'regions': dict(regions),
-        'years': dict(years),
-        'map_data': map_data
+        'total_nodes': int(len(table)),
+        'total_availability_zones': int(table['availability_zones'].sum()),
+        'countries': _counts(table['country']),
+        'regions': _counts(table['region']),
+        'years': _counts(table['year'].dropna(), int),
+        'map_data': [
+            {key: _native(value) for key, value in row.items()}
+            for row in map_data.to_dict('records')
+        ]
+    }
+
+
+def build_timeline(table):
+    """由单个供应商的列式表生成时间线分析"""
+    dated = table[table['year'].notna()]
+    yearly = dated.groupby('year', sort=True).agg(
+        new_nodes=('name', 'size'),
+        new_availability_zones=('availability_zones', 'sum'),
+    )
+    yearly['cumulative_nodes'] = yearly['new_nodes'].cumsum()
+    yearly['cumulative_availability_zones'] = yearly['new_availability_zones'].cumsum()
+
+    node_lists = {
+        int(year): group[['name', 'country', 'city', 'availability_zones']].to_dict('records')
+        for year, group in dated.groupby('year', sort=False)
     }
 
-def create_timeline_analysis(data):
-    """创建时间线分析"""
-    nodes = data['nodes']
-    
-    # 按年份统计节点数量
-    yearly_stats = defaultdict(lambda: {'count': 0, 'availability_zones': 0, 'nodes': []})
-    
-    for node in nodes:
-        launch_date = datetime.fromisoformat(node['launch_date'].replace('Z', '+00:00'))
-        year = launch_date.year
-        
-        yearly_stats[year]['count'] += 1
-        yearly_stats[year]['availability_zones'] += node['availability_zones']
-        yearly_stats[year]['nodes'].append({
-            'name': node['name'],
-            'country': node['location']['country'],
-            'city': node['location']['city'],
-            'availability_zones': node['availability_zones']
-        })
-    
-    # 转换为DataFrame用于分析
     timeline_data = []
-    cumulative_nodes = 0
-    cumulative_azs = 0
-    
-    for year in sorted(yearly_stats.keys()):
-        stats = yearly_stats[year]
-        cumulative_nodes += stats['count']
-        cumulative_azs += stats['availability_zones']
-        
+    for year, stats in yearly.iterrows():
         timeline_data.append({
-            'year': year,
-            'new_nodes': stats['count'],
-            'new_availability_zones': stats['availability_zones'],
-            'cumulative_nodes': cumulative_nodes,
-            'cumulative_availability_zones': cumulative_azs,
-            'nodes': stats['nodes']
+            'year': int(year),
+            'new_nodes': int(stats['new_nodes']),
+            'new_availability_zones': int(stats['new_availability_zones']),
+            'cumulative_nodes': int(stats['cumulative_nodes']),
+            'cumulative_availability_zones': int(stats['cumulative_availability_zones']),
+            'nodes': [dict(node, availability_zones=int(node['availability_zones'])) for node in node_lists[int(year)]]
         })
-    
     return timeline_data
 
-def create_geographic_analysis(data):
-    """创建地理分布分析"""
-    nodes = data['nodes']
-    
-    # 按大洲统计
-    continent_mapping = {
-        '中国': '亚洲',
-        '新加坡': '亚洲',
-        '马来西亚': '亚洲',
-        '印度尼西亚': '亚洲',
-        '菲律宾': '亚洲',
-        '泰国': '亚洲',
-        '日本': '亚洲',
-        '韩国': '亚洲',
-        '印度': '亚洲',
-        '美国': '北美洲',
-        '墨西哥': '北美洲',
-        '德国': '欧洲',
-        '英国': '欧洲',
-        '阿联酋': '亚洲',
-        '沙特阿拉伯': '亚洲',
-        '澳大利亚': '大洋洲'
-    }
-    
-    continents = Counter()
-    for node in nodes:
-        country = node['location']['country']
-        continent = continent_mapping.get(country, '其他')
-        continents[continent] += node['availability_zones']
-    
-    return dict(continents)
-
-def generate_reports():
-    """生成所有报告"""
-    print("正在加载阿里云节点数据...")
-    data = load_data()
-    
-    print("正在生成总览报告...")
-    overview = create_overview_report(data)
-    
-    print("正在生成时间线分析...")
-    timeline = create_timeline_analysis(data)
-    
-    print("正在生成地理分布分析...")
-    geographic = create_geographic_analysis(data)
-    
+
+def build_geographic(table):
+    """由单个供应商的列式表按大洲汇总可用区数"""
+    continents = table['country'].map(continent_of)
+    totals = table['availability_zones'].groupby(continents, sort=False).sum()
+    return {continent: int(value) for continent, value in totals.items()}
+
+
+class StreamingReports:
+    """逐条累加节点，生成与 build_overview / build_timeline / build_geographic 相同的报告。
+    计数按首次出现顺序保存在字典中；map_data 与各年份的节点列表写入 RecordSpool（临时文件），
+    内存只随国家、地区、年份的数量增长。报告写出后应调用 close()（或用 with 语句）删除临时文件"""
+
+    def __init__(self):
+        self.total_nodes = 0
+        self.total_availability_zones = 0
+        self.countries = {}
+        self.regions = {}
+        # 年份 -> [新增节点数, 新增可用区数]
+        self.yearly = {}
+        self.continents = {}
+        self.map_data = RecordSpool()
+        self.year_nodes = {}
+
+    def add(self, node):
+        location = node['location']
+        country = location['country']
+        azs = node['availability_zones']
+        year = node['launch_year']
+
+        self.total_nodes += 1
+        self.total_availability_zones += azs
+        self.countries[country] = self.countries.get(country, 0) + 1
+        self.regions[location['region']] = self.regions.get(location['region'], 0) + 1
+        continent = continent_of(country)
+        self.continents[continent] = self.continents.get(continent, 0) + azs
+        self.map_data.append({
+            'name': node['name'], 'city': location['city'], 'country': country,
+            'lat': location['latitude'], 'lng': location['longitude'], 'availability_zones': azs,
+            'launch_date': node['launch_date'], 'year': year,
+        })
+
+        if year is not None:
+            stats = self.yearly.setdefault(year, [0, 0])
+            stats[0] += 1
+            stats[1] += azs
+            if year not in self.year_nodes:
+                self.year_nodes[year] = RecordSpool()
+            self.year_nodes[year].append({'name': node['name'], 'country': country,
+                                          'city': location['city'], 'availability_zones': azs})
+
+    def overview(self):
+        return {
+            'total_nodes': self.total_nodes,
+            'total_availability_zones': self.total_availability_zones,
+            'countries': dict(self.countries),
+            'regions': dict(self.regions),
+            'years': {year: stats[0] for year, stats in self.yearly.items()},
+            'map_data': self.map_data,
+        }
+
+    def timeline(self):
+        timeline_data = []
+        cumulative_nodes = cumulative_azs = 0
+        for year in sorted(self.yearly):
+            new_nodes, new_azs = self.yearly[year]
+            cumulative_nodes += new_nodes
+            cumulative_azs += new_azs
+            timeline_data.append({
+                'year': year,
+                'new_nodes': new_nodes,
+                'new_availability_zones': new_azs,
+                'cumulative_nodes': cumulative_nodes,
+                'cumulative_availability_zones': cumulative_azs,
+                'nodes': self.year_nodes[year],
+            })
+        return timeline_data
+
+    def geographic(self):
+        return dict(self.continents)
+
+    def close(self):
+        self.map_data.close()
+        for spool in self.year_nodes.values():
+            spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def analyze_nodes(nodes):
+    """单次遍历节点（列表或 iter_normalized 等迭代器），返回 StreamingReports；遍历出错时删除临时文件"""
+    reports = StreamingReports()
+    try:
+        for node in nodes:
+            reports.add(node)
+    except BaseException:
+        reports.close()
+        raise
+    return reports
+
+
+def create_overview_report(data):
+    """创建总览报告（data['nodes'] 为迭代器时流式累加，map_data 展开为列表后删除临时文件）"""
+    if not isinstance(data['nodes'], list):
+        with analyze_nodes(data['nodes']) as reports:
+            overview = reports.overview()
+            overview['map_data'] = list(overview['map_data'])
+            return overview
+    return build_overview(_provider_table(data))
+
+
+def create_timeline_analysis(data):
+    """创建时间线分析（data['nodes'] 为迭代器时流式累加，年度节点展开为列表后删除临时文件）"""
+    if not isinstance(data['nodes'], list):
+        with analyze_nodes(data['nodes']) as reports:
+            return [dict(entry, nodes=list(entry['nodes'])) for entry in reports.timeline()]
+    return build_timeline(_provider_table(data))
+
+
+def create_geographic_analysis(data, cube=None):
+    """创建地理分布分析（按大洲汇总可用区数；提供聚合立方体时直接切片）"""
+    if cube is None:
+        if not isinstance(data['nodes'], list):
+            with analyze_nodes(data['nodes']) as reports:
+                return reports.geographic()
+        return build_geographic(_provider_table(data))
+
+    provider = data.get('provider', DEFAULT_PROVIDER)
+    totals = rollup(cube, ('continent',), provider={provider})
+    return {continent: stats['az_sum'] for (continent,), stats in totals.items()}
+
+
+def analyze_providers(table, cube=None):
+    """对多供应商列式表一次性生成所有统计，返回 {provider_id: (overview, timeline, geographic)}"""
+    results = {}
+    for provider_id, provider_table in table.groupby('provider', sort=False):
+        provider_table = provider_table.reset_index(drop=True)
+        with stage('overview', provider=provider_id):
+            overview = build_overview(provider_table)
+        with stage('timeline', provider=provider_id):
+            timeline = build_timeline(provider_table)
+        with stage('geographic', provider=provider_id):
+            if cube is not None:
+                geographic = create_geographic_analysis({'provider': provider_id}, cube)
+            else:
+                geographic = build_geographic(provider_table)
+        results[provider_id] = (overview, timeline, geographic)
+    return results
+
+
+def save_json_reports(overview, timeline, provider_id=DEFAULT_PROVIDER):
+    """保存总览、时间线和地图数据 JSON（dump_json 与 json.dump 输出相同，并可逐条写出 RecordSpool）"""
     # 保存总览报告
-    with open('docs/alibaba_cloud_overview.json', 'w', encoding='utf-8') as f:
-        json.dump(overview, f, ensure_ascii=False, indent=2)
-    
+    with open(DOCS_DIR / f'{provider_id}_overview.json', 'w', encoding='utf-8') as f:
+        dump_json(overview, f)
+
     # 保存时间线数据
-    with open('docs/alibaba_cloud_timeline.json', 'w', encoding='utf-8') as f:
-        json.dump(timeline, f, ensure_ascii=False, indent=2)
-    
+    with open(DOCS_DIR / f'{provider_id}_timeline.json', 'w', encoding='utf-8') as f:
+        dump_json(timeline, f)
+
     # 保存地图数据
-    with open('docs/alibaba_cloud_map_data.json', 'w', encoding='utf-8') as f:
-        json.dump(overview['map_data'], f, ensure_ascii=False, indent=2)
-    
+    with open(DOCS_DIR / f'{provider_id}_map_data.json', 'w', encoding='utf-8') as f:
+        dump_json(overview['map_data'], f)
+
+
+def write_reports(overview, timeline, geographic, provider_id, provider_name):
+    """写出单个供应商的 JSON 与 Markdown 报告"""
+    print(f"正在保存 {provider_name} 报告...")
+    with stage('save_json', provider=provider_id):
+        save_json_reports(overview, timeline, provider_id)
+
     # 生成Markdown报告
-    generate_markdown_reports(overview, timeline, geographic)
-    
+    with stage('write_markdown', provider=provider_id):
+        generate_markdown_reports(overview, timeline, geographic, provider_id, provider_name)
+
+
+def generate_stream_reports(provider_ids, registry):
+    """逐个供应商流式解析并生成报告，不构造列式表"""
+    for provider_id in provider_ids:
+        provider_name = registry.name(provider_id)
+        print(f"正在流式分析 {provider_name} 节点数据...")
+        with stage('stream', provider=provider_id):
+            reports = analyze_nodes(load_data(provider_id, registry, stream=True)['nodes'])
+        with reports:
+            if not reports.total_nodes:
+                print(f"跳过 {provider_id}：没有节点数据")
+                continue
+            write_reports(reports.overview(), reports.timeline(), reports.geographic(), provider_id, provider_name)
+
+
+def generate_reports(provider_ids=None, snapshot=None, stream=False):
+    """生成所有报告（默认覆盖所有供应商）；指定 snapshot 时使用历史快照库中该快照的数据，
+    stream=True 时逐条流式解析数据文件"""
+    registry = REGISTRY
+    provider_ids = registry.select(provider_ids)
+
+    if stream:
+        generate_stream_reports(provider_ids, registry)
+        print("所有报告已生成完成！")
+        return
+
+    print(f"正在加载 {len(provider_ids)} 家云服务商节点数据...")
+    with stage('load_table'):
+        if snapshot is None:
+            table = load_table(provider_ids, registry)
+        else:
+            table = load_history_table(provider_ids, registry, at=snapshot)
+
+    print("正在生成总览、时间线与地理分布分析...")
+    with stage('load_cube'):
+        # 聚合立方体对应当前数据文件，历史快照直接按列式表汇总
+        cube = load_or_build_cube() if snapshot is None else None
+    with stage('analyze'):
+        results = analyze_providers(table, cube)
+
+    for provider_id in provider_ids:
+        if provider_id not in results:
+            print(f"跳过 {provider_id}：没有节点数据")
+            continue
+        overview, timeline, geographic = results[provider_id]
+        write_reports(overview, timeline, geographic, provider_id, registry.name(provider_id))
+
     print("所有报告已生成完成！")
 
-def generate_markdown_reports(overview, timeline, geographic):
+
+def _ranked(counts):
+    """按数量降序排列，数量相同时按名称排序，使默认路径与 --stream 的输出一致"""
+    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def generate_markdown_reports(overview, timeline, geographic, provider_id=DEFAULT_PROVIDER, provider_name='阿里云'):
     """生成Markdown格式的报告"""
-    
+
     # 总览报告
-    overview_md = f"""# 阿里云全球节点总览报告
+    overview_md = f"""# {provider_name}全球节点总览报告
 
 ## 基础统计信息
 
@@ -190,72 +404,94 @@ def generate_markdown_reports(overview, timeline, geographic):
 | 国家/地区 | 节点数量 | 可用区数量 |
 |-----------|----------|------------|
 """
-    
-    for country, count in sorted(overview['countries'].items(), key=lambda x: x[1], reverse=True):
-        az_count = sum(node['availability_zones'] for node in overview['map_data'] if node['country'] == country)
-        overview_md += f"| {country} | {count} | {az_count} |\n"
-    
+
+    country_azs = {}
+    for node in overview['map_data']:
+        country_azs[node['country']] = country_azs.get(node['country'], 0) + node['availability_zones']
+
+    for country, count in _ranked(overview['countries']):
+        overview_md += f"| {country} | {count} | {country_azs.get(country, 0)} |\n"
+
     overview_md += f"""
 ## 按地区分布
 
 | 地区 | 节点数量 |
 |------|----------|
 """
-    
-    for region, count in sorted(overview['regions'].items(), key=lambda x: x[1], reverse=True):
+
+    for region, count in _ranked(overview['regions']):
         overview_md += f"| {region} | {count} |\n"
-    
+
     overview_md += f"""
 ## 按年份分布
 
 | 年份 | 新增节点数 |
 |------|------------|
 """
-    
+
     for year, count in sorted(overview['years'].items()):
         overview_md += f"| {year} | {count} |\n"
-    
-    with open('docs/alibaba_cloud_overview.md', 'w', encoding='utf-8') as f:
+
+    with open(DOCS_DIR / f'{provider_id}_overview.md', 'w', encoding='utf-8') as f:
         f.write(overview_md)
-    
+
     # 时间线报告
-    timeline_md = """# 阿里云全球节点发展时间线
+    timeline_md = f"""# {provider_name}全球节点发展时间线
 
 ## 年度发展统计
 
 | 年份 | 新增节点 | 新增可用区 | 累计节点 | 累计可用区 |
 |------|----------|------------|----------|------------|
 """
-    
+
     for entry in timeline:
         timeline_md += f"| {entry['year']} | {entry['new_nodes']} | {entry['new_availability_zones']} | {entry['cumulative_nodes']} | {entry['cumulative_availability_zones']} |\n"
-    
+
     timeline_md += "\n## 年度新增节点详情\n\n"
-    
-    for entry in timeline:
-        if entry['new_nodes'] > 0:
-            timeline_md += f"### {entry['year']}年\n\n"
-            for node in entry['nodes']:
-                timeline_md += f"- **{node['name']}** ({node['country']} {node['city']}) - {node['availability_zones']}个可用区\n"
-            timeline_md += "\n"
-    
-    with open('docs/alibaba_cloud_timeline.md', 'w', encoding='utf-8') as f:
+
+    # 节点详情逐行写出，不在内存中拼接完整文本
+    with open(DOCS_DIR / f'{provider_id}_timeline.md', 'w', encoding='utf-8') as f:
         f.write(timeline_md)
-    
+        for entry in timeline:
+            if entry['new_nodes'] > 0:
+                f.write(f"### {entry['year']}年\n\n")
+                for node in entry['nodes']:
+                    f.write(f"- **{node['name']}** ({node['country']} {node['city']}) - {node['availability_zones']}个可用区\n")
+                f.write("\n")
+
     # 地理分布报告
-    geographic_md = """# 阿里云全球节点地理分布分析
+    geographic_md = f"""# {provider_name}全球节点地理分布分析
 
 ## 按大洲分布
 
 | 大洲 | 可用区数量 |
 |------|------------|
 """
-    
-    for continent, az_count in sorted(geographic.items(), key=lambda x: x[1], reverse=True):
+
+    for continent, az_count in _ranked(geographic):
         geographic_md += f"| {continent} | {az_count} |\n"
-    
-    with open('docs/alibaba_cloud_geographic.md', 'w', encoding='utf-8') as f:
+
+    with open(DOCS_DIR / f'{provider_id}_geographic.md', 'w', encoding='utf-8') as f:
         f.write(geographic_md)
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='生成云服务商节点分析报告')
+    parser.add_argument('--providers', '-p', default=None,
+                        help='逗号分隔的供应商ID（见 providers-metadata.json），默认全部')
+    parser.add_argument('--snapshot', type=int, default=None,
+                        help='使用历史快照库（scripts/snapshot_db.py）中该快照 id 时的数据生成报告')
+    parser.add_argument('--stream', action='store_true',
+                        help='逐条流式解析数据文件（适用于很大的数据文件，内存占用与节点数无关）')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.stream and args.snapshot is not None:
+        parser.error('--stream 不能与 --snapshot 同时使用')
+    return args
+
+
 if __name__ == "__main__":
-    generate_reports() 
\ No newline at end of file
+    args = parse_args()
+    configure_profiling(args.profile)
+    with stage('generate_reports'):
+        generate_reports(args.providers.split(',') if args.providers else None, args.snapshot, args.stream)
@@ -1,18 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-阿里云全球节点数据可视化脚本
+云服务商全球节点数据可视化脚本
 生成各种图表和可视化内容
+
+读取 alibaba_cloud_analysis.py 生成的 docs/<provider_id>_overview.json 与
+docs/<provider_id>_timeline.json，为每个供应商渲染四张图表。
+- 并行：图表以“一张图一个任务”提交到进程池，使用非交互式 Agg 后端
+- 增量：docs/.render-manifest.json 记录每张 PNG 的输入内容哈希，
+  输入（及本脚本）未变化且 PNG 仍存在时跳过渲染
+
+用法:
+    python scripts/alibaba_cloud_visualization.py                  # 所有供应商
+    python scripts/alibaba_cloud_visualization.py --providers aws --jobs 4 --force
 """
 
+import argparse
+import hashlib
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib import rcParams
 import seaborn as sns
 import numpy as np
-from datetime import datetime
-import pandas as pd
+
+from instrumentation import add_argument as add_profile_argument, configure as configure_profiling, stage
+from provider_registry import PROJECT_ROOT, ProviderRegistry
+from node_stream import iter_array, load_document
 
 # 设置中文字体和样式
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
@@ -20,17 +38,19 @@ plt.rcParams['axes.unicode_minus'] = False
 sns.set_style("whitegrid")
 plt.style.use('seaborn-v0_8')
 
-def load_data():
-    """加载分析数据"""
-    with open('docs/alibaba_cloud_overview.json', 'r', encoding='utf-8') as f:
-        overview = json.load(f)
-    
-    with open('docs/alibaba_cloud_timeline.json', 'r', encoding='utf-8') as f:
-        timeline = json.load(f)
-    
+DOCS_DIR = PROJECT_ROOT / 'docs'
+MANIFEST_PATH = DOCS_DIR / '.render-manifest.json'
+DPI = 300
+# 供应商注册表：图表只需要名称，不加载节点数据
+REGISTRY = ProviderRegistry()
+
+def load_data(provider_id='alibaba_cloud'):
+    """加载分析数据；图表只用到统计值，流式读取时跳过逐节点的 map_data 与各年份节点列表"""
+    overview = load_document(DOCS_DIR / f'{provider_id}_overview.json', skip=('map_data',))
+    timeline = list(iter_array(DOCS_DIR / f'{provider_id}_timeline.json', skip=('nodes',)))
     return overview, timeline
 
-def create_timeline_chart(timeline_data):
+def create_timeline_chart(timeline_data, provider_name='阿里云', output='docs/alibaba_cloud_timeline.png'):
     """创建时间线图表"""
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
     
@@ -42,7 +62,7 @@ def create_timeline_chart(timeline_data):
     
     # 新增节点数量
     bars1 = ax1.bar(years, new_nodes, color='skyblue', alpha=0.7, label='新增节点')
-    ax1.set_title('阿里云全球节点年度新增数量', fontsize=16, fontweight='bold')
+    ax1.set_title(f'{provider_name}全球节点年度新增数量', fontsize=16, fontweight='bold')
     ax1.set_ylabel('新增节点数量', fontsize=12)
     ax1.set_xlabel('年份', fontsize=12)
     ax1.grid(True, alpha=0.3)
@@ -67,7 +87,7 @@ def create_timeline_chart(timeline_data):
     
     # 可用区数量
     bars2 = ax2.bar(years, new_azs, color='lightgreen', alpha=0.7, label='新增可用区')
-    ax2.set_title('阿里云全球可用区年度新增数量', fontsize=16, fontweight='bold')
+    ax2.set_title(f'{provider_name}全球可用区年度新增数量', fontsize=16, fontweight='bold')
     ax2.set_ylabel('新增可用区数量', fontsize=12)
     ax2.set_xlabel('年份', fontsize=12)
     ax2.grid(True, alpha=0.3)
@@ -91,10 +111,11 @@ def create_timeline_chart(timeline_data):
     ax2.legend(lines3 + lines4, labels3 + labels4, loc='upper left')
     
     plt.tight_layout()
-    plt.savefig('docs/alibaba_cloud_timeline.png', dpi=300, bbox_inches='tight')
+    with stage('savefig', output=Path(output).name):
+        plt.savefig(output, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def create_geographic_chart(overview_data):
+def create_geographic_chart(overview_data, provider_name='阿里云', output='docs/alibaba_cloud_geographic.png'):
     """创建地理分布图表"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
@@ -110,7 +131,7 @@ def create_geographic_chart(overview_data):
     
     colors = plt.cm.Set3(np.linspace(0, 1, len(countries)))
     bars1 = ax1.barh(countries, counts, color=colors)
-    ax1.set_title('阿里云全球节点按国家分布', fontsize=16, fontweight='bold')
+    ax1.set_title(f'{provider_name}全球节点按国家分布', fontsize=16, fontweight='bold')
     ax1.set_xlabel('节点数量', fontsize=12)
     ax1.grid(True, alpha=0.3)
     
@@ -132,7 +153,7 @@ def create_geographic_chart(overview_data):
     colors2 = plt.cm.Pastel1(np.linspace(0, 1, len(regions)))
     wedges, texts, autotexts = ax2.pie(region_counts, labels=regions, autopct='%1.1f%%', 
                                        colors=colors2, startangle=90)
-    ax2.set_title('阿里云全球节点按地区分布', fontsize=16, fontweight='bold')
+    ax2.set_title(f'{provider_name}全球节点按地区分布', fontsize=16, fontweight='bold')
     
     # 设置文本样式
     for autotext in autotexts:
@@ -140,10 +161,11 @@ def create_geographic_chart(overview_data):
         autotext.set_fontweight('bold')
     
     plt.tight_layout()
-    plt.savefig('docs/alibaba_cloud_geographic.png', dpi=300, bbox_inches='tight')
+    with stage('savefig', output=Path(output).name):
+        plt.savefig(output, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def create_growth_analysis_chart(timeline_data):
+def create_growth_analysis_chart(timeline_data, provider_name='阿里云', output='docs/alibaba_cloud_growth.png'):
     """创建增长分析图表"""
     fig, ax = plt.subplots(figsize=(12, 8))
     
@@ -181,13 +203,14 @@ def create_growth_analysis_chart(timeline_data):
     labels = [l.get_label() for l in lines]
     ax1.legend(lines, labels, loc='upper left')
     
-    ax1.set_title('阿里云全球基础设施增长趋势', fontsize=16, fontweight='bold')
+    ax1.set_title(f'{provider_name}全球基础设施增长趋势', fontsize=16, fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('docs/alibaba_cloud_growth.png', dpi=300, bbox_inches='tight')
+    with stage('savefig', output=Path(output).name):
+        plt.savefig(output, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def create_summary_infographic(overview_data, timeline_data):
+def create_summary_infographic(overview_data, timeline_data, provider_name='阿里云', output='docs/alibaba_cloud_summary.png'):
     """创建总结信息图"""
     fig = plt.figure(figsize=(16, 12))
     
@@ -199,7 +222,7 @@ def create_summary_infographic(overview_data, timeline_data):
     ax1.axis('off')
     
     stats_text = f"""
-    阿里云全球基础设施总览
+    {provider_name}全球基础设施总览
     
     总节点数量: {overview_data['total_nodes']} 个
     总可用区数量: {overview_data['total_availability_zones']} 个
@@ -256,28 +279,110 @@ def create_summary_infographic(overview_data, timeline_data):
     labels = [l.get_label() for l in lines]
     ax5.legend(lines, labels, loc='upper left')
     
-    plt.suptitle('阿里云全球基础设施发展报告', fontsize=20, fontweight='bold')
-    plt.savefig('docs/alibaba_cloud_summary.png', dpi=300, bbox_inches='tight')
+    plt.suptitle(f'{provider_name}全球基础设施发展报告', fontsize=20, fontweight='bold')
+    with stage('savefig', output=Path(output).name):
+        plt.savefig(output, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def main():
-    """主函数"""
+# 图表名 -> (渲染函数, 所需输入)
+FIGURES = {
+    'timeline': (create_timeline_chart, ('timeline',)),
+    'geographic': (create_geographic_chart, ('overview',)),
+    'growth': (create_growth_analysis_chart, ('timeline',)),
+    'summary': (create_summary_infographic, ('overview', 'timeline')),
+}
+
+def figure_hash(figure, provider_name, inputs):
+    """图表输入内容哈希；脚本本身变化（图表样式调整）也会使哈希失效"""
+    digest = hashlib.sha1(Path(__file__).read_bytes())
+    digest.update(json.dumps([figure, provider_name, DPI, inputs], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def render_figure(task):
+    """渲染单张图表（在进程池工作进程中执行）"""
+    figure, provider_name, inputs, output = task
+    render, _ = FIGURES[figure]
+    with stage('render', figure=figure, output=Path(output).name):
+        render(*inputs, provider_name=provider_name, output=output)
+    plt.close('all')
+    return output
+
+def plan_render_tasks(provider_ids, registry, manifest, force=False):
+    """收集需要（重新）渲染的图表，返回 (任务列表, 新的清单条目, 跳过数量)"""
+    tasks, entries, skipped = [], {}, 0
+    for provider_id in provider_ids:
+        try:
+            overview, timeline = load_data(provider_id)
+        except OSError:
+            print(f"跳过 {provider_id}：未找到分析数据，请先运行 alibaba_cloud_analysis.py")
+            continue
+
+        provider_name = registry.name(provider_id)
+        sources = {'overview': overview, 'timeline': timeline}
+        for figure, (_, input_names) in FIGURES.items():
+            inputs = [sources[name] for name in input_names]
+            output = DOCS_DIR / f'{provider_id}_{figure}.png'
+            digest = figure_hash(figure, provider_name, inputs)
+            entries[output.name] = digest
+
+            if not force and manifest.get(output.name) == digest and output.exists():
+                skipped += 1
+                continue
+            tasks.append((figure, provider_name, inputs, str(output)))
+    return tasks, entries, skipped
+
+def render_all(provider_ids=None, jobs=None, force=False):
+    """并行、增量地渲染所有供应商的图表"""
+    registry = REGISTRY
+    provider_ids = registry.select(provider_ids)
+    manifest = load_manifest()
+
     print("正在加载数据...")
-    overview, timeline = load_data()
-    
-    print("正在生成时间线图表...")
-    create_timeline_chart(timeline)
-    
-    print("正在生成地理分布图表...")
-    create_geographic_chart(overview)
-    
-    print("正在生成增长分析图表...")
-    create_growth_analysis_chart(timeline)
-    
-    print("正在生成总结信息图...")
-    create_summary_infographic(overview, timeline)
-    
+    with stage('plan'):
+        tasks, entries, skipped = plan_render_tasks(provider_ids, registry, manifest, force)
+    print(f"需要渲染 {len(tasks)} 张图表，跳过 {skipped} 张未变化的图表")
+
+    jobs = jobs or os.cpu_count() or 1
+    if tasks:
+        if jobs <= 1 or len(tasks) == 1:
+            rendered = map(render_figure, tasks)
+            for output in rendered:
+                print(f"已生成 {Path(output).name}")
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+                for output in pool.map(render_figure, tasks):
+                    print(f"已生成 {Path(output).name}")
+
+    manifest.update(entries)
+    save_manifest(manifest)
     print("所有图表已生成完成！")
 
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='生成云服务商节点分析图表')
+    parser.add_argument('--providers', '-p', default=None,
+                        help='逗号分隔的供应商ID（见 providers-metadata.json），默认全部')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='并行进程数，默认为 CPU 核数，1 表示串行')
+    parser.add_argument('--force', action='store_true', help='忽略渲染清单，强制重新渲染所有图表')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    configure_profiling(args.profile)
+    with stage('render_all'):
+        render_all(args.providers.split(',') if args.providers else None, args.jobs, args.force)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
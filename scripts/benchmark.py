@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+按现有 nodes.json 的格式把各供应商节点复制放大（1×、100×、10000× 等），生成合成数据集，
+在临时工作区中测量：
+- 分析脚本：load_data（冷启动 / 命中规范化缓存 / 流式）、create_overview_report、
+  create_timeline_analysis、generate_markdown_reports
+- 可视化脚本的 main()（强制重新渲染全部图表）
+- serve.py：在独立进程中启动服务，多个本地客户端线程并发请求各接口，统计吞吐量与延迟分位数
+
+结果写为 JSON（默认 .bench/<时间>.json），用 compare 子命令比较两次结果，
+超过阈值的退化会被标出并以非零状态退出，便于在 CI 中发现性能回退。
+10000× 约为 200 万个节点、2 GB 数据，需显式通过 --scales 指定。
+
+用法:
+    python scripts/benchmark.py run                                   # 1× 与 100×
+    python scripts/benchmark.py run --scales 1 --stages load_data,serve --concurrency 1,16
+    python scripts/benchmark.py compare .bench/old.json .bench/new.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import copy
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import node_schema
+from provider_registry import PROJECT_ROOT, ProviderRegistry, load_metadata, provider_order
+
+RESULTS_DIR = PROJECT_ROOT / '.bench'
+RESULTS_SCHEMA = 1
+DEFAULT_SCALES = (1, 100)
+STAGES = ('load_data', 'create_overview_report', 'create_timeline_analysis',
+          'generate_markdown_reports', 'visualization', 'serve')
+# 并发测试的接口（首个请求会触发各派生结构的构建，单独记录为 first_ms）
+SERVE_ENDPOINTS = (
+    '/api/nodes',
+    '/api/nodes/query?q=east&limit=20',
+    '/api/cube',
+    '/api/clusters?level=3&bbox=-30,20,60,70',
+    '/api/nodes/nearest?lat=31.23&lon=121.47&k=5',
+)
+# 比较结果时，这些指标越大越好，其余（耗时、延迟）越小越好
+HIGHER_IS_BETTER = ('rps',)
+
+
+# ---- 合成数据 ----
+
+def synthetic_node(node, replica, rng):
+    """复制一个节点：节点ID与名称加副本后缀，坐标随机偏移（保持在合法范围内）"""
+    clone = copy.deepcopy(node)
+    clone['node_id'] = f"{node['node_id']}-s{replica}"
+    clone['name'] = f"{node['name']} #{replica}"
+    location = clone['location']
+    location['latitude'] = round(max(-90.0, min(90.0, location['latitude'] + rng.uniform(-2, 2))), 4)
+    location['longitude'] = round(max(-180.0, min(180.0, location['longitude'] + rng.uniform(-2, 2))), 4)
+    return clone
+
+
+def write_synthetic_dataset(root, scale, seed=0):
+    """在 root 下生成与项目相同布局的合成数据集，返回 (节点数, 数据文件字节数)"""
+    metadata = load_metadata()
+    data_dir = Path(root) / 'data'
+    data_dir.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(PROJECT_ROOT / 'data' / 'providers-metadata.json', data_dir / 'providers-metadata.json')
+
+    rng = random.Random(seed)
+    total_nodes = total_bytes = 0
+    for provider_id in provider_order(metadata):
+        relative = metadata['providers'][provider_id]['data_path']
+        with open(PROJECT_ROOT / relative, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        nodes = document.pop('nodes')
+
+        # 逐个节点写出，10000× 时也不必把整个数据集放在内存中
+        dest = Path(root) / relative
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with open(dest, 'w', encoding='utf-8') as f:
+            header = json.dumps(document, ensure_ascii=False)[:-1]
+            f.write(header + (', ' if document else '') + '"nodes": [')
+            for replica in range(scale):
+                for i, node in enumerate(nodes):
+                    item = node if replica == 0 else synthetic_node(node, replica, rng)
+                    f.write(('' if replica == 0 and i == 0 else ', ') + json.dumps(item, ensure_ascii=False))
+            f.write(']}')
+        total_nodes += len(nodes) * scale
+        total_bytes += dest.stat().st_size
+    return total_nodes, total_bytes
+
+
+# ---- 计时 ----
+
+def measure(func, repeat):
+    """运行 func repeat 次，返回墙钟与 CPU 时间统计（秒）；func 的输出被丢弃"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            func()
+            wall.append(time.perf_counter() - start_wall)
+            cpu.append(time.process_time() - start_cpu)
+    return {
+        'runs': [round(v, 6) for v in wall],
+        'min': round(min(wall), 6),
+        'median': round(statistics.median(wall), 6),
+        'mean': round(statistics.fmean(wall), 6),
+        'cpu_median': round(statistics.median(cpu), 6),
+    }
+
+
+@contextlib.contextmanager
+def patched(module, **values):
+    """临时替换模块级常量（数据根目录、输出目录等），退出时恢复"""
+    originals = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(module, name, value)
+
+
+@contextlib.contextmanager
+def workspace_modules(root):
+    """让分析与可视化脚本读写工作区 root 而不是项目目录"""
+    import alibaba_cloud_analysis as analysis
+    import alibaba_cloud_visualization as visualization
+
+    docs_dir = Path(root) / 'docs'
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    registry = ProviderRegistry(root)
+    with patched(node_schema, CACHE_DIR=Path(root) / 'data' / '.normalized'), \
+            patched(analysis, DOCS_DIR=docs_dir, REGISTRY=registry), \
+            patched(visualization, DOCS_DIR=docs_dir, MANIFEST_PATH=docs_dir / '.render-manifest.json',
+                    REGISTRY=registry):
+        yield analysis, visualization
+
+
+def clear_normalized_cache(root, registry, disk=True):
+    registry.clear()
+    if disk:
+        shutil.rmtree(Path(root) / 'data' / '.normalized', ignore_errors=True)
+
+
+def bench_scripts(root, stages, repeat, jobs):
+    """测量分析与可视化脚本各阶段，返回 {阶段: 统计}"""
+    results = {}
+    with workspace_modules(root) as (analysis, visualization):
+        registry = analysis.REGISTRY
+        provider_ids = registry.ids()
+
+        def load_all():
+            return [analysis.load_data(pid, registry) for pid in provider_ids]
+
+        if 'load_data' in stages:
+            def cold():
+                clear_normalized_cache(root, registry)
+                load_all()
+
+            def cached():
+                clear_normalized_cache(root, registry, disk=False)
+                load_all()
+
+            def streamed():
+                # 流式解析并单次遍历累加报告（--stream 路径，不经过缓存与列式表）
+                for pid in provider_ids:
+                    analysis.analyze_nodes(analysis.load_data(pid, registry, stream=True)['nodes']).close()
+
+            results['load_data.cold'] = measure(cold, repeat)
+            results['load_data.cached'] = measure(cached, repeat)
+            results['load_data.stream'] = measure(streamed, repeat)
+
+        datasets = load_all()
+        if 'create_overview_report' in stages:
+            results['create_overview_report'] = measure(
+                lambda: [analysis.create_overview_report(data) for data in datasets], repeat)
+        if 'create_timeline_analysis' in stages:
+            results['create_timeline_analysis'] = measure(
+                lambda: [analysis.create_timeline_analysis(data) for data in datasets], repeat)
+
+        if 'generate_markdown_reports' in stages or 'visualization' in stages:
+            reports = []
+            for data in datasets:
+                overview = analysis.create_overview_report(data)
+                timeline = analysis.create_timeline_analysis(data)
+                geographic = analysis.create_geographic_analysis(data)
+                analysis.save_json_reports(overview, timeline, data['provider'])
+                reports.append((overview, timeline, geographic, data['provider'],
+                                registry.name(data['provider'])))
+
+            if 'generate_markdown_reports' in stages:
+                results['generate_markdown_reports'] = measure(
+                    lambda: [analysis.generate_markdown_reports(*report) for report in reports], repeat)
+
+        if 'visualization' in stages:
+            argv = ['alibaba_cloud_visualization.py', '--force'] + (['--jobs', str(jobs)] if jobs else [])
+            with patched(sys, argv=argv):
+                results['visualization.main'] = measure(visualization.main, repeat)
+    return results
+
+
+# ---- 服务端并发测试 ----
+
+def serve_workspace(root, workers):
+    """（子进程）以工作区数据启动 serve.py，把端口号写到标准输出"""
+    sys.path.insert(0, str(PROJECT_ROOT))
+    import serve
+
+    node_schema.CACHE_DIR = Path(root) / 'data' / '.normalized'
+    args = serve.parse_args(['--port', '0', '--bind', '127.0.0.1', '--no-precompress', '--no-history',
+                            '--workers', str(workers)])
+    httpd = serve.create_server(args, Path(root))
+    print(httpd.server_address[1], flush=True)
+    httpd.serve_forever()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_endpoint(port, path, concurrency, requests):
+    """concurrency 个客户端线程（各自使用 keep-alive 连接）共发出 requests 个请求"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def client(count):
+        nonlocal errors
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local, failed = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    threads = [threading.Thread(target=client, args=(count,)) for count in per_client if count]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': to_ms(percentile(latencies, 0.50)),
+        'p95_ms': to_ms(percentile(latencies, 0.95)),
+        'p99_ms': to_ms(percentile(latencies, 0.99)),
+        'max_ms': to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def bench_serve(root, concurrency_levels, requests, workers):
+    """在子进程中启动服务并逐个接口、逐个并发度施压，返回 {接口: {...}}"""
+    process = subprocess.Popen([sys.executable, __file__, 'serve', str(root), '--workers', str(workers)],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, cwd=PROJECT_ROOT)
+    try:
+        startup = time.perf_counter()
+        port = int(process.stdout.readline())
+        results = {'startup_s': round(time.perf_counter() - startup, 3), 'endpoints': {}}
+
+        for path in SERVE_ENDPOINTS:
+            first = time.perf_counter()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            entry = {'status': response.status, 'bytes': len(body),
+                     'first_ms': round((time.perf_counter() - first) * 1000, 3), 'levels': {}}
+            if response.status == 200:
+                for concurrency in concurrency_levels:
+                    entry['levels'][str(concurrency)] = load_endpoint(port, path, concurrency, requests)
+            results['endpoints'][path] = entry
+        return results
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+# ---- 运行与比较 ----
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def run(args):
+    stages = set(args.stages.split(',')) if args.stages else set(STAGES)
+    unknown = stages - set(STAGES)
+    if unknown:
+        raise SystemExit(f"未知阶段: {', '.join(sorted(unknown))}（可选 {', '.join(STAGES)}）")
+    scales = [int(v) for v in args.scales.split(',')]
+    concurrency_levels = [int(v) for v in args.concurrency.split(',')]
+
+    report = {
+        'schema': RESULTS_SCHEMA,
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'repeat': args.repeat, 'stages': sorted(stages), 'concurrency': concurrency_levels,
+                     'requests': args.requests, 'workers': args.workers, 'jobs': args.jobs},
+        'scales': [],
+    }
+
+    for scale in scales:
+        root = Path(tempfile.mkdtemp(prefix=f'cloud-map-bench-{scale}x-', dir=args.workdir))
+        try:
+            print(f"[{scale}×] 正在生成合成数据集...")
+            started = time.perf_counter()
+            nodes, size = write_synthetic_dataset(root, scale, args.seed)
+            print(f"[{scale}×] {nodes} 个节点，{size / 1024 / 1024:.1f} MB（{time.perf_counter() - started:.1f}s）")
+
+            # 大数据集只运行一次
+            repeat = args.repeat if nodes <= 100000 else 1
+            entry = {'scale': scale, 'nodes': nodes, 'bytes': size, 'repeat': repeat}
+            entry['timings'] = bench_scripts(root, stages, repeat, args.jobs)
+            for name, stats in entry['timings'].items():
+                print(f"[{scale}×] {name:<28} 中位数 {stats['median'] * 1000:>10.1f} ms")
+
+            if 'serve' in stages:
+                entry['serve'] = bench_serve(root, concurrency_levels, args.requests, args.workers)
+                for path, result in entry['serve']['endpoints'].items():
+                    for level, stats in result['levels'].items():
+                        print(f"[{scale}×] {path:<44} c={level:<3} {stats['rps']:>8.1f} req/s  "
+                              f"p50 {stats['p50_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms")
+            report['scales'].append(entry)
+        finally:
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+            else:
+                print(f"[{scale}×] 工作区保留在 {root}")
+
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {output}")
+
+
+def flatten(report):
+    """把结果展开为 {指标名: 数值}，用于比较两次运行"""
+    metrics = {}
+    for entry in report['scales']:
+        prefix = f"{entry['scale']}x"
+        for name, stats in entry.get('timings', {}).items():
+            metrics[f"{prefix}/{name}/median_s"] = stats['median']
+        for path, result in entry.get('serve', {}).get('endpoints', {}).items():
+            for level, stats in result['levels'].items():
+                for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                    if stats.get(key) is not None:
+                        metrics[f"{prefix}/serve{path}/c{level}/{key}"] = stats[key]
+    return metrics
+
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = flatten(json.load(f))
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = flatten(json.load(f))
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name], current[name]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ''
+        if worse > args.threshold:
+            flag = '  ⚠️ 退化'
+            regressions += 1
+        elif worse < -args.threshold:
+            flag = '  ✓ 提升'
+        print(f"{name:<72} {before:>12.4f} -> {after:>12.4f}  {change:>+7.1%}{flag}")
+
+    print(f"共比较 {len(set(baseline) & set(current))} 项指标，{regressions} 项退化超过 {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据加载、聚合与服务端性能基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='生成合成数据集并运行基准测试')
+    run_parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help='逗号分隔的放大倍数（默认 1,100；10000 约为 2 GB 数据）')
+    run_parser.add_argument('--stages', default=None, help=f"逗号分隔的阶段，默认全部：{','.join(STAGES)}")
+    run_parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数（取中位数）')
+    run_parser.add_argument('--concurrency', default='1,8,32', help='服务端测试的并发客户端数')
+    run_parser.add_argument('--requests', type=int, default=200, help='每个接口、每个并发度的请求数')
+    run_parser.add_argument('--workers', type=int, default=0, help='serve.py 线程池大小，0 表示每连接一个线程')
+    run_parser.add_argument('--jobs', type=int, default=None, help='可视化脚本的并行进程数')
+    run_parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    run_parser.add_argument('--workdir', default=None, help='存放临时工作区的目录')
+    run_parser.add_argument('--keep', action='store_true', help='保留临时工作区')
+    run_parser.add_argument('--output', '-o', type=Path, default=None, help='结果文件路径')
+
+    compare_parser = sub.add_parser('compare', help='比较两次基准测试结果')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='视为退化的相对变化（默认 0.1）')
+
+    serve_parser = sub.add_parser('serve', help=argparse.SUPPRESS)
+    serve_parser.add_argument('root')
+    serve_parser.add_argument('--workers', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        serve_workspace(args.root, args.workers)
+
+
+if __name__ == "__main__":
+    main()
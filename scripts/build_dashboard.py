@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仪表盘静态预渲染构建
+页面原本要等全部节点下载完、在浏览器里跑完 processData / generateCountryStatsTable /
+generateProviderStatsTable / initializeNodesDetailTable 之后才显示内容。本脚本在构建时完成这些工作：
+1. 以 cloud-infrastructure-map.html 为模板，把统计数字（updateStats）、云服务商统计表、
+   国家统计表和节点列表第一页直接渲染进 HTML
+2. 内联预渲染数据（<script id="prerendered-data">）：图表切片所用的聚合立方体、
+   地图前几级的全图聚合点及源数据哈希；页面的图表配置含 JS 格式化函数，由内联立方体在浏览器中直接生成
+3. 样式压缩后内联，页面脚本压缩后输出为带内容哈希的 assets/app.<哈希>.js（serve.py 返回长期缓存头），
+   内联的节点数据引擎（Web Worker 源码）原位压缩
+4. 复制页面运行所需的数据文件，写出与 /api/providers 格式相同的供应商配置 data/providers.json，
+   编译列式节点存储 data/nodes.store（供没有 /api/nodes.bin 时的数据引擎读取，需要 NumPy），
+   并为所有文本文件生成 .gz（安装 brotli 时另有 .br）预压缩副本
+
+页面加载后发现源数据哈希与构建时一致，就直接沿用预渲染的内容，只绑定交互；不一致时照常重新渲染。
+
+用法:
+    python scripts/build_dashboard.py                  # 输出到 dist/
+    python serve.py --static-root dist                 # 以构建产物提供页面，接口照常可用
+"""
+
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import re
+import shutil
+from pathlib import Path
+
+from aggregate_cube import build_cube, distinct_count, rollup
+from map_clusters import ClusterIndex
+from node_dataset import PROJECT_ROOT, source_fingerprint
+from node_index import NodeIndex
+from node_schema import SCHEMA_VERSION
+from provider_registry import ProviderRegistry
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只生成 .gz
+    brotli = None
+
+try:
+    from node_store import compile_store
+except ImportError:  # 列式存储依赖 NumPy，缺失时页面回退为读取规范化 JSON
+    compile_store = None
+
+TEMPLATE_PATH = PROJECT_ROOT / 'cloud-infrastructure-map.html'
+DEFAULT_OUTPUT = PROJECT_ROOT / 'dist'
+# 与页面中的 itemsPerPage 一致
+ITEMS_PER_PAGE = 20
+# 内联全图聚合点的级别（更细的级别由 /api/clusters 按视口提供）
+INLINE_CLUSTER_LEVELS = (0, 1)
+# 小于该大小的文件不生成预压缩副本（与 serve.py 一致）
+MIN_COMPRESS_SIZE = 1024
+PRECOMPRESS_SUFFIXES = ('.html', '.json', '.js', '.css', '.svg')
+
+INLINE_SCRIPT = re.compile(r'<script>(.*?)</script>', re.S)
+INLINE_STYLE = re.compile(r'<style>(.*?)</style>', re.S)
+ENGINE_SCRIPT = re.compile(r'(<script id="node-engine-source" type="text/js-worker">)(.*?)(</script>)', re.S)
+
+
+# ---- 渲染 ----
+
+def page_providers(provider_configs):
+    """注册表中的供应商配置 -> {id: (名称, 颜色)}；页面使用同一份配置（/api/providers），预渲染与浏览器端渲染一致"""
+    providers = {info['id']: (info.get('name', info['id']), info.get('color', '')) for info in provider_configs}
+    if not providers:
+        raise ValueError("供应商注册表为空")
+    return providers
+
+
+def fill_element(page, element_id, inner):
+    """替换 id 为 element_id 的元素的内容"""
+    pattern = re.compile(r'(<(\w+)[^>]*\bid="%s"[^>]*>)(.*?)(</\2>)' % re.escape(element_id), re.S)
+    page, count = pattern.subn(lambda m: m.group(1) + inner + m.group(4), page, count=1)
+    if not count:
+        raise ValueError(f"模板中缺少 #{element_id}")
+    return page
+
+
+def provider_cell(name, color):
+    return (f'<div class="provider-name-cell"><div class="provider-color-dot" style="background: {color};"></div>'
+            f'{html.escape(name)}</div>')
+
+
+def render_provider_rows(cube, providers):
+    """云服务商统计表（与 generateProviderStatsTable 一致：按节点数降序）"""
+    countries = distinct_count(cube, 'provider', 'country')
+    stats = [(provider, totals) for (provider,), totals in rollup(cube, ['provider']).items() if provider in providers]
+    stats.sort(key=lambda item: -item[1]['nodes'])
+
+    badges = {1: '🥇', 2: '🥈', 3: '🥉'}
+    rows = []
+    for rank, (provider, totals) in enumerate(stats, 1):
+        badge = f'<span class="stat-rank stat-rank-{rank}">{badges[rank]}</span>' if rank in badges else ''
+        rows.append(
+            f'<tr><td><strong>#{rank}</strong> {badge}</td>'
+            f'<td>{provider_cell(*providers[provider])}</td>'
+            f'<td><span class="stat-value">{totals["nodes"]}</span> 个</td>'
+            f'<td><span class="stat-value">{countries[provider]}</span> 国</td>'
+            f'<td><span class="stat-value">{totals["az_sum"]}</span> 区</td></tr>'
+        )
+    return ''.join(rows)
+
+
+def render_country_rows(cube, providers):
+    """国家统计表（与 generateCountryStatsTable 一致：按供应商ID，再按节点数降序）"""
+    stats = [(provider, country, totals)
+             for (provider, country), totals in rollup(cube, ['provider', 'country']).items()
+             if provider in providers]
+    stats.sort(key=lambda item: (item[0], -item[2]['nodes']))
+
+    return ''.join(
+        f'<tr><td><div class="provider-name-cell"><span class="provider-color-dot" '
+        f'style="background: {providers[provider][1]};"></span><span>{html.escape(providers[provider][0])}</span></div></td>'
+        f'<td>{html.escape(country)}</td>'
+        f'<td><span class="stat-value">{totals["nodes"]}</span> 个</td>'
+        f'<td><span class="stat-value">{totals["az_sum"]}</span> 区</td></tr>'
+        for provider, country, totals in stats
+    )
+
+
+def format_launch_date(value):
+    """与页面的 toLocaleDateString('zh-CN') 一致：2006/3/14"""
+    if not value:
+        return '-'
+    year, month, day = value[:10].split('-')
+    return f"{int(year)}/{int(month)}/{int(day)}"
+
+
+def render_node_rows(nodes, providers):
+    """节点列表的一页（与 renderNodesTable 一致）"""
+    rows = []
+    for node in nodes:
+        location = node['location']
+        status = '运行中' if node['status'] == 'active' else '已停用'
+        rows.append(
+            f'<tr><td><code style="font-size: 11px; background: #f0f0f0; padding: 2px 6px; border-radius: 3px;">'
+            f'{html.escape(node["node_id"])}</code></td>'
+            f'<td><strong>{html.escape(node["name"])}</strong></td>'
+            f'<td>{provider_cell(*providers[node["provider"]])}</td>'
+            f'<td>{html.escape(location["country"])}</td>'
+            f'<td>{html.escape(location["city"])}</td>'
+            f'<td>{node["availability_zones"]} 个</td>'
+            f'<td><span class="node-status {node["status"]}">{status}</span></td>'
+            f'<td>{format_launch_date(node["launch_date"])}</td></tr>'
+        )
+    return ''.join(rows)
+
+
+def prerender(template, nodes, cube, source_hash, provider_configs):
+    """把统计数字、统计表、节点列表第一页和预渲染数据写入页面"""
+    providers = page_providers(provider_configs)
+    nodes = [node for node in nodes if node['provider'] in providers]
+    provider_totals = [totals for (provider,), totals in rollup(cube, ['provider']).items() if provider in providers]
+
+    page = template
+    for element_id, value in (
+        ('total-nodes', len(nodes)),
+        ('total-providers', len(provider_totals)),
+        ('total-countries', len({node['location']['country'] for node in nodes})),
+        ('total-azs', sum(totals['az_sum'] for totals in provider_totals)),
+    ):
+        page = fill_element(page, element_id, str(value))
+
+    page = fill_element(page, 'provider-stats-tbody', render_provider_rows(cube, providers))
+    page = fill_element(page, 'country-stats-tbody', render_country_rows(cube, providers))
+
+    first_page = NodeIndex(nodes).query(offset=0, limit=ITEMS_PER_PAGE)
+    total_pages = max(1, -(-first_page['total'] // ITEMS_PER_PAGE))
+    page = fill_element(page, 'nodes-table-body', render_node_rows(first_page['nodes'], providers))
+    page = fill_element(page, 'total-pages', str(total_pages))
+    page = fill_element(page, 'total-nodes-count', str(first_page['total']))
+    page = page.replace('id="prev-page">', 'id="prev-page" disabled>', 1)
+    if total_pages == 1:
+        page = page.replace('id="next-page">', 'id="next-page" disabled>', 1)
+
+    clusters = ClusterIndex(nodes)
+    data = {
+        'schema': SCHEMA_VERSION,
+        'source_hash': source_hash,
+        'providers': provider_configs,
+        'cube': cube,
+        'clusters': {level: clusters.query(level)['clusters'] for level in INLINE_CLUSTER_LEVELS},
+    }
+    # 内联到 <script> 中的 JSON 不能出现 "</"
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return page.replace('<script>', f'<script id="prerendered-data" type="application/json">{payload}</script>\n<script>', 1)
+
+
+# ---- 压缩 ----
+
+def minify_js(source):
+    """保守的脚本压缩：去掉缩进、空行和整行注释（不改动行内内容，字符串与正则字面量不受影响）"""
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def minify_css(source):
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    return re.sub(r':\s+', ':', source).replace(';}', '}').strip()
+
+
+def minify_html(source):
+    source = re.sub(r'<!--.*?-->', '', source, flags=re.S)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def precompress(path):
+    """为文本文件生成 .gz / .br 预压缩副本，返回生成的文件列表"""
+    body = path.read_bytes()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return []
+    outputs = [(path.with_name(path.name + '.gz'), gzip.compress(body, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        outputs.append((path.with_name(path.name + '.br'), brotli.compress(body, quality=11)))
+    for out_path, compressed in outputs:
+        out_path.write_bytes(compressed)
+    return [out_path for out_path, _ in outputs]
+
+
+# ---- 构建 ----
+
+def static_data_files(root=PROJECT_ROOT):
+    """页面在没有服务端接口时读取的数据文件（相对路径）"""
+    geo_dir = root / 'data' / 'geo'
+    files = [Path('data/normalized-nodes.json'), Path('data/geo/manifest.json')]
+    with open(geo_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+        files += [Path('data/geo') / info['file'] for info in json.load(f)['levels'].values()]
+    return files
+
+
+def build(out_dir=DEFAULT_OUTPUT, root=PROJECT_ROOT):
+    """构建预渲染页面与静态资源，返回 {相对路径: 字节数}"""
+    root, out_dir = Path(root), Path(out_dir)
+    registry = ProviderRegistry(root)
+    providers, nodes = registry.merged()
+    provider_configs = registry.public()
+    source_hash = source_fingerprint(root)
+    cube = build_cube(nodes, providers, source_hash=source_hash)
+
+    template = (root / TEMPLATE_PATH.name).read_text(encoding='utf-8')
+    page = prerender(template, nodes, cube, source_hash, provider_configs)
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    (out_dir / 'assets').mkdir(parents=True)
+
+    # 页面脚本独立为带哈希的文件，样式内联（首屏不再等待额外请求）
+    script = INLINE_SCRIPT.search(page)
+    script_body = minify_js(script.group(1)).encode('utf-8')
+    script_name = f"assets/app.{hashlib.sha1(script_body).hexdigest()[:10]}.js"
+    (out_dir / script_name).write_bytes(script_body)
+    page = page[:script.start()] + f'<script src="{script_name}"></script>' + page[script.end():]
+    page = INLINE_STYLE.sub(lambda m: f'<style>{minify_css(m.group(1))}</style>', page, count=1)
+    page = ENGINE_SCRIPT.sub(lambda m: m.group(1) + minify_js(m.group(2)) + m.group(3), page, count=1)
+
+    html_name = TEMPLATE_PATH.name
+    (out_dir / html_name).write_text(minify_html(page), encoding='utf-8')
+
+    data_files = static_data_files(root)
+    for relative in data_files:
+        (out_dir / relative).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(root / relative, out_dir / relative)
+    with open(out_dir / 'data' / 'aggregate-cube.json', 'w', encoding='utf-8') as f:
+        json.dump(cube, f, ensure_ascii=False, separators=(',', ':'))
+    # 与 /api/providers 相同格式的供应商配置
+    with open(out_dir / 'data' / 'providers.json', 'w', encoding='utf-8') as f:
+        json.dump({'version': registry.metadata.get('version'), 'providers': provider_configs}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    if compile_store is not None:
+        (out_dir / 'data' / 'nodes.store').write_bytes(compile_store(nodes, source_hash=source_hash))
+
+    outputs = {}
+    for path in sorted(p for p in out_dir.rglob('*') if p.is_file()):
+        if path.name.endswith(PRECOMPRESS_SUFFIXES):
+            for compressed in precompress(path):
+                outputs[compressed.relative_to(out_dir).as_posix()] = compressed.stat().st_size
+        outputs[path.relative_to(out_dir).as_posix()] = path.stat().st_size
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建预渲染的静态仪表盘')
+    parser.add_argument('--output', '-o', type=Path, default=DEFAULT_OUTPUT, help='输出目录（会被清空）')
+    args = parser.parse_args()
+
+    print("正在预渲染仪表盘...")
+    outputs = build(args.output)
+    for name, size in sorted(outputs.items()):
+        print(f"  {name:<48} {size / 1024:>8.1f} KB")
+    print(f"构建完成: {args.output}（{len(outputs)} 个文件{'，含 brotli 预压缩' if brotli else ''}）")
+
+
+if __name__ == "__main__":
+    main()
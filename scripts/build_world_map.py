@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地世界地图几何构建脚本
+页面原来每次都从 cdn.jsdelivr.net 加载 ECharts 的 world.json，首屏依赖外网且在内网环境下无法使用。
+本脚本把世界地图几何固化到仓库中：
+1. 源数据为 data/geo/world-source.json（ECharts world.json，UTF8Encoding 压缩格式），
+   可用 --source 从 URL 或本地文件重新获取
+2. 解码为普通经纬度坐标后，按多个容差级别做 Douglas–Peucker 简化
+3. 仿 TopoJSON 量化：坐标映射到整数网格（transform.scale/translate），环内逐点差分编码
+4. 输出 data/geo/world-<级别>.<内容哈希>.json 及 data/geo/manifest.json；
+   文件名带内容哈希，serve.py 对其返回长期缓存头
+
+页面读取 manifest 后加载对应级别的文件，用几行 JS 还原为 GeoJSON 再注册到 ECharts。
+
+用法:
+    python scripts/build_world_map.py
+    python scripts/build_world_map.py --source https://cdn.jsdelivr.net/npm/echarts@4.9.0/map/json/world.json
+"""
+
+import argparse
+import hashlib
+import json
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+GEO_DIR = PROJECT_ROOT / 'data' / 'geo'
+SOURCE_PATH = GEO_DIR / 'world-source.json'
+MANIFEST_PATH = GEO_DIR / 'manifest.json'
+
+# 级别 -> (简化容差（度）, 量化网格大小)
+LEVELS = {
+    'low': (0.25, 4000),
+    'medium': (0.08, 10000),
+    'high': (0.02, 40000),
+}
+
+
+def load_source(source=SOURCE_PATH):
+    """读取 world.json（URL 或本地路径）"""
+    source = str(source)
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=30) as response:
+            return json.loads(response.read().decode('utf-8'))
+    with open(source, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def decode_ring(encoded, offset, scale):
+    """解码 ECharts UTF8Encoding 压缩的坐标环（与 echarts 的 decodePolygon 一致）"""
+    prev_x, prev_y = offset
+    ring = []
+    for i in range(0, len(encoded), 2):
+        x = ord(encoded[i]) - 64
+        y = ord(encoded[i + 1]) - 64
+        # zigzag 解码
+        x = (x >> 1) ^ -(x & 1)
+        y = (y >> 1) ^ -(y & 1)
+        prev_x += x
+        prev_y += y
+        ring.append((prev_x / scale, prev_y / scale))
+    return ring
+
+
+def decode_geojson(data):
+    """把 ECharts 压缩格式还原为普通 GeoJSON 坐标；未压缩时原样返回"""
+    if not data.get('UTF8Encoding'):
+        return data
+    scale = data.get('UTF8Scale') or 1024
+    for feature in data['features']:
+        geometry = feature['geometry']
+        offsets = geometry.pop('encodeOffsets')
+        if geometry['type'] == 'Polygon':
+            geometry['coordinates'] = [decode_ring(ring, offsets[i], scale)
+                                       for i, ring in enumerate(geometry['coordinates'])]
+        else:
+            geometry['coordinates'] = [[decode_ring(ring, offsets[p][i], scale) for i, ring in enumerate(polygon)]
+                                       for p, polygon in enumerate(geometry['coordinates'])]
+    data['UTF8Encoding'] = False
+    return data
+
+
+def simplify_ring(ring, tolerance):
+    """Douglas–Peucker 简化闭合环，结果至少保留 4 个点（首尾相同）"""
+    if len(ring) <= 4:
+        return list(ring)
+
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    # 闭合环首尾重合，先取离起点最远的点把环拆成两段
+    far = max(range(len(ring)), key=lambda i: (ring[i][0] - ring[0][0]) ** 2 + (ring[i][1] - ring[0][1]) ** 2)
+    keep[far] = True
+    stack = [(0, far), (far, len(ring) - 1)]
+    tolerance_sq = tolerance * tolerance
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        (x1, y1), (x2, y2) = ring[start], ring[end]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        best, best_dist = None, tolerance_sq
+        for i in range(start + 1, end):
+            px, py = ring[i]
+            if length_sq == 0:
+                dist = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                cross = dx * (py - y1) - dy * (px - x1)
+                dist = cross * cross / length_sq
+            if dist > best_dist:
+                best, best_dist = i, dist
+        if best is not None:
+            keep[best] = True
+            stack.append((start, best))
+            stack.append((best, end))
+
+    simplified = [point for point, kept in zip(ring, keep) if kept]
+    return simplified if len(simplified) >= 4 else None
+
+
+def ring_area(ring):
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:]))) / 2
+
+
+def quantize_ring(ring, transform):
+    """量化并差分编码：[x0, y0, dx1, dy1, ...]，量化后重复的点被去掉"""
+    (kx, ky), (tx, ty) = transform
+    encoded = []
+    prev = None
+    last_x = last_y = 0
+    for lon, lat in ring:
+        point = (round((lon - tx) / kx), round((lat - ty) / ky))
+        if point == prev:
+            continue
+        encoded += [point[0] - last_x, point[1] - last_y]
+        last_x, last_y = prev = point
+    return encoded if len(encoded) >= 8 else None
+
+
+def build_level(geojson, tolerance, grid):
+    """生成一个级别的量化几何"""
+    transform = ((360.0 / (grid - 1), 180.0 / (grid - 1)), (-180.0, -90.0))
+    features = []
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        polygons = [polygon for polygon in polygons if polygon and len(polygon[0]) >= 4]
+        if not polygons:
+            continue
+
+        encoded_polygons = []
+        for polygon in polygons:
+            rings = [simplify_ring(ring, tolerance) for ring in polygon]
+            # 外环简化掉了（小岛）则整个多边形丢弃，内环简化掉了只丢弃该内环
+            if rings[0] is None:
+                continue
+            rings = [quantize_ring(ring, transform) for ring in rings if ring is not None]
+            if rings and rings[0] is not None:
+                encoded_polygons.append([ring for ring in rings if ring is not None])
+
+        if not encoded_polygons:
+            # 面积过小的国家/地区保留最大的外环，避免在地图上消失
+            largest = max((polygon[0] for polygon in polygons), key=ring_area)
+            ring = quantize_ring(largest, transform)
+            if ring is None:
+                continue
+            encoded_polygons = [[ring]]
+
+        features.append({
+            'name': feature['properties'].get('name', ''),
+            'polygons': encoded_polygons,
+        })
+
+    return {
+        'type': 'QuantizedFeatureCollection',
+        'transform': {'scale': list(transform[0]), 'translate': list(transform[1])},
+        'features': features,
+    }
+
+
+def build_all(source=SOURCE_PATH, out_dir=GEO_DIR):
+    """构建所有级别并写出 manifest，返回 manifest"""
+    geojson = decode_geojson(load_source(source))
+    out_dir = Path(out_dir)
+    manifest = {'levels': {}}
+
+    for level, (tolerance, grid) in LEVELS.items():
+        payload = json.dumps(build_level(geojson, tolerance, grid), ensure_ascii=False,
+                             separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha1(payload).hexdigest()[:10]
+        filename = f'world-{level}.{digest}.json'
+
+        for old in out_dir.glob(f'world-{level}.*.json'):
+            if old.name != filename:
+                old.unlink()
+        (out_dir / filename).write_bytes(payload)
+        manifest['levels'][level] = {'file': filename, 'tolerance': tolerance, 'grid': grid, 'bytes': len(payload)}
+
+    with open(out_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建本地简化、量化的世界地图几何')
+    parser.add_argument('--source', default=None,
+                        help='world.json 的 URL 或本地路径；指定后同时更新 data/geo/world-source.json')
+    args = parser.parse_args()
+
+    GEO_DIR.mkdir(parents=True, exist_ok=True)
+    if args.source:
+        print(f"正在获取源数据: {args.source}")
+        data = load_source(args.source)
+        with open(SOURCE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    print("正在简化并量化世界地图几何...")
+    manifest = build_all()
+    for level, info in manifest['levels'].items():
+        print(f"  {level:<7} 容差 {info['tolerance']}°  网格 {info['grid']}  {info['bytes'] / 1024:.1f} KB -> {info['file']}")
+    print(f"manifest 已写入: {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
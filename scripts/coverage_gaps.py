@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+覆盖缺口分析
+回答“哪些陆地离供应商 P 的所有区域都超过 X 公里 / Y 毫秒”：
+1. 把地球划分为等面积网格（Lambert 圆柱等积投影：行在 sin(纬度) 上等分，列在经度上等分），
+   每个格子面积相同，格子数即可直接换算为面积
+2. 用 data/geo/world-source.json 中的国家多边形按扫描线（奇偶规则）栅格化，得到每个格子所属的国家；
+   仓库中没有人口数据，以陆地格子代表“有人居住的区域”
+3. 对每个供应商一次性广播计算陆地格子到其最近区域的大圆距离（供应商 × 格子的 float32 矩阵），
+   任意供应商组合的结果只是对应行的逐列最小值，可交互式地反复查询
+4. 距离按与 latency_matrix.py 相同的模型换算为估算 RTT；输出覆盖率、按缺口面积排序的国家、
+   组合中每个供应商的边际贡献，以及 JSON 报告和 PNG 覆盖图
+
+用法:
+    python scripts/coverage_gaps.py                                  # 所有供应商，阈值 1000 公里
+    python scripts/coverage_gaps.py --providers aws,azure --max-ms 20
+    python scripts/coverage_gaps.py --providers alibaba_cloud --max-km 500 --output docs/coverage_alibaba
+"""
+
+import argparse
+import json
+import math
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from build_world_map import SOURCE_PATH, decode_geojson, load_source
+from latency_matrix import ENDPOINT_OVERHEAD_MS, FIBER_KM_PER_MS, ROUTE_FACTOR, region_key
+from spatial_index import EARTH_RADIUS_KM, chord_to_km, to_unit_vectors
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+OUTPUT_STEM = PROJECT_ROOT / 'docs' / 'coverage_gaps'
+
+# 默认网格：180 行 × 360 列，每格约 7,870 平方公里
+GRID_ROWS = 180
+GRID_COLS = 360
+MAX_GRID_CELLS = 2000 * 4000
+DEFAULT_MAX_KM = 1000.0
+MAX_RESULTS = 200
+# 广播计算距离时每批处理的格子数，限制临时矩阵大小
+DISTANCE_BATCH = 8192
+
+
+def distance_to_rtt(distance_km):
+    """大圆距离 -> 估算 RTT（毫秒），与 latency_matrix.py 的模型一致"""
+    return distance_km * (2 * ROUTE_FACTOR / FIBER_KM_PER_MS) + 2 * ENDPOINT_OVERHEAD_MS
+
+
+def rtt_to_distance(rtt_ms):
+    """估算 RTT（毫秒） -> 对应的最大大圆距离"""
+    return max(rtt_ms - 2 * ENDPOINT_OVERHEAD_MS, 0.0) * FIBER_KM_PER_MS / (2 * ROUTE_FACTOR)
+
+
+class EqualAreaGrid:
+    """等面积经纬网格：行边界在 sin(纬度) 上等分，列边界在经度上等分"""
+
+    def __init__(self, rows=GRID_ROWS, cols=GRID_COLS):
+        if rows < 2 or cols < 2 or rows * cols > MAX_GRID_CELLS:
+            raise ValueError(f"网格大小必须在 2×2 到 {MAX_GRID_CELLS} 个格子之间")
+        self.rows = rows
+        self.cols = cols
+        sin_edges = np.linspace(-1.0, 1.0, rows + 1)
+        self.lat_centers = np.degrees(np.arcsin((sin_edges[:-1] + sin_edges[1:]) / 2))
+        self.lon_step = 360.0 / cols
+        self.lon_centers = -180.0 + (np.arange(cols) + 0.5) * self.lon_step
+        self.cell_area_km2 = 4 * math.pi * EARTH_RADIUS_KM ** 2 / (rows * cols)
+
+    def describe(self):
+        return {'rows': self.rows, 'cols': self.cols, 'projection': 'lambert-cylindrical-equal-area',
+                'cell_area_km2': round(self.cell_area_km2, 1)}
+
+    def rasterize(self, features):
+        """按扫描线栅格化多边形，返回 (rows, cols) 的 int16 数组：格子中心所在要素的编号，不在任何要素内为 -1
+        每条边与其跨越的各行中心纬度求交点，在交点右侧第一个格子处翻转奇偶，
+        逐行累加后奇数即为内部；同一要素的所有环一起计算，内环（洞）自然被扣除"""
+        result = np.full((self.rows, self.cols), -1, dtype=np.int16)
+        for index, rings in enumerate(features):
+            toggles = np.zeros((self.rows, self.cols + 1), dtype=np.int32)
+            for ring in rings:
+                points = np.asarray(ring, dtype=np.float64)
+                if len(points) < 3:
+                    continue
+                start, end = points, np.roll(points, -1, axis=0)
+                low = np.minimum(start[:, 1], end[:, 1])
+                high = np.maximum(start[:, 1], end[:, 1])
+                # 边覆盖满足 low <= 中心纬度 < high 的行
+                first = np.searchsorted(self.lat_centers, low, side='left')
+                counts = np.searchsorted(self.lat_centers, high, side='left') - first
+                if not counts.sum():
+                    continue
+                edge = np.repeat(np.arange(len(points)), counts)
+                rows = first[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                (x1, y1), (x2, y2) = start[edge].T, end[edge].T
+                x = x1 + (self.lat_centers[rows] - y1) * (x2 - x1) / (y2 - y1)
+                cols = np.clip(np.floor((x + 180.0) / self.lon_step - 0.5).astype(np.int64) + 1, 0, self.cols)
+                np.add.at(toggles, (rows, cols), 1)
+            inside = (np.cumsum(toggles[:, :-1], axis=1) & 1).astype(bool)
+            result[inside & (result < 0)] = index
+        return result
+
+
+def feature_rings(geometry):
+    """Polygon / MultiPolygon 的所有环"""
+    if geometry['type'] == 'Polygon':
+        return geometry['coordinates']
+    return [ring for polygon in geometry['coordinates'] for ring in polygon]
+
+
+@lru_cache(maxsize=4)
+def land_mask(rows=GRID_ROWS, cols=GRID_COLS, source=SOURCE_PATH):
+    """栅格化世界地图，返回 (网格, 国家名列表, 国家编号栅格)；与节点无关，按网格大小缓存"""
+    grid = EqualAreaGrid(rows, cols)
+    features = decode_geojson(load_source(source))['features']
+    names = [feature['properties']['name'] for feature in features]
+    countries = grid.rasterize([feature_rings(feature['geometry']) for feature in features])
+    countries.setflags(write=False)
+    return grid, names, countries
+
+
+class CoverageGrid:
+    """陆地格子到各供应商最近区域的距离（构建后只读，可多线程共享）"""
+
+    def __init__(self, nodes, rows=GRID_ROWS, cols=GRID_COLS, statuses=('active',)):
+        self.grid, self.country_names, raster = land_mask(rows, cols)
+        self.raster = raster
+        self.cells = np.flatnonzero(raster.ravel() >= 0)
+        self.cell_country = raster.ravel()[self.cells]
+        self.cell_lat = self.grid.lat_centers[self.cells // cols]
+        self.cell_lon = self.grid.lon_centers[self.cells % cols]
+
+        self.nodes = [node for node in nodes if not statuses or node['status'] in statuses]
+        self.keys = [region_key(node) for node in self.nodes]
+        self.providers = list(dict.fromkeys(node['provider'] for node in self.nodes))
+        self.provider_rows = {provider: i for i, provider in enumerate(self.providers)}
+
+        # 供应商 × 陆地格子：最近区域的距离（公里）与其在 self.nodes 中的下标
+        self.distance = np.full((len(self.providers), len(self.cells)), np.inf, dtype=np.float32)
+        self.nearest = np.full((len(self.providers), len(self.cells)), -1, dtype=np.int32)
+        cell_points = to_unit_vectors(self.cell_lat, self.cell_lon)
+        node_points = to_unit_vectors([n['location']['latitude'] for n in self.nodes],
+                                      [n['location']['longitude'] for n in self.nodes])
+        owners = np.array([self.provider_rows[n['provider']] for n in self.nodes], dtype=np.int64)
+        self.region_counts = np.bincount(owners, minlength=len(self.providers))
+        for row in range(len(self.providers)):
+            members = np.flatnonzero(owners == row)
+            for start in range(0, len(self.cells), DISTANCE_BATCH):
+                batch = slice(start, start + DISTANCE_BATCH)
+                dots = cell_points[batch] @ node_points[members].T
+                best = np.argmax(dots, axis=1)
+                chord = np.sqrt(np.maximum(2 - 2 * dots[np.arange(len(best)), best], 0.0))
+                self.distance[row, batch] = chord_to_km(chord)
+                self.nearest[row, batch] = members[best]
+
+    def _rows(self, providers):
+        if not providers:
+            return list(range(len(self.providers)))
+        unknown = [p for p in providers if p not in self.provider_rows]
+        if unknown:
+            raise ValueError(f"未知供应商: {', '.join(unknown)}")
+        return [self.provider_rows[p] for p in dict.fromkeys(providers)]
+
+    def nearest_distance(self, providers=None):
+        """供应商组合下每个陆地格子到最近区域的 (距离, 区域下标)"""
+        rows = self._rows(providers)
+        distance = self.distance[rows]
+        which = np.argmin(distance, axis=0)
+        columns = np.arange(distance.shape[1])
+        return distance[which, columns], self.nearest[rows][which, columns]
+
+    def _area(self, count):
+        return round(float(count) * self.grid.cell_area_km2, 0)
+
+    def _stats(self, values):
+        if not len(values):
+            return None
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        return {'p50': round(float(p50), 1), 'p90': round(float(p90), 1), 'p99': round(float(p99), 1),
+                'max': round(float(values.max()), 1)}
+
+    def analyze(self, providers=None, max_km=None, max_ms=None, limit=20, cells=False):
+        """覆盖缺口报告：到最近区域超过阈值（取 max_km 与 max_ms 对应距离中较小者）的陆地为缺口"""
+        if limit < 0:
+            raise ValueError("limit 不能为负数")
+        limit = min(limit, MAX_RESULTS)
+        rows = self._rows(providers)
+        if max_km is None and max_ms is None:
+            max_km = DEFAULT_MAX_KM
+        thresholds = [value for value in (max_km, None if max_ms is None else rtt_to_distance(max_ms))
+                      if value is not None]
+        limit_km = min(thresholds)
+        if limit_km <= 0:
+            raise ValueError("阈值必须为正数")
+
+        distance, nearest = self.nearest_distance([self.providers[r] for r in rows])
+        gap = distance > limit_km
+        land_counts = np.bincount(self.cell_country, minlength=len(self.country_names))
+        gap_counts = np.bincount(self.cell_country[gap], minlength=len(self.country_names))
+        gap_sums = np.bincount(self.cell_country[gap], weights=distance[gap], minlength=len(self.country_names))
+
+        # 每个国家最远的格子：按 (国家, 距离) 排序后取每组最后一个
+        order = np.lexsort((distance, self.cell_country))
+        last = np.flatnonzero(np.r_[self.cell_country[order][1:] != self.cell_country[order][:-1], True])
+        farthest = dict(zip(self.cell_country[order][last].tolist(), order[last].tolist()))
+
+        ranked = np.flatnonzero(gap_counts)
+        ranked = ranked[np.lexsort((-gap_counts[ranked] / land_counts[ranked], -gap_counts[ranked]))][:limit]
+        countries = []
+        for country in ranked:
+            cell = farthest[country]
+            countries.append({
+                'name': self.country_names[country],
+                'land_area_km2': self._area(land_counts[country]),
+                'gap_area_km2': self._area(gap_counts[country]),
+                'gap_share': round(float(gap_counts[country] / land_counts[country]), 4),
+                'mean_gap_distance_km': round(float(gap_sums[country] / gap_counts[country]), 1),
+                'farthest': self._cell_entry(cell, distance, nearest),
+            })
+
+        result = {
+            'providers': [self.providers[r] for r in rows],
+            'regions': int(self.region_counts[rows].sum()),
+            'grid': dict(self.grid.describe(), land_cells=int(len(self.cells))),
+            'threshold': {'max_km': round(limit_km, 1), 'max_ms': round(distance_to_rtt(limit_km), 2)},
+            'summary': {
+                'land_area_km2': self._area(len(self.cells)),
+                'covered_area_km2': self._area(len(self.cells) - gap.sum()),
+                'gap_area_km2': self._area(gap.sum()),
+                'covered_share': round(float(1 - gap.mean()), 4) if len(gap) else 1.0,
+                'distance_km': self._stats(distance),
+                'rtt_ms': self._stats(distance_to_rtt(distance)),
+            },
+            'countries': countries,
+            'provider_impact': self._provider_impact(rows, limit_km, int(gap.sum())),
+        }
+        if cells:
+            indices = np.flatnonzero(gap)
+            result['cells'] = [[round(float(self.cell_lat[i]), 2), round(float(self.cell_lon[i]), 2),
+                                round(float(distance[i]), 1)] for i in indices]
+        return result
+
+    def _cell_entry(self, cell, distance, nearest):
+        km = float(distance[cell])
+        return {
+            'latitude': round(float(self.cell_lat[cell]), 2),
+            'longitude': round(float(self.cell_lon[cell]), 2),
+            'distance_km': round(km, 1),
+            'rtt_ms': round(distance_to_rtt(km), 2),
+            'nearest': self.keys[nearest[cell]],
+        }
+
+    def _provider_impact(self, rows, limit_km, gap_cells):
+        """组合中每个供应商单独的覆盖面积，以及从组合中去掉它后增加的缺口面积"""
+        within = self.distance[rows] <= limit_km
+        impact = []
+        for i, row in enumerate(rows):
+            others = np.delete(within, i, axis=0).any(axis=0) if len(rows) > 1 else np.zeros(len(self.cells), bool)
+            impact.append({
+                'provider': self.providers[row],
+                'covered_area_km2': self._area(within[i].sum()),
+                'covered_share': round(float(within[i].mean()), 4) if len(self.cells) else 1.0,
+                'exclusive_area_km2': self._area(len(self.cells) - gap_cells - others.sum()),
+            })
+        impact.sort(key=lambda entry: -entry['exclusive_area_km2'])
+        return impact
+
+    def render(self, report, output):
+        """绘制覆盖图：陆地按到最近区域的距离着色，缺口以红色覆盖，黑点为组合中的区域"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import ListedColormap
+
+        plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
+
+        limit_km = report['threshold']['max_km']
+        distance, _ = self.nearest_distance(report['providers'])
+        image = np.full(self.grid.rows * self.grid.cols, np.nan, dtype=np.float32)
+        image[self.cells] = distance
+        image = image.reshape(self.grid.rows, self.grid.cols)
+        gap_image = np.where(image > limit_km, 1.0, np.nan)
+
+        fig, ax = plt.subplots(figsize=(16, 6.5))
+        ax.set_facecolor('#dce9f5')
+        extent = (-180, 180, -1, 1)
+        shown = ax.imshow(image, origin='lower', extent=extent, cmap='YlGnBu_r', vmin=0, vmax=limit_km,
+                          interpolation='nearest')
+        ax.imshow(gap_image, origin='lower', extent=extent, cmap=ListedColormap(['#d62728']), alpha=0.75,
+                  interpolation='nearest')
+        selected = set(report['providers'])
+        regions = [n for n in self.nodes if n['provider'] in selected]
+        ax.scatter([n['location']['longitude'] for n in regions],
+                   np.sin(np.radians([n['location']['latitude'] for n in regions])), s=6, c='black', zorder=3)
+
+        # 纵轴为 sin(纬度)，按等积投影的比例显示，刻度标为纬度
+        ax.set_aspect(180 / math.pi)
+        latitudes = [-60, -30, 0, 30, 60]
+        ax.set_yticks(np.sin(np.radians(latitudes)))
+        ax.set_yticklabels([f'{lat}°' for lat in latitudes])
+        ax.set_xticks(range(-180, 181, 60))
+        ax.set_xticklabels([f'{lon}°' for lon in range(-180, 181, 60)])
+
+        summary = report['summary']
+        names = ', '.join(report['providers']) if len(report['providers']) <= 4 else f"{len(report['providers'])} 个供应商"
+        ax.set_title(f"覆盖缺口：{names}（阈值 {limit_km:g} 公里 / {report['threshold']['max_ms']:g} ms，"
+                     f"陆地覆盖率 {summary['covered_share']:.1%}）", fontsize=14, fontweight='bold')
+        fig.colorbar(shown, ax=ax, shrink=0.8, label='到最近区域的距离（公里），红色为超出阈值')
+        plt.savefig(output, dpi=150, bbox_inches='tight')
+        plt.close(fig)
+
+
+def main():
+    from node_dataset import load_merged_nodes
+
+    parser = argparse.ArgumentParser(description='等面积网格上的覆盖缺口分析')
+    parser.add_argument('--providers', '-p', default=None, help='逗号分隔的供应商ID，默认全部供应商')
+    parser.add_argument('--max-km', type=float, default=None, help=f'距离阈值（公里），默认 {DEFAULT_MAX_KM:g}')
+    parser.add_argument('--max-ms', type=float, default=None, help='估算 RTT 阈值（毫秒）')
+    parser.add_argument('--rows', type=int, default=GRID_ROWS, help='网格行数')
+    parser.add_argument('--cols', type=int, default=GRID_COLS, help='网格列数')
+    parser.add_argument('--limit', type=int, default=20, help='列出的国家数')
+    parser.add_argument('--output', type=Path, default=OUTPUT_STEM, help='输出文件路径（不含扩展名）')
+    parser.add_argument('--cells', action='store_true', help='在 JSON 中包含所有缺口格子')
+    parser.add_argument('--no-png', action='store_true', help='不生成覆盖图')
+    args = parser.parse_args()
+
+    _, nodes = load_merged_nodes()
+    started = time.perf_counter()
+    coverage = CoverageGrid(nodes, args.rows, args.cols)
+    built = time.perf_counter()
+    providers = args.providers.split(',') if args.providers else None
+    try:
+        report = coverage.analyze(providers, args.max_km, args.max_ms, args.limit, args.cells)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"网格 {args.rows}×{args.cols}，陆地格子 {len(coverage.cells)} 个，构建 {built - started:.2f}s，"
+          f"查询 {(time.perf_counter() - built) * 1000:.1f}ms")
+
+    summary = report['summary']
+    print(f"供应商: {', '.join(report['providers'])}")
+    print(f"阈值: {report['threshold']['max_km']:g} 公里（约 {report['threshold']['max_ms']:g} ms），"
+          f"陆地覆盖率 {summary['covered_share']:.1%}，缺口 {summary['gap_area_km2']:,.0f} 平方公里")
+    for entry in report['countries']:
+        farthest = entry['farthest']
+        print(f"  {entry['name']:<28} 缺口 {entry['gap_area_km2']:>12,.0f} km² ({entry['gap_share']:>6.1%})"
+              f"  最远 {farthest['distance_km']:>7.1f} km -> {farthest['nearest']}")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    json_path = args.output.with_suffix('.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ {json_path}")
+    if not args.no_png:
+        png_path = args.output.with_suffix('.png')
+        coverage.render(report, png_path)
+        print(f"✓ {png_path}")
+
+
+if __name__ == "__main__":
+    main()
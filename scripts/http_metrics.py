@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 服务的请求指标与异步访问日志
+- RequestMetrics：按 (路由, 方法, 状态码) 统计请求数、发送字节数与延迟直方图，
+  另有按名称和标签计数的通用计数器（缓存命中等）。每个线程写自己的分片，
+  记录一次请求不需要加锁；连接结束时分片并入汇总（每连接一个线程时线程不会复用），
+  /metrics 抓取时合并各分片并输出 Prometheus 文本格式
+- AccessLog：访问日志先放入内存队列，由后台线程定期批量写出，
+  请求线程不再同步写 stderr；写出跟不上时丢弃并计数，而不是阻塞请求
+"""
+
+import bisect
+import sys
+import threading
+import time
+from collections import deque
+
+# 延迟直方图的桶上界（秒），最后隐含 +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 访问日志队列上限与批量写出间隔（秒）
+ACCESS_LOG_MAX_PENDING = 10000
+ACCESS_LOG_FLUSH_INTERVAL = 0.5
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shard:
+    """单个线程的统计分片，只由所属线程写入"""
+
+    def __init__(self):
+        # (route, method, status) -> [请求数, 延迟总和, 发送字节数, 各桶计数...]
+        self.requests = {}
+        # (name, labels) -> 计数
+        self.counters = {}
+        self.in_flight = 0
+
+
+class RequestMetrics:
+    """请求指标注册表（线程安全，记录路径无锁）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # 已结束线程的分片合并到这里
+        self._retired = _Shard()
+        self._local = threading.local()
+        # 抓取时调用的回调，返回 [(指标名, 类型, 说明, 值)]，用于数据集版本等即时值
+        self._gauges = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def release(self):
+        """把当前线程的分片并入汇总（连接结束时调用）"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            return
+        del self._local.shard
+        with self._shards_lock:
+            self._shards.remove(shard)
+            merge_shard(self._retired, shard)
+
+    def request_started(self):
+        self._shard().in_flight += 1
+
+    def observe(self, route, method, status, seconds, sent_bytes):
+        """记录一次已完成的请求"""
+        shard = self._shard()
+        shard.in_flight -= 1
+        key = (route, method, str(status))
+        stats = shard.requests.get(key)
+        if stats is None:
+            stats = shard.requests[key] = [0, 0.0, 0] + [0] * (len(self.buckets) + 1)
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += sent_bytes
+        stats[3 + bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def count(self, name, amount=1, **labels):
+        """通用计数器，如 count('cache_lookups', cache='asset', result='hit')"""
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        shard.counters[key] = shard.counters.get(key, 0) + amount
+
+    def add_gauge(self, callback):
+        """注册抓取时求值的指标回调"""
+        self._gauges.append(callback)
+
+    def snapshot(self):
+        """合并所有分片，返回 (requests, counters, in_flight)"""
+        total = _Shard()
+        with self._shards_lock:
+            merge_shard(total, self._retired)
+            for shard in self._shards:
+                merge_shard(total, shard)
+        return total.requests, total.counters, total.in_flight
+
+    def render(self, prefix='cloudmap'):
+        """Prometheus 文本格式（0.0.4）"""
+        requests, counters, in_flight = self.snapshot()
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        header('http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+        for (route, method, status), stats in sorted(requests.items()):
+            lines.append(f"{prefix}_http_requests_total{format_labels(route=route, method=method, status=status)} {stats[0]}")
+
+        header('http_response_bytes_total', 'counter', 'Bytes written to clients, headers included.')
+        for (route, method, status), stats in sorted(requests.items()):
+            lines.append(f"{prefix}_http_response_bytes_total{format_labels(route=route, method=method, status=status)} {stats[2]}")
+
+        header('http_request_duration_seconds', 'histogram', 'Time from request line to last byte written.')
+        for (route, method, status), stats in sorted(requests.items()):
+            cumulative = 0
+            for bound, value in zip(self.buckets + (None,), stats[3:]):
+                cumulative += value
+                le = '+Inf' if bound is None else format_number(bound)
+                lines.append(f"{prefix}_http_request_duration_seconds_bucket"
+                             f"{format_labels(route=route, method=method, status=status, le=le)} {cumulative}")
+            labels = format_labels(route=route, method=method, status=status)
+            lines.append(f"{prefix}_http_request_duration_seconds_sum{labels} {format_number(stats[1])}")
+            lines.append(f"{prefix}_http_request_duration_seconds_count{labels} {stats[0]}")
+
+        header('http_requests_in_flight', 'gauge', 'Requests currently being handled.')
+        lines.append(f"{prefix}_http_requests_in_flight {in_flight}")
+
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name in sorted(by_name):
+            header(f"{name}_total", 'counter', f"{name.replace('_', ' ').capitalize()}.")
+            for labels, value in sorted(by_name[name]):
+                lines.append(f"{prefix}_{name}_total{format_labels(**dict(labels))} {value}")
+
+        gauges = [('uptime_seconds', 'gauge', 'Seconds since the server started.', time.time() - self.started_at)]
+        for callback in self._gauges:
+            gauges.extend(callback())
+        for name, kind, help_text, value in gauges:
+            header(name, kind, help_text)
+            lines.append(f"{prefix}_{name} {format_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def merge_shard(target, shard):
+    """把 shard 累加到 target；dict.copy() 在持有 GIL 时完成，不会与写入线程的插入交错"""
+    for key, stats in shard.requests.copy().items():
+        merged = target.requests.get(key)
+        if merged is None:
+            target.requests[key] = list(stats)
+        else:
+            for i, value in enumerate(stats):
+                merged[i] += value
+    for key, value in shard.counters.copy().items():
+        target.counters[key] = target.counters.get(key, 0) + value
+    target.in_flight += shard.in_flight
+
+
+def format_labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def escape_label(value):
+    """标签值需转义反斜杠、双引号和换行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class AccessLog:
+    """后台线程批量写出的访问日志"""
+
+    def __init__(self, stream=None, flush_interval=ACCESS_LOG_FLUSH_INTERVAL, max_pending=ACCESS_LOG_MAX_PENDING):
+        self.stream = stream or sys.stderr
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = deque()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        """放入队列后立即返回；deque.append 本身是原子操作"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(line)
+
+    def flush(self):
+        lines = []
+        pending = self._pending
+        while pending:
+            try:
+                lines.append(pending.popleft())
+            except IndexError:
+                break
+        if lines:
+            try:
+                self.stream.write('\n'.join(lines) + '\n')
+                self.stream.flush()
+            except (OSError, ValueError):
+                self.dropped += len(lines)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
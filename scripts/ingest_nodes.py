@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多供应商节点数据异步采集
+按 providers-metadata.json 为每个供应商创建一个采集器（fetcher），用 asyncio 并发拉取：
+- 并发：asyncio.Semaphore 限制同时进行的请求数
+- 连接池：按 (协议, 主机, 端口) 复用 HTTP/1.1 keep-alive 连接（http.client 在线程中执行阻塞 I/O）
+- 重试：连接错误、429 与 5xx 按指数退避加随机抖动重试，遵守 Retry-After
+- 条件请求：上次响应的 ETag / Last-Modified 保存在 data/.ingest-state.json，
+  再次拉取时带 If-None-Match / If-Modified-Since，304 时直接跳过
+- 写入：结果先经节点模式（node_schema.py）校验，与现有文件内容（忽略 last_updated）
+  相同时不写；否则写入同目录临时文件后 os.replace 原子替换 data/<provider>/nodes.json，
+  last_updated 取上游的 Last-Modified（缺失时为拉取时间）
+
+采集器按名称注册（register_fetcher），供应商在元数据中用
+    "source": {"fetcher": "nodes_json", "url": "https://..."}
+指定来源；未配置 source 时可以用 --base-url 从镜像的 <base-url>/<provider 目录>/nodes.json 拉取。
+内置的 nodes_json 采集器要求上游直接提供与 nodes.json 相同格式的文档；
+其他格式的上游（区域列表 API 等）可注册新的采集器，在 parse() 中转换。
+
+stub 子命令启动一个本地 HTTP 服务，把目录中的文件当作供应商接口（支持 ETag/304、
+延迟与按间隔返回 503），可以离线验证并发、重试与条件请求。
+
+用法:
+    python scripts/ingest_nodes.py fetch --base-url http://mirror.example.com/cloud-nodes/
+    python scripts/ingest_nodes.py fetch --providers aws,azure --concurrency 2 --dry-run
+    python scripts/ingest_nodes.py stub --root /tmp/upstream --port 9000 --fail-every 3
+"""
+
+import argparse
+import asyncio
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from provider_registry import PROJECT_ROOT, ProviderRegistry
+from node_schema import SchemaError, normalize_document
+
+STATE_PATH = PROJECT_ROOT / 'data' / '.ingest-state.json'
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 20.0
+# 指数退避的初始间隔与上限（秒）
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = 'cloud-nodes-map-ingest/1.0'
+# 比较新旧内容时忽略的字段（上游每次生成都会变化）
+VOLATILE_FIELDS = ('last_updated',)
+
+FETCHERS = {}
+
+
+def register_fetcher(cls):
+    """类装饰器：按 cls.name 注册采集器"""
+    FETCHERS[cls.name] = cls
+    return cls
+
+
+@register_fetcher
+class NodesJsonFetcher:
+    """上游直接提供与 nodes.json 相同格式的文档"""
+
+    name = 'nodes_json'
+
+    def __init__(self, provider_id, url, **options):
+        self.provider_id = provider_id
+        self.url = url
+        self.options = options
+
+    def parse(self, body, current):
+        """把响应体转换为 nodes.json 文档；current 为现有文档（不存在时为 None）"""
+        document = json.loads(body)
+        if isinstance(document, dict) and current:
+            # 上游缺少的头部字段（provider、version 等）沿用现有文件；last_updated 不沿用，内容变化时重新生成
+            for key, value in current.items():
+                if key != 'nodes' and key not in VOLATILE_FIELDS:
+                    document.setdefault(key, value)
+        return document
+
+
+def build_fetchers(registry, provider_ids, base_url=None):
+    """根据元数据的 source 配置（或 --base-url 镜像）为每个供应商创建采集器"""
+    fetchers = {}
+    for provider_id in provider_ids:
+        info = registry.info(provider_id)
+        source = dict(info.get('source') or {})
+        if not source and base_url:
+            # data/aws/nodes.json -> <base_url>/aws/nodes.json
+            relative = Path(info['data_path']).relative_to('data').as_posix()
+            source = {'fetcher': NodesJsonFetcher.name, 'url': urljoin(base_url.rstrip('/') + '/', relative)}
+        if not source:
+            continue
+        name = source.pop('fetcher', NodesJsonFetcher.name)
+        if name not in FETCHERS:
+            raise ValueError(f"{provider_id}: 未知的采集器 {name!r}（可选 {', '.join(FETCHERS)}）")
+        fetchers[provider_id] = FETCHERS[name](provider_id, **source)
+    return fetchers
+
+
+# ---- HTTP ----
+
+class FetchError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class ConnectionPool:
+    """按 (协议, 主机, 端口) 复用的 http.client 连接池（线程安全）"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_idle=DEFAULT_CONCURRENCY):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key):
+        """返回 (连接, 是否为复用的空闲连接)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, url, headers):
+        """发送 GET 请求，返回 (状态码, 响应头, 响应体)；在工作线程中调用"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                # 空闲连接可能已被服务端关闭，换新连接重发；新连接失败则交给调用方重试
+                if not reused:
+                    raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return response.status, response.headers, body
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+def retry_after_seconds(value):
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+async def fetch(pool, url, state, retries):
+    """带条件请求与重试的 GET，返回 (状态码, 响应头, 响应体)"""
+    headers = {'User-Agent': USER_AGENT, 'Accept': 'application/json', 'Accept-Encoding': 'identity'}
+    if state.get('url') == url:
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+    attempt = 0
+    while True:
+        try:
+            status, response_headers, body = await asyncio.to_thread(pool.request, url, headers)
+            if status in RETRY_STATUSES:
+                raise FetchError(f"HTTP {status}", retryable=True,
+                                 retry_after=retry_after_seconds(response_headers.get('Retry-After')))
+            if status not in (200, 304):
+                raise FetchError(f"HTTP {status}")
+            return status, response_headers, body
+        except (OSError, http.client.HTTPException) as e:
+            error = FetchError(f"{type(e).__name__}: {e}", retryable=True)
+        except FetchError as e:
+            error = e
+        if not error.retryable or attempt >= retries:
+            raise error
+        await asyncio.sleep(backoff_delay(attempt, error.retry_after))
+        attempt += 1
+
+
+# ---- 写入 ----
+
+def updated_at(headers):
+    """新内容的 last_updated：上游的 Last-Modified，缺失或无法解析时为拉取时间（本地时间，与数据文件一致）"""
+    try:
+        moment = parsedate_to_datetime(headers.get('Last-Modified')).astimezone()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        moment = datetime.now()
+    return moment.replace(tzinfo=None, microsecond=0).isoformat()
+
+
+def comparable(document):
+    return {key: value for key, value in document.items() if key not in VOLATILE_FIELDS}
+
+
+def write_atomic(path, data):
+    """写入同目录临时文件并 fsync 后替换，读者不会看到写了一半的文件"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+async def ingest_provider(provider_id, fetcher, data_path, pool, semaphore, state, retries, dry_run):
+    """拉取、校验并（内容变化时）写入一个供应商，返回结果记录"""
+    result = {'provider': provider_id, 'url': fetcher.url}
+    started = time.perf_counter()
+    # 本地文件缺失时不发条件请求，否则 304 后永远不会重新生成
+    previous = state.get(provider_id, {}) if data_path.exists() else {}
+    try:
+        async with semaphore:
+            status, headers, body = await fetch(pool, fetcher.url, previous, retries)
+        if status == 304:
+            result['status'] = 'not_modified'
+            return result
+
+        try:
+            current = json.loads(data_path.read_bytes())
+        except (OSError, ValueError):
+            current = None
+        document = fetcher.parse(body, current)
+        normalize_document(document, provider_id, fetcher.url)
+
+        entry = {'url': fetcher.url, 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified'),
+                 'content_hash': hashlib.sha1(body).hexdigest(), 'fetched_at': formatdate(usegmt=True)}
+        if current is not None and comparable(current) == comparable(document):
+            result['status'] = 'unchanged'
+        else:
+            document.setdefault('last_updated', updated_at(headers))
+            result['status'] = 'updated' if current is not None else 'created'
+            result['nodes'] = len(document['nodes'])
+            if not dry_run:
+                data_path.parent.mkdir(parents=True, exist_ok=True)
+                write_atomic(data_path, (json.dumps(document, ensure_ascii=False, indent=2) + '\n').encode('utf-8'))
+        if not dry_run:
+            state[provider_id] = entry
+    except SchemaError as e:
+        result['status'] = 'invalid'
+        result['error'] = str(e)
+    except (FetchError, ValueError) as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+
+
+async def ingest_all(provider_ids=None, base_url=None, root=PROJECT_ROOT, concurrency=DEFAULT_CONCURRENCY,
+                     retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, dry_run=False, state_path=None):
+    """并发采集所有（或指定）供应商，返回结果记录列表（按供应商顺序）"""
+    root = Path(root)
+    registry = ProviderRegistry(root)
+    provider_ids = registry.select(provider_ids)
+    fetchers = build_fetchers(registry, provider_ids, base_url)
+    state_path = Path(state_path or root / 'data' / '.ingest-state.json')
+    state = load_state(state_path)
+
+    pool = ConnectionPool(timeout, max_idle=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        results = await asyncio.gather(*(
+            ingest_provider(provider_id, fetcher, registry.data_path(provider_id),
+                            pool, semaphore, state, retries, dry_run)
+            for provider_id, fetcher in fetchers.items()
+        ))
+    finally:
+        pool.close()
+    if not dry_run:
+        save_state(state, state_path)
+    skipped = [pid for pid in provider_ids if pid not in fetchers]
+    return list(results) + [{'provider': pid, 'status': 'no_source'} for pid in skipped]
+
+
+# ---- 离线测试用的上游模拟服务 ----
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """把目录中的文件当作供应商接口：强 ETag、If-None-Match 返回 304，可注入延迟与 503"""
+
+    protocol_version = 'HTTP/1.1'
+    root = None
+    delay = 0.0
+    fail_every = 0
+    verbose = False
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def do_GET(self):
+        with self._counter_lock:
+            StubHandler._counter += 1
+            count = StubHandler._counter
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_every and count % self.fail_every == 0:
+            return self._reply(503, b'{"error":"injected failure"}', {'Retry-After': '0'})
+
+        path = (Path(self.root) / urlsplit(self.path).path.lstrip('/')).resolve()
+        if Path(self.root).resolve() not in path.parents or not path.is_file():
+            return self._reply(404, b'{"error":"not found"}')
+        body = path.read_bytes()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return self._reply(304, b'', {'ETag': etag})
+        self._reply(200, body, {'ETag': etag, 'Last-Modified': formatdate(path.stat().st_mtime, usegmt=True)})
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+class StubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_stub_server(root, port=0, delay=0.0, fail_every=0, verbose=False):
+    """在后台线程启动模拟上游，返回 (server, base_url)"""
+    handler = type('StubHandler', (StubHandler,), {'root': str(root), 'delay': delay, 'fail_every': fail_every,
+                                                   'verbose': verbose})
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, name='ingest-stub', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+STATUS_LABELS = {
+    'created': '✓ 新建', 'updated': '✓ 已更新', 'unchanged': '= 内容未变化', 'not_modified': '= 304 未修改',
+    'no_source': '- 未配置来源', 'invalid': '✗ 不符合节点模式', 'failed': '✗ 拉取失败',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发采集各供应商节点数据')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = sub.add_parser('fetch', help='拉取并写入 data/<provider>/nodes.json')
+    fetch_parser.add_argument('--providers', '-p', default=None, help='逗号分隔的供应商ID，默认全部')
+    fetch_parser.add_argument('--base-url', default=None,
+                              help='镜像地址：未配置 source 的供应商从 <base-url>/<provider 目录>/nodes.json 拉取')
+    fetch_parser.add_argument('--concurrency', '-c', type=int, default=DEFAULT_CONCURRENCY, help='最大并发请求数')
+    fetch_parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='失败后的最大重试次数')
+    fetch_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='单次请求超时（秒）')
+    fetch_parser.add_argument('--dry-run', action='store_true', help='只拉取和校验，不写文件')
+
+    stub_parser = sub.add_parser('stub', help='启动模拟上游（离线测试）')
+    stub_parser.add_argument('--root', type=Path, default=PROJECT_ROOT / 'data', help='提供文件的目录')
+    stub_parser.add_argument('--port', type=int, default=9000)
+    stub_parser.add_argument('--delay', type=float, default=0.0, help='每个请求的延迟（秒）')
+    stub_parser.add_argument('--fail-every', type=int, default=0, help='每 N 个请求返回一次 503')
+    args = parser.parse_args()
+
+    if args.command == 'stub':
+        server, base_url = start_stub_server(args.root, args.port, args.delay, args.fail_every, verbose=True)
+        print(f"模拟上游已启动: {base_url}（目录 {args.root}），按 Ctrl+C 停止")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    started = time.perf_counter()
+    results = asyncio.run(ingest_all(args.providers.split(',') if args.providers else None, args.base_url,
+                                     concurrency=args.concurrency, retries=args.retries,
+                                     timeout=args.timeout, dry_run=args.dry_run))
+    for result in results:
+        detail = result.get('error') or (f"{result['nodes']} 个节点" if 'nodes' in result else '')
+        seconds = f"{result['seconds']:.2f}s" if 'seconds' in result else ''
+        print(f"{STATUS_LABELS[result['status']]:<14} {result['provider']:<16} {seconds:>7}  {detail}")
+    failed = sum(result['status'] in ('failed', 'invalid') for result in results)
+    print(f"完成 {len(results)} 个供应商，{failed} 个失败（{time.perf_counter() - started:.1f}s）"
+          f"{'，未写入文件' if args.dry_run else ''}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
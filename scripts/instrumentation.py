@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告流水线的分阶段计时与剖析
+用 stage() 包住流水线中的各个阶段（JSON 解析、规范化、聚合、Markdown 写出、savefig 等），
+启用后每个阶段结束时输出一行 JSON：
+
+    {"event": "stage", "stage": "savefig", "path": "render_all/render/savefig",
+     "wall_s": 0.412, "cpu_s": 0.401, "peak_kb": 5120.0, "pid": 1234, "output": "aws_summary.png"}
+
+- wall_s / cpu_s：perf_counter 与 process_time 之差
+- peak_kb：启用 memory 时 tracemalloc 在阶段内（包含子阶段）观察到的 Python 内存占用峰值
+- 启用 cprofile=<模式> 时，名称匹配该 fnmatch 模式的阶段另存 cProfile 结果
+  （<profile_dir>/<stage>-<pid>-<n>.prof，可用 python -m pstats 或 snakeviz 查看）
+
+通过环境变量 CLOUD_MAP_PROFILE 或脚本的 --profile 参数启用，值为逗号分隔的选项：
+    1 / on              只计时
+    memory              同时跟踪内存峰值
+    cprofile=<模式>      剖析匹配的阶段，如 cprofile=savefig 或 cprofile=*
+    output=<路径>        追加写入该文件（默认标准错误）
+    profile_dir=<目录>   cProfile 结果目录（默认 .bench/profiles）
+
+未启用时 stage() 直接返回一个共享的空上下文，开销只有一次函数调用。
+
+用法:
+    CLOUD_MAP_PROFILE=memory,output=stages.jsonl python scripts/alibaba_cloud_analysis.py
+    python scripts/alibaba_cloud_visualization.py --force --profile cprofile=savefig
+    python scripts/instrumentation.py stages.jsonl            # 按阶段汇总日志
+"""
+
+import argparse
+import contextlib
+import cProfile
+import fnmatch
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+PROFILE_ENV = 'CLOUD_MAP_PROFILE'
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PROFILE_DIR = PROJECT_ROOT / '.bench' / 'profiles'
+
+_NULL_STAGE = contextlib.nullcontext()
+# 当前配置；None 表示未启用
+_config = None
+_local = threading.local()
+_write_lock = threading.Lock()
+_profile_counter = 0
+_profile_active = False
+
+
+def parse_spec(spec):
+    """解析 "memory,cprofile=savefig,output=x.jsonl" 形式的选项；空值或 0/off 表示不启用"""
+    spec = (spec or '').strip()
+    if spec.lower() in ('', '0', 'off', 'false', 'no'):
+        return None
+    config = {'memory': False, 'cprofile': None, 'output': None, 'profile_dir': DEFAULT_PROFILE_DIR}
+    for option in spec.split(','):
+        name, _, value = option.strip().partition('=')
+        if name in ('1', 'on', 'true', 'yes', ''):
+            continue
+        if name == 'memory':
+            config['memory'] = True
+        elif name == 'cprofile':
+            config['cprofile'] = value or '*'
+        elif name == 'output':
+            config['output'] = value
+        elif name == 'profile_dir':
+            config['profile_dir'] = Path(value)
+        else:
+            raise ValueError(f"未知的剖析选项: {name}（可选 on、memory、cprofile=、output=、profile_dir=）")
+    return config
+
+
+def configure(spec=None):
+    """启用或关闭计时；spec 为 None 时读取环境变量 CLOUD_MAP_PROFILE。返回是否已启用"""
+    global _config
+    if spec is None:
+        spec = os.environ.get(PROFILE_ENV)
+    config = parse_spec(spec)
+    if config is None:
+        _config = None
+        return False
+
+    if config['output']:
+        Path(config['output']).parent.mkdir(parents=True, exist_ok=True)
+        config['stream'] = open(config['output'], 'a', encoding='utf-8', buffering=1)
+    else:
+        config['stream'] = sys.stderr
+    if config['memory'] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _config = config
+    return True
+
+
+def enabled():
+    return _config is not None
+
+
+def add_argument(parser):
+    """为脚本添加 --profile 参数（不带值等同于 on）"""
+    parser.add_argument('--profile', nargs='?', const='on', default=None, metavar='OPTIONS',
+                        help=f'输出分阶段计时 JSON 行，选项同环境变量 {PROFILE_ENV}，如 memory,cprofile=savefig')
+
+
+def emit(record):
+    """写出一行 JSON 记录（未启用时忽略）"""
+    config = _config
+    if config is None:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _write_lock:
+        config['stream'].write(line + '\n')
+        config['stream'].flush()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Stage:
+    """一次阶段计时；进入时记录起点，退出时写出记录"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.profiler = None
+
+    def __enter__(self):
+        global _profile_counter, _profile_active
+        config = _config
+        stack = _stack()
+        self.path = '/'.join([frame.name for frame in stack] + [self.name])
+        self.peak = 0
+        if config['memory']:
+            # tracemalloc 只有一个全局峰值：把已有峰值记入外层阶段后再清零，退出时向外层汇总
+            _, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        # cProfile 不能嵌套启用，外层已在剖析时内层不再单独剖析
+        if config['cprofile'] and not _profile_active and fnmatch.fnmatch(self.name, config['cprofile']):
+            _profile_active = True
+            _profile_counter += 1
+            self.profile_index = _profile_counter
+            self.profiler = cProfile.Profile()
+        stack.append(self)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _profile_active
+        if self.profiler:
+            self.profiler.disable()
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        config = _config
+        stack = _stack()
+        stack.pop()
+
+        record = {'event': 'stage', 'stage': self.name, 'path': self.path,
+                  'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+        if config['memory'] and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            record['peak_kb'] = round(self.peak / 1024, 1)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        if self.profiler:
+            _profile_active = False
+            profile_dir = Path(config['profile_dir'])
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_path = profile_dir / f"{self.name}-{os.getpid()}-{self.profile_index}.prof"
+            self.profiler.dump_stats(profile_path)
+            record['profile'] = str(profile_path)
+        record['pid'] = os.getpid()
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        record.update(self.fields)
+        emit(record)
+        return False
+
+
+def stage(name, **fields):
+    """计时上下文：with stage('load', provider='aws'): ...；fields 原样附加到记录中"""
+    if _config is None:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def timed(name=None):
+    """函数装饰器版本的 stage()，阶段名默认为函数名"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _config is None:
+                return func(*args, **kwargs)
+            with _Stage(stage_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summarize(lines):
+    """按阶段路径汇总 JSON 行，返回 [(路径, 次数, 总墙钟, 总CPU, 最大峰值KB)]（按总墙钟降序）"""
+    totals = defaultdict(lambda: [0, 0.0, 0.0, None])
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('event') != 'stage':
+            continue
+        entry = totals[record['path']]
+        entry[0] += 1
+        entry[1] += record['wall_s']
+        entry[2] += record['cpu_s']
+        if 'peak_kb' in record:
+            entry[3] = max(entry[3] or 0, record['peak_kb'])
+    rows = [(path, *values) for path, values in totals.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按阶段汇总计时日志（JSON 行）')
+    parser.add_argument('log', nargs='?', default='-', help='日志文件，默认读取标准输入')
+    args = parser.parse_args()
+
+    if args.log == '-':
+        rows = summarize(sys.stdin)
+    else:
+        with open(args.log, 'r', encoding='utf-8') as f:
+            rows = summarize(f)
+
+    print(f"{'阶段':<48} {'次数':>6} {'墙钟(s)':>10} {'CPU(s)':>10} {'峰值(KB)':>10}")
+    for path, count, wall, cpu, peak in rows:
+        peak_text = f"{peak:>10.1f}" if peak is not None else f"{'-':>10}"
+        print(f"{path:<48} {count:>6} {wall:>10.3f} {cpu:>10.3f} {peak_text}")
+
+
+if __name__ == "__main__":
+    main()
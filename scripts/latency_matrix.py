@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+区域间延迟估算矩阵
+对所有节点一次性广播计算 区域 × 区域 的大圆距离和估算 RTT（无 Python 双重循环）：
+
+    RTT(a, b) = 2 × 距离 × 路由绕行系数 / 光纤传播速度 + 2 × 端点处理开销
+
+注意 network_info.latency 是从各供应商自己的参考位置测得的（远端区域可达 300ms 以上），
+并非区域的接入延迟，因此不参与区域两两之间的估算。
+矩阵以 float32 保存在 data/.latency/<哈希>.npy，哈希由节点坐标与模型参数计算，
+数据不变时直接以 mmap 方式读取。支持的查询：
+- rtt(a, b)：两个区域间的估算 RTT
+- best_pairs(max_ms)：RTT 低于阈值的跨云区域对（按 RTT 升序）
+- failover(k)：每个区域 RTT 最低的 k 个备选区域
+
+区域以 "provider/node_id" 标识，例如 aws/us-east-1。
+
+用法:
+    python scripts/latency_matrix.py pairs --max-ms 5
+    python scripts/latency_matrix.py failover aws/us-east-1 --k 3 --cross-provider
+    python scripts/latency_matrix.py rtt aws/us-east-1 alibaba_cloud/cn-hangzhou
+"""
+
+import argparse
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from spatial_index import EARTH_RADIUS_KM, to_unit_vectors
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_ROOT / 'data' / '.latency'
+
+# 光纤中的传播速度约为光速的 2/3（公里/毫秒）
+FIBER_KM_PER_MS = 200.0
+# 实际路由相对大圆路径的绕行系数
+ROUTE_FACTOR = 1.5
+# 每个端点的交换与处理开销（毫秒）
+ENDPOINT_OVERHEAD_MS = 1.0
+MAX_RESULTS = 1000
+
+
+def region_key(node):
+    return f"{node['provider']}/{node['node_id']}"
+
+
+def matrix_key(coords):
+    """由节点坐标和模型参数计算缓存键"""
+    digest = hashlib.sha1(np.ascontiguousarray(coords).tobytes())
+    digest.update(f"{FIBER_KM_PER_MS}:{ROUTE_FACTOR}:{ENDPOINT_OVERHEAD_MS}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def compute_matrices(coords):
+    """广播计算 (距离公里, RTT 毫秒) 两个 N×N float32 矩阵；coords 为 (N, 2) 的经纬度（度）
+    先按坐标分量累加单位向量差的平方得到弦长（近距离区域不会因 cos 接近 1 而损失精度），
+    再换算为大圆距离；全部为原地运算，只分配结果矩阵和一个临时矩阵"""
+    points = to_unit_vectors(coords[:, 0], coords[:, 1]).astype(np.float32)
+    size = len(points)
+    distance = np.zeros((size, size), dtype=np.float32)
+    diff = np.empty_like(distance)
+    for axis in range(3):
+        np.subtract(points[:, axis, None], points[None, :, axis], out=diff)
+        diff *= diff
+        distance += diff
+
+    np.sqrt(distance, out=distance)
+    distance *= np.float32(0.5)
+    np.minimum(distance, np.float32(1.0), out=distance)
+    np.arcsin(distance, out=distance)
+    distance *= np.float32(2 * EARTH_RADIUS_KM)
+
+    rtt = np.multiply(distance, np.float32(2 * ROUTE_FACTOR / FIBER_KM_PER_MS), out=diff)
+    rtt += np.float32(2 * ENDPOINT_OVERHEAD_MS)
+    return distance, rtt
+
+
+class LatencyMatrix:
+    """区域间距离与估算 RTT 矩阵（构建后只读，可多线程共享）"""
+
+    def __init__(self, nodes, distance, rtt, key):
+        self.nodes = nodes
+        self.distance = distance
+        self.rtt = rtt
+        self.key = key
+        self.keys = [region_key(node) for node in nodes]
+        self.positions = {k: i for i, k in enumerate(self.keys)}
+        self.providers = np.array([node['provider'] for node in nodes], dtype=object)
+
+    @classmethod
+    def build(cls, nodes, cache_dir=CACHE_DIR):
+        """构建矩阵；缓存目录中已有相同哈希的矩阵时直接 mmap 读取"""
+        coords = np.array([(n['location']['latitude'], n['location']['longitude']) for n in nodes],
+                          dtype=np.float64).reshape(-1, 2)
+        key = matrix_key(coords)
+
+        cache_path = Path(cache_dir) / f"{key}.npy" if cache_dir else None
+        if cache_path is not None and cache_path.exists():
+            try:
+                stacked = np.load(cache_path, mmap_mode='r')
+                if stacked.shape == (2, len(nodes), len(nodes)):
+                    return cls(nodes, stacked[0], stacked[1], key)
+            except (OSError, ValueError):
+                pass
+
+        distance, rtt = compute_matrices(coords)
+        if cache_path is not None:
+            _write_cache(cache_path, np.stack((distance, rtt)))
+        return cls(nodes, distance, rtt, key)
+
+    def index_of(self, region):
+        """区域标识 -> 行号"""
+        try:
+            return self.positions[region]
+        except KeyError:
+            raise ValueError(f"未知区域: {region}（格式为 provider/node_id）") from None
+
+    def _entry(self, row, col):
+        return {
+            'from': self.keys[row],
+            'to': self.keys[col],
+            'distance_km': round(float(self.distance[row, col]), 1),
+            'rtt_ms': round(float(self.rtt[row, col]), 2),
+        }
+
+    def rtt_between(self, a, b):
+        """两个区域间的距离与估算 RTT"""
+        return self._entry(self.index_of(a), self.index_of(b))
+
+    def _provider_mask(self, providers):
+        if not providers:
+            return np.ones(len(self.nodes), dtype=bool)
+        return np.isin(self.providers, list(providers))
+
+    def best_pairs(self, max_ms, providers=None, cross_provider=True, limit=20):
+        """RTT 不超过 max_ms 的区域对（每对只出现一次），按 RTT 升序；limit 为 0 时返回空列表"""
+        if limit < 0:
+            raise ValueError("limit 不能为负数")
+        if limit == 0:
+            return []
+        limit = min(limit, MAX_RESULTS)
+        selected = np.flatnonzero(self._provider_mask(providers))
+        rtt = np.asarray(self.rtt)[np.ix_(selected, selected)]
+
+        mask = np.triu(rtt <= max_ms, k=1)
+        if cross_provider:
+            provider_codes = np.unique(self.providers[selected], return_inverse=True)[1]
+            mask &= provider_codes[:, None] != provider_codes[None, :]
+
+        rows, cols = np.nonzero(mask)
+        values = rtt[rows, cols]
+        if len(values) > limit:
+            top = np.argpartition(values, limit - 1)[:limit]
+            rows, cols, values = rows[top], cols[top], values[top]
+        order = np.argsort(values, kind='stable')
+        return [self._entry(selected[rows[i]], selected[cols[i]]) for i in order]
+
+    def failover(self, k=3, regions=None, providers=None, cross_provider=False):
+        """每个区域（或指定区域）RTT 最低的 k 个备选区域，返回 {区域: [条目, ...]}"""
+        if not 1 <= k <= len(self.nodes) - 1:
+            raise ValueError(f"k 必须在 1 到 {len(self.nodes) - 1} 之间")
+        rows = np.array([self.index_of(r) for r in regions]) if regions else np.arange(len(self.nodes))
+
+        candidates = np.array(self.rtt[rows], dtype=np.float32)
+        candidates[np.arange(len(rows)), rows] = np.inf
+        candidates[:, ~self._provider_mask(providers)] = np.inf
+        if cross_provider:
+            candidates[self.providers[rows][:, None] == self.providers[None, :]] = np.inf
+
+        k = min(k, candidates.shape[1])
+        nearest = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+        nearest_rtt = np.take_along_axis(candidates, nearest, axis=1)
+        order = np.argsort(nearest_rtt, axis=1, kind='stable')
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        nearest_rtt = np.take_along_axis(nearest_rtt, order, axis=1)
+
+        return {
+            self.keys[row]: [self._entry(row, col) for col, value in zip(nearest[i], nearest_rtt[i])
+                             if np.isfinite(value)]
+            for i, row in enumerate(rows)
+        }
+
+
+def _write_cache(cache_path, stacked):
+    """原子写入矩阵缓存并删除旧版本；目录不可写时忽略"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, stacked)
+        tmp_path.replace(cache_path)
+        for old in cache_path.parent.glob('*.npy'):
+            if old != cache_path:
+                old.unlink()
+    except OSError:
+        pass
+
+
+def main():
+    from node_dataset import load_merged_nodes
+
+    parser = argparse.ArgumentParser(description='区域间延迟估算查询')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rtt_parser = sub.add_parser('rtt', help='两个区域间的估算 RTT')
+    rtt_parser.add_argument('a')
+    rtt_parser.add_argument('b')
+
+    pairs_parser = sub.add_parser('pairs', help='RTT 低于阈值的跨云区域对')
+    pairs_parser.add_argument('--max-ms', type=float, default=10.0)
+    pairs_parser.add_argument('--limit', type=int, default=20)
+    pairs_parser.add_argument('--providers', '-p', default=None, help='逗号分隔的供应商ID')
+
+    failover_parser = sub.add_parser('failover', help='区域的备选区域')
+    failover_parser.add_argument('regions', nargs='*', help='provider/node_id，默认全部区域')
+    failover_parser.add_argument('--k', type=int, default=3)
+    failover_parser.add_argument('--cross-provider', action='store_true', help='只考虑其他供应商的区域')
+    args = parser.parse_args()
+
+    _, nodes = load_merged_nodes()
+    matrix = LatencyMatrix.build(nodes)
+
+    if args.command == 'rtt':
+        entries = [matrix.rtt_between(args.a, args.b)]
+    elif args.command == 'pairs':
+        providers = args.providers.split(',') if args.providers else None
+        entries = matrix.best_pairs(args.max_ms, providers, limit=args.limit)
+    else:
+        entries = [entry for group in matrix.failover(args.k, args.regions, cross_provider=args.cross_provider).values()
+                   for entry in group]
+
+    for entry in entries:
+        print(f"{entry['from']:<32} -> {entry['to']:<32} {entry['distance_km']:>8.1f} km {entry['rtt_ms']:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
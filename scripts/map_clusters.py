@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地图节点分级聚合
+为地图的每个缩放级别预先计算聚合点（supercluster 式的层次聚合，按供应商分别聚合）：
+- 最细一级（MAX_LEVEL + 1）为单个节点
+- 自细向粗逐级合并：第 L 级把第 L+1 级中彼此距离小于 BASE_DEGREES / 2^L 度的点贪心合并，
+  位置取按节点数加权的中心
+- 距离按经纬度平面（等距圆柱投影）计算，与页面 ECharts geo 坐标系的屏幕距离一致
+- 每级的聚合点放入 10° 网格桶，按视口 bbox 查询时只扫描相交的桶
+
+纯 Python 实现，不依赖 NumPy。
+
+用法:
+    python scripts/map_clusters.py --level 2 --bbox 60,0,160,60
+"""
+
+import argparse
+import math
+
+BASE_DEGREES = 16.0
+MAX_LEVEL = 8
+BUCKET_DEGREES = 10.0
+
+
+def cluster_radius(level):
+    """第 level 级的合并半径（度）"""
+    return BASE_DEGREES / (2 ** level)
+
+
+def parse_bbox(text):
+    """'west,south,east,north' -> 四元组；west > east 表示跨越 180° 经线"""
+    try:
+        west, south, east, north = (float(v) for v in text.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox 格式应为 west,south,east,north") from None
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError(f"bbox 超出范围: {text}")
+    return west, south, east, north
+
+
+class Cluster:
+    """某一级的一个聚合点"""
+
+    __slots__ = ('provider', 'lon', 'lat', 'count', 'az_sum', 'latency_sum', 'latency_count',
+                 'uptime_sum', 'uptime_count', 'node', 'expansion_level')
+
+    def __init__(self, provider, lon, lat, count, node=None):
+        self.provider = provider
+        self.lon = lon
+        self.lat = lat
+        self.count = count
+        self.node = node
+        self.az_sum = 0
+        self.latency_sum = self.uptime_sum = 0.0
+        self.latency_count = self.uptime_count = 0
+        self.expansion_level = None
+
+    @classmethod
+    def from_node(cls, node):
+        location = node['location']
+        network = node['network_info']
+        cluster = cls(node['provider'], location['longitude'], location['latitude'], 1, node)
+        cluster.az_sum = node['availability_zones']
+        if network['latency'] is not None:
+            cluster.latency_sum, cluster.latency_count = network['latency'], 1
+        if network['uptime'] is not None:
+            cluster.uptime_sum, cluster.uptime_count = network['uptime'], 1
+        return cluster
+
+    @classmethod
+    def merge(cls, members, level):
+        """合并同一供应商的若干聚合点"""
+        if len(members) == 1:
+            return members[0]
+        count = sum(m.count for m in members)
+        cluster = cls(members[0].provider,
+                      sum(m.lon * m.count for m in members) / count,
+                      sum(m.lat * m.count for m in members) / count,
+                      count)
+        for m in members:
+            cluster.az_sum += m.az_sum
+            cluster.latency_sum += m.latency_sum
+            cluster.latency_count += m.latency_count
+            cluster.uptime_sum += m.uptime_sum
+            cluster.uptime_count += m.uptime_count
+        # 放大到下一级即可看到拆分后的多个点
+        cluster.expansion_level = level + 1
+        return cluster
+
+    def to_json(self):
+        if self.node is not None:
+            node = self.node
+            return {
+                'provider': self.provider,
+                'lon': self.lon,
+                'lat': self.lat,
+                'count': 1,
+                'node': {
+                    'node_id': node['node_id'],
+                    'name': node['name'],
+                    'country': node['location']['country'],
+                    'city': node['location']['city'],
+                    'data_center': node['data_center'],
+                    'availability_zones': node['availability_zones'],
+                    'latency': node['network_info']['latency'],
+                    'uptime': node['network_info']['uptime'],
+                    'status': node['status'],
+                    'launch_date': node['launch_date'],
+                },
+            }
+        return {
+            'provider': self.provider,
+            'lon': round(self.lon, 4),
+            'lat': round(self.lat, 4),
+            'count': self.count,
+            'az_sum': self.az_sum,
+            'latency_avg': round(self.latency_sum / self.latency_count, 2) if self.latency_count else None,
+            'uptime_avg': round(self.uptime_sum / self.uptime_count, 3) if self.uptime_count else None,
+            'expansion_level': self.expansion_level,
+        }
+
+
+def cluster_level(points, level):
+    """把上一级（更细）的聚合点按第 level 级半径贪心合并"""
+    radius = cluster_radius(level)
+    radius_sq = radius * radius
+    grid = {}
+    for i, point in enumerate(points):
+        grid.setdefault((point.provider, math.floor(point.lon / radius), math.floor(point.lat / radius)), []).append(i)
+
+    merged = []
+    taken = [False] * len(points)
+    # 节点数多的点优先作为聚合中心，结果与输入顺序无关
+    for i in sorted(range(len(points)), key=lambda i: (-points[i].count, points[i].lon, points[i].lat)):
+        if taken[i]:
+            continue
+        center = points[i]
+        cx, cy = math.floor(center.lon / radius), math.floor(center.lat / radius)
+        members = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for j in grid.get((center.provider, gx, gy), ()):
+                    if taken[j]:
+                        continue
+                    dx = points[j].lon - center.lon
+                    dy = points[j].lat - center.lat
+                    if dx * dx + dy * dy <= radius_sq:
+                        taken[j] = True
+                        members.append(points[j])
+        merged.append(Cluster.merge(members, level))
+    return merged
+
+
+class ClusterIndex:
+    """各级聚合点及其网格桶（构建后只读，可多线程共享）"""
+
+    def __init__(self, nodes, max_level=MAX_LEVEL):
+        self.max_level = max_level
+        self.levels = {}
+        points = [Cluster.from_node(node) for node in nodes]
+        self.levels[max_level + 1] = points
+        for level in range(max_level, -1, -1):
+            points = cluster_level(points, level)
+            self.levels[level] = points
+
+        self.buckets = {}
+        for level, clusters in self.levels.items():
+            buckets = {}
+            for cluster in clusters:
+                key = (math.floor(cluster.lon / BUCKET_DEGREES), math.floor(cluster.lat / BUCKET_DEGREES))
+                buckets.setdefault(key, []).append(cluster)
+            self.buckets[level] = buckets
+
+    def _lon_ranges(self, west, east):
+        return [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+
+    def query(self, level, bbox=None, providers=None):
+        """返回第 level 级中落在 bbox 内的聚合点（level 超过最细一级时返回单个节点）"""
+        level = max(0, min(int(level), self.max_level + 1))
+        providers = set(providers) if providers else None
+        if bbox is None:
+            candidates = self.levels[level]
+        else:
+            west, south, east, north = bbox
+            buckets = self.buckets[level]
+            candidates = []
+            y_range = range(math.floor(south / BUCKET_DEGREES), math.floor(north / BUCKET_DEGREES) + 1)
+            for lo, hi in self._lon_ranges(west, east):
+                for bx in range(math.floor(lo / BUCKET_DEGREES), math.floor(hi / BUCKET_DEGREES) + 1):
+                    for by in y_range:
+                        for cluster in buckets.get((bx, by), ()):
+                            if south <= cluster.lat <= north and lo <= cluster.lon <= hi:
+                                candidates.append(cluster)
+
+        clusters = [c for c in candidates if providers is None or c.provider in providers]
+        return {
+            'level': level,
+            'max_level': self.max_level + 1,
+            'nodes': sum(c.count for c in clusters),
+            'clusters': [c.to_json() for c in clusters],
+        }
+
+
+def main():
+    from node_dataset import load_merged_nodes
+
+    parser = argparse.ArgumentParser(description='查看某一缩放级别的节点聚合结果')
+    parser.add_argument('--level', '-l', type=int, default=0, help=f'缩放级别 0-{MAX_LEVEL + 1}')
+    parser.add_argument('--bbox', default=None, help='west,south,east,north')
+    args = parser.parse_args()
+
+    _, nodes = load_merged_nodes()
+    index = ClusterIndex(nodes)
+    for level in range(index.max_level + 2):
+        print(f"第 {level} 级: {len(index.levels[level])} 个点")
+
+    result = index.query(args.level, parse_bbox(args.bbox) if args.bbox else None)
+    print(f"\n第 {result['level']} 级视口内 {len(result['clusters'])} 个点，覆盖 {result['nodes']} 个节点:")
+    for cluster in result['clusters']:
+        label = cluster['node']['name'] if cluster['count'] == 1 else f"{cluster['count']} 个节点"
+        print(f"  {cluster['provider']:<14} ({cluster['lat']:>8.3f}, {cluster['lon']:>9.3f})  {label}")
+
+
+if __name__ == "__main__":
+    main()
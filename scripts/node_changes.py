@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点数据变更记录
+数据集每次重建时，把新旧快照按 "provider/node_id" 逐节点比较，得到新增、删除和修改的节点，
+以快照版本号（单调递增）为序保存最近若干次变更：
+- since(version, epoch)：把 version 之后的所有变更合并为一个增量；
+  version 早于保留的记录，或 epoch 与本次进程不符（服务重启过，版本号重新计数）时返回 None，
+  客户端应整体重新加载
+- wait(version, timeout)：阻塞等待版本号超过 version，供 SSE 推送线程使用
+
+页面据此只修补变化的节点，而不必重新下载全部数据、重建所有图表。
+
+用法:
+    python scripts/node_changes.py old-nodes.json data/aws/nodes.json --provider aws
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+
+# 保留的变更记录条数
+MAX_HISTORY = 64
+
+
+def node_key(node):
+    return f"{node['provider']}/{node['node_id']}"
+
+
+def diff_nodes(previous, current):
+    """逐节点比较两个节点列表，返回 (新增节点, 删除的键, 修改后的节点)"""
+    old = {node_key(node): node for node in previous}
+    added, modified = [], []
+    seen = set()
+    for node in current:
+        key = node_key(node)
+        seen.add(key)
+        before = old.get(key)
+        if before is None:
+            added.append(node)
+        elif before != node:
+            modified.append(node)
+    removed = [key for key in old if key not in seen]
+    return added, removed, modified
+
+
+class ChangeLog:
+    """按快照版本记录的节点变更（线程安全）；作为 NodeDataset 的重建回调注册"""
+
+    def __init__(self, snapshot, max_history=MAX_HISTORY):
+        # 服务重启后版本号从头计数，客户端据 epoch 判断手中的版本号是否仍然有效
+        self.epoch = snapshot.epoch
+        self.version = snapshot.version
+        # 能够提供增量的最早版本：客户端版本早于它时只能整体重新加载
+        self.base_version = snapshot.version
+        self.providers = snapshot.providers
+        self._history = deque(maxlen=max_history)
+        self._condition = threading.Condition()
+
+    def __call__(self, previous, snapshot):
+        self.record(previous, snapshot)
+
+    def record(self, previous, snapshot):
+        """记录 previous -> snapshot 的变更并唤醒等待中的订阅者"""
+        added, removed, modified = diff_nodes(previous.nodes, snapshot.nodes)
+        entry = {
+            'version': snapshot.version,
+            'previous_version': previous.version,
+            'time': time.time(),
+            'providers': snapshot.providers,
+            'added': added,
+            'removed': removed,
+            'modified': modified,
+        }
+        with self._condition:
+            if len(self._history) == self._history.maxlen:
+                self.base_version = self._history[0]['version']
+            self._history.append(entry)
+            self.version = snapshot.version
+            self.providers = snapshot.providers
+            self._condition.notify_all()
+        return entry
+
+    def since(self, version, epoch=None):
+        """合并 version 之后的所有变更；无法提供增量时返回 None"""
+        if epoch is not None and epoch != self.epoch:
+            return None
+        with self._condition:
+            if version > self.version or version < self.base_version:
+                return None
+            entries = [entry for entry in self._history if entry['version'] > version]
+            current, providers = self.version, self.providers
+
+        # 同一节点在区间内多次变化时只保留最终状态；是否算新增取决于它在区间开始前是否存在
+        existed = {}
+        final = {}
+        for entry in entries:
+            changes = [(node_key(n), n, False) for n in entry['added']]
+            changes += [(node_key(n), n, True) for n in entry['modified']]
+            changes += [(key, None, True) for key in entry['removed']]
+            for key, node, existed_before in changes:
+                existed.setdefault(key, existed_before)
+                final[key] = node
+
+        return {
+            'epoch': self.epoch,
+            'version': current,
+            'since': version,
+            'providers': providers,
+            'added': [node for key, node in final.items() if node is not None and not existed[key]],
+            # 区间内新增又删除的节点客户端从未见过，无需下发
+            'removed': [key for key, node in final.items() if node is None and existed[key]],
+            'modified': [node for key, node in final.items() if node is not None and existed[key]],
+        }
+
+    def wait(self, version, timeout):
+        """阻塞直到版本号超过 version 或超时，返回当前版本号"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+
+def main():
+    from node_schema import normalize_document
+
+    parser = argparse.ArgumentParser(description='比较同一供应商的两个节点数据文件')
+    parser.add_argument('old', help='旧的 nodes.json')
+    parser.add_argument('new', help='新的 nodes.json')
+    parser.add_argument('--provider', '-p', required=True, help='供应商ID')
+    args = parser.parse_args()
+
+    documents = []
+    for path in (args.old, args.new):
+        with open(path, 'r', encoding='utf-8') as f:
+            documents.append(normalize_document(json.load(f), args.provider, path))
+
+    added, removed, modified = diff_nodes(*documents)
+    for node in added:
+        print(f"+ {node_key(node)}  {node['name']}")
+    for key in removed:
+        print(f"- {key}")
+    for node in modified:
+        print(f"~ {node_key(node)}  {node['name']}")
+    print(f"新增 {len(added)}，删除 {len(removed)}，修改 {len(modified)}")
+
+
+if __name__ == "__main__":
+    main()
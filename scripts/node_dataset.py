@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多云节点合并数据集
+根据供应商注册表（provider_registry.py，来自 data/providers-metadata.json）合并所有供应商的节点数据，
+常驻内存，并由 mtime 监视线程在源文件变更时重建；重建时只重新加载数据文件有变化的供应商。
+节点均经过 node_schema 校验和规范化，下游无需再区分各供应商的字段差异。
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+from node_schema import SCHEMA_VERSION
+from provider_registry import PROJECT_ROOT, ProviderRegistry, load_metadata, provider_order
+
+
+def load_merged_nodes(root=PROJECT_ROOT, metadata_path=None, registry=None):
+    """按 display_order 合并所有供应商节点，返回 (供应商ID列表, 节点列表)；缺少数据文件的供应商没有节点"""
+    return (registry or ProviderRegistry(root, metadata_path)).merged()
+
+
+def source_fingerprint(root=PROJECT_ROOT, metadata_path=None):
+    """元数据及所有供应商数据文件内容的哈希，用于判断派生产物是否过期"""
+    root = Path(root)
+    metadata_path = Path(metadata_path or root / 'data' / 'providers-metadata.json')
+    metadata = load_metadata(metadata_path)
+    digest = hashlib.sha1(metadata_path.read_bytes())
+    digest.update(f"schema-{SCHEMA_VERSION}".encode('utf-8'))
+    for provider_id in provider_order(metadata):
+        data_path = root / metadata['providers'][provider_id]['data_path']
+        if data_path.exists():
+            digest.update(provider_id.encode('utf-8'))
+            digest.update(data_path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class DatasetSnapshot:
+    """某一时刻的合并数据集（不可变，可在多线程间直接共享）"""
+
+    def __init__(self, version, providers, nodes, source_mtimes, epoch='', source_hash=None):
+        self.version = version
+        self.epoch = epoch
+        self.source_hash = source_hash
+        self.providers = providers
+        self.nodes = nodes
+        self.source_mtimes = source_mtimes
+        self.built_at = time.time()
+
+        payload = {
+            'epoch': epoch,
+            'version': version,
+            'source_hash': source_hash,
+            'providers': providers,
+            'total': len(nodes),
+            'nodes': nodes,
+        }
+        self.payload = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"nodes-%s"' % hashlib.sha1(self.payload).hexdigest()[:16]
+
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def derived(self, key, factory):
+        """按快照缓存派生结构（索引、聚合、序列化结果等），每个版本只构建一次"""
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self)
+            return self._derived[key]
+
+
+class NodeDataset:
+    """合并后的节点数据集，源文件（元数据及各 nodes.json）变更时自动重建"""
+
+    def __init__(self, root=PROJECT_ROOT, metadata_path=None):
+        self.root = Path(root)
+        self.metadata_path = Path(metadata_path) if metadata_path else self.root / 'data' / 'providers-metadata.json'
+        # 合并数据集常驻内存，注册表不限制缓存的供应商数，重建时未变化的供应商直接复用
+        self.registry = ProviderRegistry(self.root, self.metadata_path, cache_size=None)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._stop = threading.Event()
+        # 版本号只在本进程内单调递增，epoch 区分不同进程的版本序列
+        self.epoch = format(time.time_ns(), 'x')
+        self.snapshot = self._build(version=1)
+
+    def _source_mtimes(self, metadata):
+        """返回 {源文件路径: mtime}，文件缺失时记为 None"""
+        paths = [self.metadata_path]
+        paths += [self.root / info['data_path'] for info in metadata['providers'].values()]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[str(path)] = path.stat().st_mtime_ns
+            except OSError:
+                mtimes[str(path)] = None
+        return mtimes
+
+    def _build(self, version):
+        # 先记录 mtime 再读取文件，读取期间发生的修改会在下次轮询时被发现
+        mtimes = self._source_mtimes(self.registry.metadata)
+        providers, nodes = self.registry.merged()
+        source_hash = source_fingerprint(self.root, self.metadata_path)
+        return DatasetSnapshot(version, providers, nodes, mtimes, self.epoch, source_hash)
+
+    def is_stale(self):
+        """检查源文件 mtime 是否与当前快照不同"""
+        current = self.snapshot
+        try:
+            metadata = self.registry.metadata
+        except (OSError, ValueError):
+            return False
+        return self._source_mtimes(metadata) != current.source_mtimes
+
+    def refresh(self, force=False):
+        """源文件变更时重建数据集，返回是否发生了重建"""
+        with self._lock:
+            if not force and not self.is_stale():
+                return False
+            try:
+                snapshot = self._build(self.snapshot.version + 1)
+            except (OSError, ValueError) as e:
+                # 文件正在写入或内容不完整时保留旧快照，下次轮询再试
+                print(f"⚠️  重建节点数据集失败，继续使用版本 {self.snapshot.version}: {e}", file=sys.stderr)
+                return False
+            previous, self.snapshot = self.snapshot, snapshot
+
+        for listener in list(self._listeners):
+            listener(previous, snapshot)
+        return True
+
+    def add_listener(self, callback):
+        """注册重建回调 callback(previous_snapshot, new_snapshot)"""
+        self._listeners.append(callback)
+
+    def start_watcher(self, interval=2.0):
+        """启动后台 mtime 监视线程"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
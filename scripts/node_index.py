@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点查询索引
+- 搜索：对 name/city/country/node_id 的规范化文本建立字符 n-gram 倒排索引，
+  候选集再做一次子串校验，语义与页面原来的 toLowerCase().includes() 一致
+- 筛选：按供应商、状态、国家预建位图（Python int 作为位集合）
+- 排序：每个排序字段预先计算一次行号顺序
+"""
+
+import unicodedata
+
+SEARCH_FIELDS = ('name', 'city', 'country', 'node_id')
+SORT_KEYS = ('name', 'node_id', 'provider', 'country', 'city', 'status', 'launch_date', 'availability_zones')
+MAX_LIMIT = 500
+
+
+def normalize_text(text):
+    """规范化搜索文本：NFKC（全角转半角）+ 小写"""
+    return unicodedata.normalize('NFKC', str(text or '')).lower()
+
+
+def ngrams(text):
+    """返回文本的单字符与双字符 gram 集合"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(term):
+    """查询词用于求交集的 gram：长度为 1 时用单字，否则用全部双字 gram"""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+def iter_bits(mask):
+    """按升序遍历位集合中被置位的行号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def node_field(node, field):
+    """读取节点的可搜索/可排序字段；搜索字段缺失时为 ''，其他字段（如 launch_date）可能为 None"""
+    source = node.get('location', {}) if field in ('city', 'country', 'region') else node
+    value = source.get(field)
+    if value is None and field in SEARCH_FIELDS:
+        return ''
+    return value
+
+
+def sort_key(node, field):
+    """排序键：缺失值（None）排在最后，不与字符串直接比较"""
+    value = node_field(node, field)
+    return (value is None, '' if value is None else value)
+
+
+class QueryError(ValueError):
+    """查询参数不合法"""
+
+
+class NodeIndex:
+    """基于倒排索引和位图的节点查询索引（构建后只读，可多线程共享）"""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.size = len(nodes)
+        self.all_mask = (1 << self.size) - 1
+
+        self.search_text = []
+        self.postings = {}
+        self.provider_bits = {}
+        self.status_bits = {}
+        self.country_bits = {}
+
+        for row, node in enumerate(nodes):
+            bit = 1 << row
+            text = '\x00'.join(normalize_text(node_field(node, field)) for field in SEARCH_FIELDS)
+            self.search_text.append(text)
+            for gram in ngrams(text):
+                if '\x00' not in gram:
+                    self.postings[gram] = self.postings.get(gram, 0) | bit
+
+            provider = node.get('provider', '')
+            self.provider_bits[provider] = self.provider_bits.get(provider, 0) | bit
+            status = node.get('status', '')
+            self.status_bits[status] = self.status_bits.get(status, 0) | bit
+            country = node_field(node, 'country')
+            self.country_bits[country] = self.country_bits.get(country, 0) | bit
+
+        # 每个排序字段的升序行号列表及行号 -> 名次
+        self.sort_orders = {}
+        self.sort_ranks = {}
+        for key in SORT_KEYS:
+            order = sorted(range(self.size), key=lambda row: (sort_key(nodes[row], key), row))
+            ranks = [0] * self.size
+            for rank, row in enumerate(order):
+                ranks[row] = rank
+            self.sort_orders[key] = order
+            self.sort_ranks[key] = ranks
+
+    def _values_mask(self, bitmaps, values):
+        """多个取值之间取并集"""
+        mask = 0
+        for value in values:
+            mask |= bitmaps.get(value, 0)
+        return mask
+
+    def search_mask(self, term):
+        """返回包含搜索词的行位集合"""
+        term = normalize_text(term).strip()
+        if not term:
+            return self.all_mask
+
+        mask = self.all_mask
+        for gram in query_grams(term):
+            mask &= self.postings.get(gram, 0)
+            if not mask:
+                return 0
+
+        # n-gram 交集只是候选集，超过两个字符时需要校验真正的子串
+        if len(term) > 2:
+            verified = 0
+            for row in iter_bits(mask):
+                if term in self.search_text[row]:
+                    verified |= 1 << row
+            mask = verified
+        return mask
+
+    def filter_mask(self, search='', providers=None, statuses=None, countries=None):
+        """组合搜索词与各筛选条件，返回匹配行的位集合"""
+        mask = self.search_mask(search)
+        if providers:
+            mask &= self._values_mask(self.provider_bits, providers)
+        if statuses:
+            mask &= self._values_mask(self.status_bits, statuses)
+        if countries:
+            mask &= self._values_mask(self.country_bits, countries)
+        return mask
+
+    def ordered_rows(self, mask, sort=None, descending=False):
+        """按排序字段返回匹配行号（生成器）"""
+        if sort is None:
+            rows = iter_bits(mask)
+            return reversed(list(rows)) if descending else rows
+
+        matched = mask.bit_count()
+        if matched * 8 < self.size:
+            # 命中较少时直接按名次排序命中的行
+            ranks = self.sort_ranks[sort]
+            return iter(sorted(iter_bits(mask), key=ranks.__getitem__, reverse=descending))
+
+        order = self.sort_orders[sort]
+        if descending:
+            order = reversed(order)
+        return (row for row in order if mask >> row & 1)
+
+    def query(self, search='', providers=None, statuses=None, countries=None,
+              sort=None, order='asc', offset=0, limit=20):
+        """执行筛选、排序和分页，返回当前页节点与计数"""
+        if sort is not None and sort not in SORT_KEYS:
+            raise QueryError(f"不支持的排序字段: {sort}")
+        if order not in ('asc', 'desc'):
+            raise QueryError(f"不支持的排序方向: {order}")
+        if offset < 0 or limit < 0:
+            raise QueryError("offset 和 limit 不能为负数")
+        limit = min(limit, MAX_LIMIT)
+
+        mask = self.filter_mask(search, providers, statuses, countries)
+        page = []
+        for position, row in enumerate(self.ordered_rows(mask, sort, order == 'desc')):
+            if position >= offset + limit:
+                break
+            if position >= offset:
+                page.append(self.nodes[row])
+
+        # 供应商分面计数：在搜索/状态/国家条件下各供应商的命中数（忽略供应商条件）
+        facet_mask = self.filter_mask(search, None, statuses, countries)
+        provider_counts = {
+            provider: count
+            for provider, bits in self.provider_bits.items()
+            if (count := (facet_mask & bits).bit_count())
+        }
+
+        return {
+            'total': mask.bit_count(),
+            'dataset_total': self.size,
+            'offset': offset,
+            'limit': limit,
+            'provider_counts': provider_counts,
+            'nodes': page,
+        }
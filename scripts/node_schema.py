@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点数据模式校验与规范化
+各供应商的 nodes.json 字段并不一致（阿里云等为整数 availability_zones，
+AWS 等为字符串 availability_zone 加 service_types）。本模块用同一个模式校验所有文件，
+并把节点转换为统一的规范记录：
+
+    node_id, name, provider, data_center, description, status,
+    location{country, region, city, latitude, longitude},
+    availability_zones（整数，只有 availability_zone 字符串时计 1）,
+    availability_zone（字符串或 None）, service_types（列表）,
+    network_info{bandwidth, latency, uptime}（缺失为 None）,
+    launch_date（ISO 字符串或 None）, launch_year（整数或 None）
+
+模式在导入时编译为一组闭包校验函数，逐条记录只做函数调用，不再解释模式描述。
+规范化结果按“源文件内容哈希 + 模式版本”缓存在 data/.normalized/ 中，
+源文件不变时直接读取缓存；内存中的缓存由 provider_registry.py 按供应商管理。
+
+用法:
+    python scripts/node_schema.py            # 校验所有供应商并生成 data/normalized-nodes.json
+    python scripts/node_schema.py --check    # 只校验，发现问题时以非零状态退出
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from instrumentation import stage
+
+SCHEMA_VERSION = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_ROOT / 'data' / '.normalized'
+DEFAULT_OUTPUT = PROJECT_ROOT / 'data' / 'normalized-nodes.json'
+
+STATUSES = ('active', 'inactive', 'maintenance', 'planned')
+
+
+class SchemaError(ValueError):
+    """数据文件不符合节点模式；errors 为 “路径: 问题” 列表"""
+
+    def __init__(self, source, errors):
+        self.source = source
+        self.errors = errors
+        shown = '; '.join(errors[:5])
+        more = f" 等 {len(errors)} 处" if len(errors) > 5 else ''
+        super().__init__(f"{source} 不符合节点模式: {shown}{more}")
+
+
+# ---- 校验器构造函数：每个返回 check(value, path, errors) -> 规范化后的值 ----
+
+def string(required=True, default='', choices=None):
+    def check(value, path, errors):
+        if value is None:
+            if required:
+                errors.append(f"{path}: 缺少必填字段")
+            return default
+        if not isinstance(value, str):
+            errors.append(f"{path}: 应为字符串")
+            return default
+        value = value.strip()
+        if required and not value:
+            errors.append(f"{path}: 不能为空")
+        if choices is not None and value not in choices:
+            errors.append(f"{path}: 不支持的取值 {value!r}")
+        return value
+    return check
+
+
+def number(minimum=None, maximum=None, required=True):
+    def check(value, path, errors):
+        if value is None:
+            if required:
+                errors.append(f"{path}: 缺少必填字段")
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{path}: 应为数值")
+            return None
+        if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+            errors.append(f"{path}: {value} 超出范围 [{minimum}, {maximum}]")
+        return float(value)
+    return check
+
+
+def integer(minimum=None, default=None):
+    def check(value, path, errors):
+        if value is None:
+            return default
+        if isinstance(value, bool) or not isinstance(value, int):
+            errors.append(f"{path}: 应为整数")
+            return default
+        if minimum is not None and value < minimum:
+            errors.append(f"{path}: 不能小于 {minimum}")
+        return value
+    return check
+
+
+def iso_date():
+    def check(value, path, errors):
+        if value is None or value == '':
+            return None
+        if not isinstance(value, str):
+            errors.append(f"{path}: 应为 ISO 8601 日期字符串")
+            return None
+        try:
+            datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            errors.append(f"{path}: 无法解析的日期 {value!r}")
+            return None
+        return value
+    return check
+
+
+def list_of(item):
+    def check(value, path, errors):
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            errors.append(f"{path}: 应为列表")
+            return []
+        return [item(entry, f"{path}[{i}]", errors) for i, entry in enumerate(value)]
+    return check
+
+
+def record(fields, required=True):
+    """对象校验器；fields 为 (字段名, 校验器) 序列，输出只包含模式中的字段"""
+    fields = tuple(fields)
+
+    def check(value, path, errors):
+        if value is None:
+            if required:
+                errors.append(f"{path}: 缺少必填字段")
+            value = {}
+        elif not isinstance(value, dict):
+            errors.append(f"{path}: 应为对象")
+            value = {}
+        return {name: validate(value.get(name), f"{path}.{name}", errors) for name, validate in fields}
+    return check
+
+
+# ---- 节点模式 ----
+
+NODE_SCHEMA = record([
+    ('node_id', string()),
+    ('name', string()),
+    ('location', record([
+        ('country', string()),
+        ('region', string(required=False)),
+        ('city', string()),
+        ('latitude', number(-90, 90)),
+        ('longitude', number(-180, 180)),
+    ])),
+    ('data_center', string(required=False)),
+    ('availability_zones', integer(minimum=1)),
+    ('availability_zone', string(required=False, default=None)),
+    ('service_types', list_of(string())),
+    ('status', string(choices=STATUSES)),
+    ('network_info', record([
+        ('bandwidth', string(required=False, default=None)),
+        ('latency', number(minimum=0, required=False)),
+        ('uptime', number(0, 100, required=False)),
+    ], required=False)),
+    ('description', string(required=False)),
+    ('launch_date', iso_date()),
+])
+
+
+def normalize_node(raw, provider_id, path='node'):
+    """校验并规范化单个节点，返回 (规范记录, 问题列表)"""
+    errors = []
+    node = NODE_SCHEMA(raw, path, errors)
+
+    # 只有 availability_zone 字符串（AWS 等）时按 1 个可用区计
+    if node['availability_zones'] is None:
+        node['availability_zones'] = 1
+    node['launch_year'] = int(node['launch_date'][:4]) if node['launch_date'] else None
+    node['provider'] = provider_id
+    return node, errors
+
+
+def normalize_document(data, provider_id, source='nodes.json'):
+    """规范化整个数据文件的节点列表；存在问题时抛出 SchemaError"""
+    if not isinstance(data, dict) or not isinstance(data.get('nodes'), list):
+        raise SchemaError(source, ["nodes: 应为节点列表"])
+
+    nodes = []
+    errors = []
+    seen = set()
+    for i, raw in enumerate(data['nodes']):
+        node, node_errors = normalize_node(raw, provider_id, f"nodes[{i}]")
+        if node['node_id'] in seen:
+            node_errors.append(f"nodes[{i}].node_id: 重复的节点ID {node['node_id']!r}")
+        seen.add(node['node_id'])
+        errors.extend(node_errors)
+        nodes.append(node)
+
+    if errors:
+        raise SchemaError(source, errors)
+    return nodes
+
+
+# ---- 按源文件哈希缓存 ----
+
+def cache_key(raw_bytes):
+    digest = hashlib.sha1(raw_bytes)
+    digest.update(f"schema-{SCHEMA_VERSION}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def load_normalized(provider_id, data_path, cache_dir=None):
+    """读取并规范化供应商数据文件；源文件内容不变时直接使用缓存结果
+    cache_dir 默认为调用时的 CACHE_DIR（基准测试等场景可把缓存指向临时目录）"""
+    raw_bytes = Path(data_path).read_bytes()
+    cache_path = Path(cache_dir or CACHE_DIR) / f"{provider_id}-{cache_key(raw_bytes)}.json"
+    try:
+        with stage('parse_cache', provider=provider_id), open(cache_path, 'r', encoding='utf-8') as f:
+            nodes = json.load(f)
+    except (OSError, ValueError):
+        with stage('parse_json', provider=provider_id, bytes=len(raw_bytes)):
+            data = json.loads(raw_bytes)
+        with stage('normalize', provider=provider_id):
+            nodes = normalize_document(data, provider_id, str(data_path))
+        _write_cache(cache_path, provider_id, nodes)
+    return nodes
+
+
+def _write_cache(cache_path, provider_id, nodes):
+    """原子写入缓存文件并清理该供应商的旧缓存；缓存目录不可写时忽略"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(nodes, f, ensure_ascii=False, separators=(',', ':'))
+        tmp_path.replace(cache_path)
+        for old in cache_path.parent.glob(f"{provider_id}-*.json"):
+            if old != cache_path:
+                old.unlink()
+    except OSError:
+        pass
+
+
+def main():
+    # 供应商列表与数据路径来自注册表，延迟导入以避免循环依赖
+    from node_dataset import source_fingerprint
+    from provider_registry import ProviderRegistry
+
+    parser = argparse.ArgumentParser(description='校验并规范化所有供应商的节点数据')
+    parser.add_argument('--check', action='store_true', help='只校验，不写出合并后的规范化数据')
+    parser.add_argument('--output', '-o', type=Path, default=DEFAULT_OUTPUT, help='输出文件路径')
+    args = parser.parse_args()
+
+    registry = ProviderRegistry(cache_size=None)
+    failed = 0
+    for provider_id in registry.ids():
+        data_path = registry.data_path(provider_id)
+        try:
+            if not data_path.exists():
+                raise FileNotFoundError(f"数据文件不存在: {data_path}")
+            nodes = registry.nodes(provider_id)
+            print(f"✓ {provider_id}: {len(nodes)} 个节点")
+        except (OSError, ValueError) as e:
+            failed += 1
+            errors = e.errors if isinstance(e, SchemaError) else [str(e)]
+            print(f"✗ {provider_id}: {len(errors)} 处问题")
+            for error in errors:
+                print(f"    {error}")
+
+    if failed:
+        print(f"{failed} 个数据文件未通过校验")
+        sys.exit(1)
+    if args.check:
+        return
+
+    providers, nodes = registry.merged()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'schema': SCHEMA_VERSION, 'source_hash': source_fingerprint(), 'providers': providers,
+                   'total': len(nodes), 'nodes': nodes}, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"规范化数据已生成: {args.output}（{len(nodes)} 个节点）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式二进制节点存储
+把所有供应商的规范化节点（见 node_schema.py）编译为一个紧凑的列式二进制文件：
+- 经纬度、延迟、可用性为 float32 数组
+- 供应商、国家、地区、城市、状态为字典编码（uint16/uint8）
+- service_types 为位掩码（uint32，每种服务类型一位）
+- 启用时间为自 1970-01-01 起的天数（int32）
+- 节点ID、名称、数据中心为 UTF-8 字节块 + uint32 偏移数组
+
+Python 端通过 mmap 零拷贝加载（np.frombuffer 直接引用映射内存），
+浏览器端可以把同一个文件作为 ArrayBuffer 读取（所有列按 8 字节对齐，小端序）。
+
+文件布局:
+    8 字节魔数 b'CNSTORE1' | uint32 头长度 | 头 JSON（UTF-8，补齐到 8 字节）| 列数据
+头 JSON 中 columns[name] = {dtype, offset, length}，offset 相对于列数据起点。
+页面的节点数据引擎（cloud-infrastructure-map.html 中的 Web Worker）直接读取该格式。
+
+用法:
+    python scripts/node_store.py [--output data/nodes.store]
+"""
+
+import argparse
+import json
+import mmap
+import struct
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from node_dataset import PROJECT_ROOT, load_merged_nodes, source_fingerprint
+
+MAGIC = b'CNSTORE1'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+DEFAULT_OUTPUT = PROJECT_ROOT / 'data' / 'nodes.store'
+
+MISSING_DAY = np.iinfo(np.int32).min
+EPOCH = date(1970, 1, 1)
+
+# 字典编码列：列名 -> (取值函数, 编码类型)
+DICTIONARY_COLUMNS = {
+    'provider': (lambda node: node.get('provider'), 'uint16'),
+    'country': (lambda node: node['location'].get('country'), 'uint16'),
+    'region': (lambda node: node['location'].get('region'), 'uint16'),
+    'city': (lambda node: node['location'].get('city'), 'uint16'),
+    'status': (lambda node: node.get('status'), 'uint8'),
+}
+STRING_COLUMNS = ('node_id', 'name', 'data_center')
+
+
+def _align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def launch_day(launch_date):
+    """ISO 日期 -> 自 1970-01-01 起的天数，缺失时返回 MISSING_DAY"""
+    if not launch_date:
+        return MISSING_DAY
+    try:
+        return (datetime.fromisoformat(launch_date.replace('Z', '+00:00')).date() - EPOCH).days
+    except ValueError:
+        return MISSING_DAY
+
+
+def _number(value):
+    return float('nan') if value is None else value
+
+
+def _optional(value):
+    """_number 的逆操作：NaN 还原为 None"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def encode_nodes(nodes):
+    """把节点列表编码为 (列数组字典, 字典表)"""
+    count = len(nodes)
+    columns = {}
+    dictionaries = {}
+
+    for name, (getter, dtype) in DICTIONARY_COLUMNS.items():
+        codes = {}
+        limit = np.iinfo(dtype).max + 1
+        values = np.empty(count, dtype=dtype)
+        for i, node in enumerate(nodes):
+            value = getter(node)
+            code = codes.get(value)
+            if code is None:
+                # 先检查字典大小再写入定宽列，否则 NumPy 会先抛出 OverflowError
+                if len(codes) >= limit:
+                    raise ValueError(f"{name} 列取值过多，超出 {dtype} 字典编码范围")
+                code = codes[value] = len(codes)
+            values[i] = code
+        columns[name] = values
+        dictionaries[name] = list(codes)
+
+    service_codes = {}
+    service_mask = np.zeros(count, dtype='uint32')
+    for i, node in enumerate(nodes):
+        for service in node['service_types']:
+            bit = service_codes.setdefault(service, len(service_codes))
+            if bit >= 32:
+                raise ValueError("service_types 取值超过 32 种，无法编码为 uint32 位掩码")
+            service_mask[i] |= 1 << bit
+    columns['service_types'] = service_mask
+    dictionaries['service_types'] = list(service_codes)
+
+    columns['lat'] = np.array([node['location']['latitude'] for node in nodes], dtype='float32')
+    columns['lon'] = np.array([node['location']['longitude'] for node in nodes], dtype='float32')
+    columns['latency'] = np.array([_number(node['network_info']['latency']) for node in nodes], dtype='float32')
+    columns['uptime'] = np.array([_number(node['network_info']['uptime']) for node in nodes], dtype='float32')
+    columns['availability_zones'] = np.array([node['availability_zones'] for node in nodes], dtype='uint16')
+    columns['launch_day'] = np.array([launch_day(node['launch_date']) for node in nodes], dtype='int32')
+
+    for name in STRING_COLUMNS:
+        encoded = [node[name].encode('utf-8') for node in nodes]
+        offsets = np.zeros(count + 1, dtype='uint32')
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        columns[f'{name}.offsets'] = offsets
+        columns[f'{name}.bytes'] = np.frombuffer(b''.join(encoded), dtype='uint8')
+
+    return columns, dictionaries
+
+
+def compile_store(nodes, source_hash=None, dataset=None):
+    """编译节点列表，返回存储文件的完整字节内容
+    dataset 为可选的数据集标识（serve.py 传入 {epoch, version}，页面据此订阅增量更新）"""
+    columns, dictionaries = encode_nodes(nodes)
+
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        layout[name] = {'dtype': values.dtype.str.lstrip('<|'), 'offset': offset, 'length': int(values.size)}
+        offset = _align(offset + values.nbytes)
+
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'count': len(nodes),
+        'source_hash': source_hash,
+        'dataset': dataset,
+        'dictionaries': dictionaries,
+        'columns': layout,
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (_align(len(MAGIC) + 4 + len(header)) - len(MAGIC) - 4 - len(header))
+
+    data = bytearray(offset)
+    for name, values in columns.items():
+        start = layout[name]['offset']
+        data[start:start + values.nbytes] = values.astype(values.dtype.newbyteorder('<'), copy=False).tobytes()
+
+    return MAGIC + struct.pack('<I', len(header)) + header + bytes(data)
+
+
+def write_store(path=DEFAULT_OUTPUT, root=PROJECT_ROOT):
+    """扫描所有供应商数据并写出存储文件，返回节点数"""
+    _, nodes = load_merged_nodes(root)
+    payload = compile_store(nodes, source_fingerprint(root))
+    tmp_path = Path(path).with_suffix('.tmp')
+    tmp_path.write_bytes(payload)
+    tmp_path.replace(path)
+    return len(nodes)
+
+
+def load_or_build_store(path=DEFAULT_OUTPUT, root=PROJECT_ROOT):
+    """打开存储文件；文件缺失或与源数据不一致时重新编译"""
+    fingerprint = source_fingerprint(root)
+    try:
+        store = NodeStore.open(path)
+        if store.source_hash == fingerprint:
+            return store
+    except (OSError, ValueError):
+        pass
+
+    write_store(path, root)
+    return NodeStore.open(path)
+
+
+class NodeStore:
+    """内存映射的列式节点存储；列以 NumPy 数组形式零拷贝访问"""
+
+    def __init__(self, buffer, owner=None):
+        self._owner = owner
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("不是有效的节点存储文件")
+
+        header_length = struct.unpack_from('<I', buffer, len(MAGIC))[0]
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        if self.header['version'] != FORMAT_VERSION:
+            raise ValueError(f"不支持的存储版本: {self.header['version']}")
+
+        data_start = header_start + header_length
+        self.count = self.header['count']
+        self.dictionaries = self.header['dictionaries']
+        self.columns = {
+            name: np.frombuffer(buffer, dtype=np.dtype(spec['dtype']).newbyteorder('<'),
+                                count=spec['length'], offset=data_start + spec['offset'])
+            for name, spec in self.header['columns'].items()
+        }
+
+    @classmethod
+    def open(cls, path=DEFAULT_OUTPUT):
+        """以只读 mmap 方式打开存储文件"""
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mm), owner=mm)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def source_hash(self):
+        return self.header.get('source_hash')
+
+    def column(self, name):
+        """原始列数组（字典编码列返回编码值）"""
+        return self.columns[name]
+
+    def decode(self, name, codes=None):
+        """解码字典编码列，返回取值列表"""
+        dictionary = self.dictionaries[name]
+        codes = self.columns[name] if codes is None else codes
+        return [dictionary[code] for code in codes.tolist()]
+
+    def codes_for(self, name, value):
+        """取值对应的字典编码，不存在时返回 None"""
+        try:
+            return self.dictionaries[name].index(value)
+        except ValueError:
+            return None
+
+    def string(self, name, index):
+        """读取第 index 个节点的字符串列"""
+        offsets = self.columns[f'{name}.offsets']
+        return bytes(self.columns[f'{name}.bytes'][offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def services(self, index):
+        """解码第 index 个节点的 service_types 位掩码"""
+        mask = int(self.columns['service_types'][index])
+        return [service for bit, service in enumerate(self.dictionaries['service_types']) if mask >> bit & 1]
+
+    def node(self, index):
+        """把第 index 个节点还原为记录字典"""
+        cols = self.columns
+        day = int(cols['launch_day'][index])
+        launch = None if day == MISSING_DAY else date.fromordinal(EPOCH.toordinal() + day)
+        return {
+            'node_id': self.string('node_id', index),
+            'name': self.string('name', index),
+            'provider': self.dictionaries['provider'][cols['provider'][index]],
+            'location': {
+                'country': self.dictionaries['country'][cols['country'][index]],
+                'region': self.dictionaries['region'][cols['region'][index]],
+                'city': self.dictionaries['city'][cols['city'][index]],
+                'latitude': float(cols['lat'][index]),
+                'longitude': float(cols['lon'][index]),
+            },
+            'data_center': self.string('data_center', index),
+            'availability_zones': int(cols['availability_zones'][index]),
+            'service_types': self.services(index),
+            'status': self.dictionaries['status'][cols['status'][index]],
+            'network_info': {
+                'latency': _optional(cols['latency'][index]),
+                'uptime': _optional(cols['uptime'][index]),
+            },
+            'launch_date': None if launch is None else launch.isoformat() + 'T00:00:00',
+            'launch_year': None if launch is None else launch.year,
+        }
+
+    def iter_nodes(self):
+        for index in range(self.count):
+            yield self.node(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把 data/*/nodes.json 编译为列式二进制节点存储')
+    parser.add_argument('--output', '-o', type=Path, default=DEFAULT_OUTPUT, help='输出文件路径')
+    args = parser.parse_args()
+
+    print("正在编译列式节点存储...")
+    count = write_store(args.output)
+    print(f"节点存储已生成: {args.output}（{count} 个节点，{args.output.stat().st_size / 1024:.1f} KB）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大型节点文件的流式读取
+json.load 会把整个文件解析为一棵对象树；按机架、边缘 PoP 扩展后的数据文件可达数百 MB，
+本模块改为按块读取文件并增量解析，只在内存中保留一个读取块和当前这一条记录：
+
+- iter_nodes(path)：逐条产出顶层 "nodes" 数组中的节点（原始记录）
+- iter_normalized(provider_id, path)：逐条校验并规范化（见 node_schema.py），遇到问题时抛出 SchemaError
+- iter_array(path, key, skip)：通用版本，可跳过每个元素中的大字段（如时间线中各年份的 nodes）
+- load_document(path, skip)：读取顶层对象并跳过指定字段（如总览报告中的 map_data）
+
+跳过的字段只扫描括号与字符串边界，不构造任何对象。
+单条记录由 json 模块的 raw_decode 解析，记录跨越读取块时把后续内容读入后重新解析。
+
+另提供 RecordSpool（写入临时文件的记录列表）与 dump_json（可写出 RecordSpool 的
+json.dump 等价实现），供分析脚本以恒定内存生成逐节点的报告内容。
+
+用法:
+    python scripts/node_stream.py data/aws/nodes.json --provider aws    # 流式校验并统计节点数
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from node_schema import SchemaError, normalize_node
+
+# 每次读取的字符数
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_NON_SPACE = re.compile(r'\S')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_NUMBER_CHARS = re.compile(r'[0-9eE.+-]*')
+# 字符串开头引号之后的剩余部分（含结束引号）
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+class _Scanner:
+    """在按块读取的文本上逐个解析 JSON 值；buffer 只保留尚未消费的部分"""
+
+    def __init__(self, f, source, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        # buffer 起点在文件中的字符偏移，用于错误信息
+        self.offset = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        """丢弃已消费的内容并读入下一块；已到文件末尾时返回 False"""
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def _error(self, problem):
+        return ValueError(f"{self.source}: 第 {self.offset + self.pos} 个字符处{problem}")
+
+    def peek(self):
+        """跳过空白，返回下一个字符（文件结束时返回空串）"""
+        while True:
+            match = _NON_SPACE.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise self._error(f"应为 {' 或 '.join(chars)}，实际为 {char or '文件结尾'!r}")
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """解析下一个完整的值；值跨越读取块时补读（每次加倍）后重新解析"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # 数字可能在块末尾被截断（如 "12." 被解析为 12），需确认数字之后还有其他字符
+                if self.eof or _NUMBER_CHARS.match(self.buffer, end).end() < len(self.buffer):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise self._error(f"无法解析: {e.msg}") from None
+            self._fill(size)
+            size *= 2
+
+    def skip(self):
+        """跳过下一个值，不构造对象"""
+        if self.peek() not in '[{"':
+            self.decode()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise self._error("文件意外结束")
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == '"':
+                self._skip_string()
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _skip_string(self):
+        while True:
+            match = _STRING_REST.match(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                return
+            if not self._fill():
+                raise self._error("字符串未结束")
+
+    def read_object(self, skip=()):
+        """解析一个对象，skip 中的字段只扫描不保留"""
+        self.expect('{')
+        result = {}
+        if self.peek() == '}':
+            self.pos += 1
+            return result
+        while True:
+            if self.peek() != '"':
+                raise self._error("应为字段名")
+            key = self.decode()
+            self.expect(':')
+            if key in skip:
+                self.skip()
+            else:
+                result[key] = self.decode()
+            if self.expect(',}') == '}':
+                return result
+
+    def seek_key(self, key):
+        """在顶层对象中定位到字段 key 的值之前；没有该字段时返回 False"""
+        self.expect('{')
+        if self.peek() == '}':
+            return False
+        while True:
+            if self.peek() != '"':
+                raise self._error("应为字段名")
+            name = self.decode()
+            self.expect(':')
+            if name == key:
+                return True
+            self.skip()
+            if self.expect(',}') == '}':
+                return False
+
+    def iter_array(self, skip=()):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            if skip and self.peek() == '{':
+                yield self.read_object(skip)
+            else:
+                yield self.decode()
+            if self.expect(',]') == ']':
+                return
+
+
+def _open(path):
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_array(path, key=None, skip=(), chunk_size=CHUNK_SIZE):
+    """逐个产出数组元素：key 为 None 时读取顶层数组，否则读取顶层对象中 key 字段的数组；
+    元素为对象时省略 skip 中的字段"""
+    with _open(path) as f:
+        scanner = _Scanner(f, str(path), chunk_size)
+        if key is not None and not scanner.seek_key(key):
+            raise ValueError(f"{path}: 缺少 {key} 字段")
+        yield from scanner.iter_array(frozenset(skip))
+
+
+def iter_nodes(path, chunk_size=CHUNK_SIZE):
+    """逐条产出数据文件 nodes 数组中的原始节点记录"""
+    return iter_array(path, 'nodes', chunk_size=chunk_size)
+
+
+def iter_normalized(provider_id, data_path, chunk_size=CHUNK_SIZE):
+    """逐条校验并规范化节点，结果与 normalize_document 相同；
+    遇到不符合模式的节点立即抛出 SchemaError（已产出的节点不会撤回）。
+    检查重复节点ID需要保留已出现的ID，这是唯一随节点数增长的状态"""
+    source = str(data_path)
+    seen = set()
+    try:
+        for i, raw in enumerate(iter_nodes(data_path, chunk_size)):
+            node, errors = normalize_node(raw, provider_id, f"nodes[{i}]")
+            if node['node_id'] in seen:
+                errors.append(f"nodes[{i}].node_id: 重复的节点ID {node['node_id']!r}")
+            seen.add(node['node_id'])
+            if errors:
+                raise SchemaError(source, errors)
+            yield node
+    except SchemaError:
+        raise
+    except ValueError as e:
+        raise SchemaError(source, [f"nodes: {str(e).removeprefix(source + ': ')}"]) from None
+
+
+def load_document(path, skip=(), chunk_size=CHUNK_SIZE):
+    """读取顶层对象，省略 skip 中的字段（如只需要统计值时跳过逐节点列表）"""
+    with _open(path) as f:
+        return _Scanner(f, str(path), chunk_size).read_object(frozenset(skip))
+
+
+class RecordSpool:
+    """只追加的记录列表，记录以 JSON 行写入临时文件；
+    可以多次遍历，但不能在遍历过程中追加或嵌套遍历同一个 RecordSpool"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._count = 0
+
+    def append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        self._file.flush()
+        self._file.seek(0)
+        try:
+            for _ in range(self._count):
+                yield json.loads(self._file.readline())
+        finally:
+            self._file.seek(0, 2)
+
+    def close(self):
+        self._file.close()
+
+
+def dump_json(value, f, indent=2, level=0):
+    """与 json.dump(value, f, ensure_ascii=False, indent=indent) 输出相同，
+    另外把 RecordSpool 当作列表逐条写出，不在内存中展开"""
+    if isinstance(value, dict):
+        items = value.items()
+        opening, closing = '{', '}'
+    elif isinstance(value, (list, tuple, RecordSpool)):
+        items = value
+        opening, closing = '[', ']'
+    else:
+        f.write(json.dumps(value, ensure_ascii=False))
+        return
+
+    inner = '\n' + ' ' * (indent * (level + 1))
+    empty = True
+    for item in items:
+        f.write(opening + inner if empty else ',' + inner)
+        empty = False
+        if closing == '}':
+            key, item = item
+            if not isinstance(key, str):
+                key = json.dumps(key)
+            f.write(json.dumps(key, ensure_ascii=False) + ': ')
+        dump_json(item, f, indent, level + 1)
+    if empty:
+        f.write(opening + closing)
+    else:
+        f.write('\n' + ' ' * (indent * level) + closing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式读取节点数据文件，逐条校验并统计节点数')
+    parser.add_argument('files', nargs='+', type=Path, help='nodes.json 格式的数据文件')
+    parser.add_argument('--provider', default='unknown', help='规范化记录中的供应商ID')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='每次读取的字符数')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    failed = 0
+    for path in args.files:
+        started = time.perf_counter()
+        tracemalloc.reset_peak()
+        count = 0
+        try:
+            for _ in iter_normalized(args.provider, path, args.chunk_size):
+                count += 1
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"✗ {path}: 第 {count + 1} 个节点处出错: {e}")
+            continue
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"✓ {path}: {count} 个节点，{time.perf_counter() - started:.2f}s，内存峰值 {peak / 1024:.0f} KB")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
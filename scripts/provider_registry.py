@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+云服务商注册表
+供应商列表、显示名称、颜色与数据文件路径唯一来源于 data/providers-metadata.json：
+新增供应商只需在元数据中加一项（id、name、color、data_path）并放入数据文件，无需改动代码。
+
+- 元数据在首次使用时读取，文件 mtime 变化后自动重新读取
+- 节点数据按供应商延迟加载：只有首次访问某个供应商时才读取并规范化它的数据文件
+  （磁盘上仍有 node_schema 的规范化缓存），结果保存在 LRU 缓存中，超过容量时淘汰最久未使用的供应商；
+  缓存以数据文件的 mtime 与大小校验，文件变化后下次访问重新加载
+- public() 为页面提供的供应商配置（不含数据路径与采集源），serve.py 以 /api/providers 返回
+
+用法:
+    python scripts/provider_registry.py              # 列出已注册的供应商
+    python scripts/provider_registry.py --nodes      # 同时加载并统计每个供应商的节点数
+"""
+
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from node_schema import load_normalized
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+METADATA_PATH = PROJECT_ROOT / 'data' / 'providers-metadata.json'
+
+# 同时保留在内存中的供应商数，None 表示不限
+DEFAULT_CACHE_SIZE = 16
+# 不提供给页面的元数据字段
+PRIVATE_FIELDS = ('data_path', 'source')
+
+
+def load_metadata(metadata_path=METADATA_PATH):
+    """加载供应商元数据配置"""
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def provider_order(metadata):
+    """按 display_order 排列供应商ID，未列出的供应商排在最后"""
+    ordered = [pid for pid in metadata.get('display_order', []) if pid in metadata['providers']]
+    ordered += [pid for pid in metadata['providers'] if pid not in ordered]
+    return ordered
+
+
+def _file_stamp(path):
+    """(mtime, 大小)，文件缺失时为 None"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ProviderRegistry:
+    """元数据驱动的供应商注册表，节点数据按需加载并做 LRU 缓存（可多线程共享）"""
+
+    def __init__(self, root=PROJECT_ROOT, metadata_path=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.root = Path(root)
+        self.metadata_path = Path(metadata_path) if metadata_path else self.root / 'data' / 'providers-metadata.json'
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._metadata = None
+        self._metadata_stamp = None
+        # 供应商ID -> (数据文件 stamp, 节点列表)，按最近使用排序
+        self._nodes = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def metadata(self):
+        """当前元数据；文件变化后重新读取"""
+        stamp = _file_stamp(self.metadata_path)
+        with self._lock:
+            if self._metadata is not None and stamp == self._metadata_stamp:
+                return self._metadata
+        metadata = load_metadata(self.metadata_path)
+        with self._lock:
+            self._metadata, self._metadata_stamp = metadata, stamp
+        return metadata
+
+    def ids(self):
+        """按显示顺序排列的供应商ID"""
+        return provider_order(self.metadata)
+
+    def info(self, provider_id):
+        """单个供应商的元数据，未注册时抛出 ValueError"""
+        try:
+            return self.metadata['providers'][provider_id]
+        except KeyError:
+            raise ValueError(f"未知供应商: {provider_id}") from None
+
+    def name(self, provider_id):
+        return self.info(provider_id).get('name', provider_id)
+
+    def data_path(self, provider_id):
+        return self.root / self.info(provider_id)['data_path']
+
+    def select(self, provider_ids=None):
+        """校验并返回供应商ID列表，未指定时为全部供应商"""
+        if not provider_ids:
+            return self.ids()
+        for provider_id in provider_ids:
+            self.info(provider_id)
+        return list(dict.fromkeys(provider_ids))
+
+    def public(self):
+        """页面使用的供应商配置列表（按显示顺序，不含数据路径等内部字段）"""
+        metadata = self.metadata
+        return [
+            dict({key: value for key, value in metadata['providers'][pid].items() if key not in PRIVATE_FIELDS},
+                 id=pid)
+            for pid in provider_order(metadata)
+        ]
+
+    def nodes(self, provider_id):
+        """供应商的规范化节点（首次访问时加载）；数据文件不存在时为空列表，不符合模式时抛出 SchemaError。
+        每次返回新的列表，但节点字典在调用方之间共享，不应修改"""
+        data_path = self.data_path(provider_id)
+        stamp = _file_stamp(data_path)
+        with self._lock:
+            cached = self._nodes.get(provider_id)
+            if cached is not None and cached[0] == stamp:
+                self._nodes.move_to_end(provider_id)
+                self.hits += 1
+                return list(cached[1])
+            self.misses += 1
+
+        # 在锁外读取文件，加载大文件时不阻塞其他供应商的访问
+        nodes = load_normalized(provider_id, data_path) if stamp is not None else []
+        with self._lock:
+            self._nodes[provider_id] = (stamp, nodes)
+            self._nodes.move_to_end(provider_id)
+            while self.cache_size is not None and len(self._nodes) > self.cache_size:
+                self._nodes.popitem(last=False)
+                self.evictions += 1
+        return list(nodes)
+
+    def merged(self, provider_ids=None):
+        """按显示顺序合并供应商节点，返回 (供应商ID列表, 节点列表)"""
+        provider_ids = self.select(provider_ids)
+        nodes = []
+        for provider_id in provider_ids:
+            nodes.extend(self.nodes(provider_id))
+        return provider_ids, nodes
+
+    def loaded(self):
+        """当前缓存中的供应商ID（从最久未使用到最近使用）"""
+        with self._lock:
+            return list(self._nodes)
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列出 providers-metadata.json 中注册的云服务商')
+    parser.add_argument('--nodes', action='store_true', help='加载每个供应商的数据并统计节点数')
+    args = parser.parse_args()
+
+    registry = ProviderRegistry()
+    for provider_id in registry.ids():
+        info = registry.info(provider_id)
+        data_path = registry.data_path(provider_id)
+        line = f"{provider_id:<16} {info.get('name', ''):<14} {info.get('color', ''):<8} {info['data_path']}"
+        if not data_path.exists():
+            line += '（数据文件不存在）'
+        elif args.nodes:
+            line += f"  {len(registry.nodes(provider_id))} 个节点"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
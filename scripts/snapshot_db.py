@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点数据历史快照库（SQLite）
+每次导入时读取各供应商的 data/*/nodes.json，内容（SHA-1）与该供应商最近一次快照不同时
+新建一个快照并写入全部规范化节点，从而保留被覆盖前的历史：
+
+    snapshots(id, provider, file_version, last_updated, content_hash, ingested_at, node_count)
+    nodes(snapshot_id, provider, node_id, position, name, country, region, city, latitude, longitude,
+          status, availability_zones, launch_date, launch_year, row_hash, record)
+
+快照 id 全局递增，可作为时间点使用：“快照 X 时的数据集”即每个供应商 id 不超过 X 的最新快照。
+nodes 按 provider、country、status、launch_date 建有索引，record 为完整的规范化节点 JSON，
+row_hash 用于比较两次快照之间哪些节点发生了变化，position 保留节点在文件中的顺序。
+
+查询接口（SnapshotDB）：
+- nodes(at=, provider=, country=, status=, launched_from=, launched_to=)：某时间点的节点
+- count_by('provider', 'launch_year', at=, ...)：按维度分组计数
+- changes_since(snapshot_id, provider=)：指定快照之后新增、删除和修改的节点
+
+用法:
+    python scripts/snapshot_db.py ingest                          # 导入当前数据文件
+    python scripts/snapshot_db.py snapshots
+    python scripts/snapshot_db.py counts --by provider,launch_year
+    python scripts/snapshot_db.py changes --since 12 --provider aws
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from provider_registry import PROJECT_ROOT, ProviderRegistry
+
+DEFAULT_PATH = PROJECT_ROOT / 'data' / 'snapshots.db'
+DB_SCHEMA_VERSION = 1
+
+# count_by() 与 nodes() 可用的列，防止把任意字符串拼进 SQL
+DIMENSIONS = ('provider', 'country', 'region', 'city', 'status', 'launch_year')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider TEXT NOT NULL,
+    file_version TEXT,
+    last_updated TEXT,
+    content_hash TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    node_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_provider ON snapshots (provider, id);
+
+CREATE TABLE IF NOT EXISTS nodes (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    provider TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    country TEXT,
+    region TEXT,
+    city TEXT,
+    latitude REAL,
+    longitude REAL,
+    status TEXT,
+    availability_zones INTEGER,
+    launch_date TEXT,
+    launch_year INTEGER,
+    row_hash TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, node_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nodes_provider ON nodes (provider, snapshot_id);
+CREATE INDEX IF NOT EXISTS nodes_country ON nodes (country, snapshot_id);
+CREATE INDEX IF NOT EXISTS nodes_status ON nodes (status, snapshot_id);
+CREATE INDEX IF NOT EXISTS nodes_launch_date ON nodes (launch_date, snapshot_id);
+"""
+
+
+def row_hash(record):
+    return hashlib.sha1(record.encode('utf-8')).hexdigest()[:16]
+
+
+def node_row(snapshot_id, position, node):
+    location = node['location']
+    record = json.dumps(node, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return (snapshot_id, node['provider'], node['node_id'], position, node['name'], location['country'],
+            location['region'], location['city'], location['latitude'], location['longitude'],
+            node['status'], node['availability_zones'], node['launch_date'], node['launch_year'],
+            row_hash(record), record)
+
+
+class SnapshotDB:
+    """历史快照库；每个线程使用自己的连接（WAL 模式下读写互不阻塞），可在服务端多线程共享"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._ingest_lock = threading.Lock()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {DB_SCHEMA_VERSION}")
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 导入 ----
+
+    def ingest(self, root=PROJECT_ROOT, metadata_path=None, registry=None):
+        """导入所有供应商数据文件，内容未变化的跳过；返回新建的快照 [{id, provider, node_count}]
+        可传入已有的供应商注册表（如 serve.py 数据集的注册表），与之共享已加载的节点"""
+        registry = registry or ProviderRegistry(root, metadata_path)
+        created = []
+        with self._ingest_lock:
+            conn = self.connection()
+            for provider_id in registry.ids():
+                data_path = registry.data_path(provider_id)
+                try:
+                    raw_bytes = data_path.read_bytes()
+                except OSError:
+                    continue
+                content_hash = hashlib.sha1(raw_bytes).hexdigest()
+                latest = conn.execute(
+                    "SELECT content_hash FROM snapshots WHERE provider = ? ORDER BY id DESC LIMIT 1",
+                    (provider_id,)).fetchone()
+                if latest is not None and latest['content_hash'] == content_hash:
+                    continue
+
+                header = json.loads(raw_bytes)
+                nodes = registry.nodes(provider_id)
+                with conn:
+                    cursor = conn.execute(
+                        "INSERT INTO snapshots (provider, file_version, last_updated, content_hash, ingested_at, node_count)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (provider_id, header.get('version'), header.get('last_updated'), content_hash,
+                         datetime.now(timezone.utc).isoformat(timespec='seconds'), len(nodes)))
+                    snapshot_id = cursor.lastrowid
+                    conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     (node_row(snapshot_id, i, node) for i, node in enumerate(nodes)))
+                created.append({'id': snapshot_id, 'provider': provider_id, 'node_count': len(nodes)})
+        return created
+
+    # ---- 查询 ----
+
+    def snapshots(self, provider=None):
+        """快照列表（按 id 升序）"""
+        sql = "SELECT * FROM snapshots"
+        params = ()
+        if provider:
+            sql += " WHERE provider = ?"
+            params = (provider,)
+        return [dict(row) for row in self.connection().execute(sql + " ORDER BY id", params)]
+
+    def latest_id(self):
+        row = self.connection().execute("SELECT MAX(id) AS id FROM snapshots").fetchone()
+        return row['id'] or 0
+
+    def _state(self, at=None):
+        """时间点 at（默认最新）时各供应商所用快照的子查询"""
+        if at is None:
+            return "SELECT MAX(id) FROM snapshots GROUP BY provider", []
+        return "SELECT MAX(id) FROM snapshots WHERE id <= ? GROUP BY provider", [int(at)]
+
+    def _where(self, at=None, provider=None, country=None, status=None, launched_from=None, launched_to=None):
+        state, params = self._state(at)
+        clauses = [f"snapshot_id IN ({state})"]
+        for column, values in (('provider', provider), ('country', country), ('status', status)):
+            if values:
+                values = [values] if isinstance(values, str) else list(values)
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if launched_from:
+            clauses.append("launch_date >= ?")
+            params.append(launched_from)
+        if launched_to:
+            clauses.append("launch_date <= ?")
+            params.append(launched_to)
+        return ' AND '.join(clauses), params
+
+    def nodes(self, at=None, **filters):
+        """时间点 at 时满足筛选条件的规范化节点（各供应商内保持文件中的顺序）"""
+        where, params = self._where(at, **filters)
+        rows = self.connection().execute(
+            f"SELECT record FROM nodes WHERE {where} ORDER BY snapshot_id, position", params)
+        return [json.loads(row['record']) for row in rows]
+
+    def count_by(self, *dimensions, at=None, **filters):
+        """按维度分组计数，返回 [{维度..., nodes, availability_zones}]"""
+        unknown = [d for d in dimensions if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"不支持的维度: {', '.join(unknown)}（可选 {', '.join(DIMENSIONS)}）")
+        where, params = self._where(at, **filters)
+        columns = ', '.join(dimensions)
+        select = f"{columns}, " if dimensions else ''
+        group = f" GROUP BY {columns} ORDER BY {columns}" if dimensions else ''
+        rows = self.connection().execute(
+            f"SELECT {select}COUNT(*) AS nodes, SUM(availability_zones) AS availability_zones"
+            f" FROM nodes WHERE {where}{group}", params)
+        return [dict(row) for row in rows]
+
+    def changes_since(self, snapshot_id, provider=None):
+        """快照 snapshot_id 时的数据集与最新数据集之间新增、删除（provider/node_id）和修改的节点"""
+        snapshot_id = int(snapshot_id)
+        old_state, old_params = self._state(snapshot_id)
+        new_state, new_params = self._state()
+        provider_clause, provider_params = ('', [])
+        if provider:
+            provider_clause, provider_params = (' AND a.provider = ?', [provider])
+
+        def missing(columns, a_state, a_params, b_state, b_params):
+            """a 中在 b 里不存在的节点（b 按主键 (snapshot_id, node_id) 查找）"""
+            return self.connection().execute(
+                f"SELECT {columns} FROM nodes a WHERE a.snapshot_id IN ({a_state}){provider_clause}"
+                f" AND NOT EXISTS (SELECT 1 FROM nodes b WHERE b.snapshot_id IN ({b_state})"
+                f" AND b.node_id = a.node_id AND b.provider = a.provider)"
+                f" ORDER BY a.provider, a.node_id",
+                a_params + provider_params + b_params)
+
+        added = [json.loads(row['record']) for row in missing(
+            'a.record', new_state, new_params, old_state, old_params)]
+        removed = [f"{row['provider']}/{row['node_id']}" for row in missing(
+            'a.provider, a.node_id', old_state, old_params, new_state, new_params)]
+        modified = [json.loads(row['record']) for row in self.connection().execute(
+            f"SELECT a.record FROM nodes a JOIN nodes b ON b.node_id = a.node_id AND b.provider = a.provider"
+            f" WHERE a.snapshot_id IN ({new_state}) AND b.snapshot_id IN ({old_state}){provider_clause}"
+            f" AND a.row_hash != b.row_hash ORDER BY a.provider, a.node_id",
+            new_params + old_params + provider_params)]
+        return {'since': snapshot_id, 'latest': self.latest_id(),
+                'added': added, 'removed': removed, 'modified': modified}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='节点数据历史快照库')
+    parser.add_argument('--db', type=Path, default=DEFAULT_PATH, help='数据库文件路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('ingest', help='导入当前 data/*/nodes.json（内容未变化的供应商跳过）')
+
+    snapshots_parser = sub.add_parser('snapshots', help='列出快照')
+    snapshots_parser.add_argument('--provider', '-p', default=None)
+
+    counts_parser = sub.add_parser('counts', help='按维度分组计数')
+    counts_parser.add_argument('--by', default='provider', help=f"逗号分隔的维度：{', '.join(DIMENSIONS)}")
+    counts_parser.add_argument('--at', type=int, default=None, help='快照 id（默认最新）')
+    counts_parser.add_argument('--provider', '-p', default=None, help='逗号分隔的供应商ID')
+    counts_parser.add_argument('--status', default=None)
+
+    changes_parser = sub.add_parser('changes', help='列出某快照之后的变更')
+    changes_parser.add_argument('--since', type=int, required=True, help='快照 id')
+    changes_parser.add_argument('--provider', '-p', default=None)
+    args = parser.parse_args()
+
+    db = SnapshotDB(args.db)
+    if args.command == 'ingest':
+        created = db.ingest()
+        for snapshot in created:
+            print(f"✓ {snapshot['provider']}: 快照 {snapshot['id']}（{snapshot['node_count']} 个节点）")
+        print(f"新建 {len(created)} 个快照，最新快照 id 为 {db.latest_id()}")
+    elif args.command == 'snapshots':
+        for snapshot in db.snapshots(args.provider):
+            print(f"{snapshot['id']:>6}  {snapshot['provider']:<16} {snapshot['last_updated'] or '-':<20} "
+                  f"{snapshot['node_count']:>6} 个节点  导入于 {snapshot['ingested_at']}")
+    elif args.command == 'counts':
+        dimensions = [d for d in args.by.split(',') if d]
+        rows = db.count_by(*dimensions, at=args.at,
+                           provider=args.provider.split(',') if args.provider else None, status=args.status)
+        for row in rows:
+            keys = '  '.join(str(row[d]) for d in dimensions)
+            print(f"{keys:<40} {row['nodes']:>6} 个节点  {row['availability_zones'] or 0:>6} 个可用区")
+    else:
+        changes = db.changes_since(args.since, args.provider)
+        for node in changes['added']:
+            print(f"+ {node['provider']}/{node['node_id']}  {node['name']}")
+        for key in changes['removed']:
+            print(f"- {key}")
+        for node in changes['modified']:
+            print(f"~ {node['provider']}/{node['node_id']}  {node['name']}")
+        print(f"快照 {changes['since']} -> {changes['latest']}：新增 {len(changes['added'])}，"
+              f"删除 {len(changes['removed'])}，修改 {len(changes['modified'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节点空间索引
+把节点经纬度转换为单位球面上的三维向量，建立球树（ball tree）。
+弦长与大圆距离单调对应，因此树上的剪枝可以直接用欧氏距离计算，
+结果再换算为大圆距离（公里）。支持：
+- k 近邻：nearest(lat, lon, k)
+- 半径查询：within(lat, lon, radius_km)
+- 批量查询：nearest_batch / within_batch（如把大量客户端 IP 的地理位置一次性解析为候选区域）
+均可按供应商、状态筛选。
+
+用法:
+    python scripts/spatial_index.py 31.23 121.47 --k 5
+    python scripts/spatial_index.py 51.5 -0.12 --radius 500 --providers aws,azure
+"""
+
+import argparse
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+MAX_K = 100
+
+
+def to_unit_vectors(lats, lons):
+    """经纬度（度）-> 单位球面坐标 (N, 3)"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """弦长（单位球）-> 大圆距离（公里）"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def km_to_chord(km):
+    """大圆距离（公里）-> 弦长（单位球）"""
+    angle = min(km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """两点间大圆距离（公里）"""
+    return float(chord_to_km(np.linalg.norm(to_unit_vectors([lat1], [lon1]) - to_unit_vectors([lat2], [lon2]))))
+
+
+def validate_point(lat, lon):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"坐标超出范围: ({lat}, {lon})")
+
+
+class SpatialIndex:
+    """节点经纬度上的球树（构建后只读，可多线程共享）"""
+
+    def __init__(self, nodes, leaf_size=LEAF_SIZE):
+        self.nodes = nodes
+        self.points = to_unit_vectors([n['location']['latitude'] for n in nodes],
+                                      [n['location']['longitude'] for n in nodes])
+        self.providers = np.array([n['provider'] for n in nodes], dtype=object)
+        self.statuses = np.array([n['status'] for n in nodes], dtype=object)
+
+        # 树以数组形式存储：每个树节点覆盖 order[start:end]，叶子的 children 为 -1
+        self.order = np.arange(len(nodes))
+        self.centers = []
+        self.radii = []
+        self.bounds = []
+        self.children = []
+        if len(nodes):
+            self._build(0, len(nodes), leaf_size)
+        self.centers = np.array(self.centers)
+        self.radii = np.array(self.radii)
+
+    def _build(self, start, end, leaf_size):
+        """递归构建球树，返回树节点编号"""
+        idx = len(self.centers)
+        members = self.points[self.order[start:end]]
+        center = members.mean(axis=0)
+        self.centers.append(center)
+        self.radii.append(float(np.sqrt(((members - center) ** 2).sum(axis=1)).max()))
+        self.bounds.append((start, end))
+        self.children.append((-1, -1))
+
+        if end - start > leaf_size:
+            # 沿跨度最大的坐标轴在中位数处切分
+            axis = int(np.argmax(members.max(axis=0) - members.min(axis=0)))
+            segment = self.order[start:end]
+            self.order[start:end] = segment[np.argsort(self.points[segment, axis], kind='stable')]
+            mid = (start + end) // 2
+            left = self._build(start, mid, leaf_size)
+            right = self._build(mid, end, leaf_size)
+            self.children[idx] = (left, right)
+        return idx
+
+    def filter_mask(self, providers=None, statuses=None):
+        """按供应商、状态筛选，返回布尔掩码；无筛选条件时返回 None"""
+        mask = None
+        if providers:
+            mask = np.isin(self.providers, list(providers))
+        if statuses:
+            status_mask = np.isin(self.statuses, list(statuses))
+            mask = status_mask if mask is None else mask & status_mask
+        return mask
+
+    def _leaf_candidates(self, tree_node, query, mask):
+        start, end = self.bounds[tree_node]
+        rows = self.order[start:end]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return rows, np.sqrt(((self.points[rows] - query) ** 2).sum(axis=1))
+
+    def _knn(self, query, k, mask):
+        """最佳优先遍历，返回 [(弦长, 行号)]，按距离升序"""
+        best = []  # 大小为 k 的最大堆（存负距离）
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, tree_node = heapq.heappop(frontier)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            left, right = self.children[tree_node]
+            if left < 0:
+                rows, dists = self._leaf_candidates(tree_node, query, mask)
+                for dist, row in zip(dists.tolist(), rows.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, row))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, row))
+                continue
+            for child in (left, right):
+                lower = max(0.0, float(np.linalg.norm(query - self.centers[child])) - self.radii[child])
+                heapq.heappush(frontier, (lower, child))
+        return sorted((-d, row) for d, row in best)
+
+    def _within(self, query, chord, mask):
+        """返回弦长不超过 chord 的 [(弦长, 行号)]，按距离升序"""
+        found = []
+        stack = [0]
+        while stack:
+            tree_node = stack.pop()
+            if float(np.linalg.norm(query - self.centers[tree_node])) - self.radii[tree_node] > chord:
+                continue
+            left, right = self.children[tree_node]
+            if left >= 0:
+                stack.extend((left, right))
+                continue
+            rows, dists = self._leaf_candidates(tree_node, query, mask)
+            hit = dists <= chord
+            found.extend(zip(dists[hit].tolist(), rows[hit].tolist()))
+        return sorted(found)
+
+    def _results(self, pairs):
+        kms = chord_to_km([d for d, _ in pairs]) if pairs else []
+        return [(self.nodes[row], round(float(km), 3)) for (_, row), km in zip(pairs, kms)]
+
+    def nearest(self, lat, lon, k=5, providers=None, statuses=None):
+        """距离 (lat, lon) 最近的 k 个节点，返回 [(节点, 距离公里)]"""
+        return self.nearest_batch([(lat, lon)], k, providers, statuses)[0]
+
+    def within(self, lat, lon, radius_km, providers=None, statuses=None, limit=None):
+        """与 (lat, lon) 的大圆距离不超过 radius_km 的节点，返回 [(节点, 距离公里)]"""
+        return self.within_batch([(lat, lon)], radius_km, providers, statuses, limit)[0]
+
+    def nearest_batch(self, points, k=5, providers=None, statuses=None):
+        """批量 k 近邻：points 为 [(lat, lon), ...]，筛选条件只计算一次"""
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k 必须在 1 到 {MAX_K} 之间")
+        for lat, lon in points:
+            validate_point(lat, lon)
+        if not self.nodes or not points:
+            return [[] for _ in points]
+
+        mask = self.filter_mask(providers, statuses)
+        queries = to_unit_vectors([p[0] for p in points], [p[1] for p in points])
+        return [self._results(self._knn(query, k, mask)) for query in queries]
+
+    def within_batch(self, points, radius_km, providers=None, statuses=None, limit=None):
+        """批量半径查询；limit（非负整数）限制每个查询点返回的节点数（取最近的）"""
+        if radius_km < 0:
+            raise ValueError("radius_km 不能为负数")
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 0):
+            raise ValueError("limit 必须为非负整数")
+        for lat, lon in points:
+            validate_point(lat, lon)
+        if not self.nodes or not points:
+            return [[] for _ in points]
+
+        mask = self.filter_mask(providers, statuses)
+        chord = km_to_chord(radius_km)
+        queries = to_unit_vectors([p[0] for p in points], [p[1] for p in points])
+        return [self._results(self._within(query, chord, mask)[:limit]) for query in queries]
+
+
+def main():
+    from node_dataset import load_merged_nodes
+
+    parser = argparse.ArgumentParser(description='查询距离某个位置最近的云区域')
+    parser.add_argument('lat', type=float, help='纬度')
+    parser.add_argument('lon', type=float, help='经度')
+    parser.add_argument('--k', type=int, default=5, help='返回最近的 k 个节点（默认 5）')
+    parser.add_argument('--radius', type=float, default=None, help='改为返回该半径（公里）内的所有节点')
+    parser.add_argument('--providers', '-p', default=None, help='逗号分隔的供应商ID')
+    args = parser.parse_args()
+
+    _, nodes = load_merged_nodes()
+    index = SpatialIndex(nodes)
+    providers = args.providers.split(',') if args.providers else None
+    if args.radius is not None:
+        results = index.within(args.lat, args.lon, args.radius, providers)
+    else:
+        results = index.nearest(args.lat, args.lon, args.k, providers)
+
+    for node, km in results:
+        print(f"{km:>9.1f} km  {node['provider']:<14} {node['node_id']:<24} {node['name']}（{node['location']['city']}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,1027 @@
 #!/usr/bin/env python3
 """
 简单的HTTP服务器，用于本地测试云基础设施地图
+
+默认即为生产服务模式：
+- 多线程（每连接一个线程）或固定大小线程池（--workers）
+- HTTP/1.1 keep-alive
+- 启动时对 HTML/JSON 等文本资源预压缩（gzip，安装 brotli 时额外生成 br）
+- ETag / Last-Modified 条件请求（304）与 Cache-Control 缓存头
+- /metrics：按路由与状态码统计的请求数、字节数与延迟直方图（Prometheus 文本格式）；
+  访问日志由后台线程批量写出
 """
 
+import argparse
+import errno
+import gzip
+import hashlib
 import http.server
-import socketserver
+import json
+import mimetypes
 import os
+import re
+import socketserver
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+
+from node_dataset import NodeDataset
+from node_changes import ChangeLog
+from node_index import NodeIndex
+from aggregate_cube import build_cube
+from map_clusters import ClusterIndex, parse_bbox
+from http_metrics import PROMETHEUS_CONTENT_TYPE, AccessLog, RequestMetrics
+from snapshot_db import SnapshotDB
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只提供 gzip
+    brotli = None
+
+try:
+    from node_store import compile_store
+    from spatial_index import SpatialIndex
+    from latency_matrix import LatencyMatrix
+    from coverage_gaps import CoverageGrid
+except ImportError:  # 列式二进制存储、空间索引、延迟矩阵与覆盖分析依赖 NumPy，缺失时相应接口返回 501
+    compile_store = SpatialIndex = LatencyMatrix = CoverageGrid = None
+
+# 启动时预压缩的文本资源类型
+PRECOMPRESS_SUFFIXES = ('.html', '.json', '.js', '.css', '.svg', '.md', '.txt')
+# 小于该大小的文件压缩收益不大，直接原样返回
+MIN_COMPRESS_SIZE = 1024
+# 不参与预压缩扫描的目录
+SKIP_DIRS = {'.git', '.playwright-mcp', '.cursor', '__pycache__', 'node_modules', 'dist'}
+# 数据集变更的轮询间隔（秒）
+WATCH_INTERVAL = 2.0
+# 文件名带内容哈希（如 world-low.1ce0954fab.json）的资源内容不会变化，可长期缓存
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.\w+$')
+IMMUTABLE_MAX_AGE = 31536000
+# POST 请求体上限（字节）与单次批量查询的最大坐标数
+MAX_REQUEST_BODY = 2 * 1024 * 1024
+MAX_BATCH_POINTS = 10000
+# SSE 推送：无变更时发送注释行保活的间隔、单个连接的最长时长（到期后由浏览器自动重连）与重连等待
+STREAM_KEEPALIVE = 15.0
+STREAM_MAX_SECONDS = 300.0
+STREAM_RETRY_MS = 3000
+
+# API 路由：路径 -> 处理方法名
+API_ROUTES = {
+    '/api/providers': '_api_providers',
+    '/api/nodes': '_api_nodes',
+    '/api/nodes/query': '_api_nodes_query',
+    '/api/nodes/changes': '_api_nodes_changes',
+    '/api/nodes/stream': '_api_nodes_stream',
+    '/api/cube': '_api_cube',
+    '/api/nodes.bin': '_api_nodes_bin',
+    '/api/nodes/nearest': '_api_nodes_nearest',
+    '/api/clusters': '_api_clusters',
+    '/api/latency': '_api_latency',
+    '/api/latency/pairs': '_api_latency_pairs',
+    '/api/latency/failover': '_api_latency_failover',
+    '/api/coverage': '_api_coverage',
+    '/api/history/snapshots': '_api_history_snapshots',
+    '/api/history/counts': '_api_history_counts',
+    '/api/history/changes': '_api_history_changes',
+}
+
+# 接受 POST 的 API 路由
+API_POST_ROUTES = {
+    '/api/nodes/nearest/batch': '_api_nearest_batch',
+}
+
+METRICS_ROUTE = '/metrics'
+
+
+class CompressedBody:
+    """内存中的响应体及其预压缩副本"""
+
+    def __init__(self, body, content_type, mtime, etag=None, encodings=None):
+        self.body = body
+        self.content_type = content_type
+        self.mtime = mtime
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.etag = etag or '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+
+        # 预压缩副本：编码名 -> 压缩后字节；调用方已提供时直接使用
+        self.encodings = encodings or {}
+        if not self.encodings and len(body) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(body, quality=11)
+            self.encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class StaticAsset(CompressedBody):
+    """预加载到内存中的静态资源文件"""
+
+    def __init__(self, path):
+        stat = path.stat()
+        super().__init__(path.read_bytes(), guess_content_type(path), stat.st_mtime,
+                         encodings=prebuilt_encodings(path, stat.st_mtime))
+        self.path = path
+
+    def is_stale(self):
+        """源文件是否在启动后被修改"""
+        try:
+            return self.path.stat().st_mtime != self.mtime
+        except OSError:
+            return True
+
+
+class AssetCache:
+    """启动时扫描项目目录并预压缩文本资源，文件变更时按需重建单个资源"""
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self._assets = {}
+        self._lock = threading.Lock()
+        # 启动后因未预加载或文件变更而（重新）加载的次数
+        self.reloads = 0
+
+    def preload(self):
+        """扫描并预压缩所有文本资源，返回资源数量"""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for filename in filenames:
+                if filename.endswith(PRECOMPRESS_SUFFIXES):
+                    path = Path(dirpath) / filename
+                    self._assets[path] = StaticAsset(path)
+        return len(self._assets)
+
+    def get(self, path):
+        """获取资源，未预加载或已过期的文本资源会被（重新）加载"""
+        path = Path(path)
+        asset = self._assets.get(path)
+        if asset is not None and not asset.is_stale():
+            return asset
+        if not path.name.endswith(PRECOMPRESS_SUFFIXES) or not path.is_file():
+            return None
+
+        with self._lock:
+            asset = StaticAsset(path)
+            self._assets[path] = asset
+            self.reloads += 1
+        return asset
+
+    def __len__(self):
+        return len(self._assets)
+
+    def total_bytes(self):
+        """返回 (原始字节数, gzip 后字节数)"""
+        raw = sum(len(a.body) for a in self._assets.values())
+        compressed = sum(len(a.encodings.get('gzip', a.body)) for a in self._assets.values())
+        return raw, compressed
+
+
+def prebuilt_encodings(path, mtime):
+    """读取构建时生成的 .br / .gz 预压缩副本（如 scripts/build_dashboard.py 的产物），
+    副本比源文件旧时忽略"""
+    encodings = {}
+    for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+        sibling = path.with_name(path.name + suffix)
+        try:
+            if sibling.stat().st_mtime >= mtime:
+                encodings[name] = sibling.read_bytes()
+        except OSError:
+            pass
+    return encodings
+
+
+def guess_content_type(path):
+    """根据扩展名推断 Content-Type，文本类型统一带上 utf-8"""
+    content_type = mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/json', 'application/javascript'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def parse_accept_encoding(header):
+    """解析 Accept-Encoding，返回客户端接受的编码集合"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class CloudMapRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """支持预压缩、条件请求与缓存头的静态文件处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头与响应体分两次写出，keep-alive 连接上 Nagle 算法与延迟确认叠加会让每个请求多等约 40ms
+    disable_nagle_algorithm = True
+    # keep-alive 连接的空闲超时（秒），避免空闲连接长期占用工作线程
+    timeout = 15
+
+    asset_cache = None
+    dataset = None
+    changes = None
+    history = None
+    metrics = None
+    access_log = None
+    static_root = None
+    cache_max_age = 0
+    static_max_age = 86400
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=self.static_root, **kwargs)
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            if self.metrics is not None:
+                self.metrics.release()
+
+    def handle_one_request(self):
+        """在一次请求结束后记录路由、状态码、耗时与发送字节数（空闲等待下一个请求的时间不计入）"""
+        self.request_started = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.request_started is not None and self.metrics is not None:
+                self.metrics.observe(self.route_label(), self.command or '-', self.response_status or 0,
+                                     time.perf_counter() - self.request_started,
+                                     self.wfile.bytes_written - self.request_bytes)
+
+    def parse_request(self):
+        # 请求行已读入，从这里开始计时
+        self.request_started = time.perf_counter()
+        self.request_bytes = self.wfile.bytes_written
+        self.response_status = None
+        if self.metrics is not None:
+            self.metrics.request_started()
+        return super().parse_request()
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
+    def route_label(self):
+        """指标中的路由标签：API 与 /metrics 按路径区分，静态文件合并为 static，避免标签数量无限增长"""
+        route = urlsplit(getattr(self, 'path', '')).path
+        if route in API_ROUTES or route in API_POST_ROUTES or route == METRICS_ROUTE:
+            return route
+        return '/api/unknown' if route.startswith('/api/') else 'static'
+
+    def log_message(self, format, *args):
+        """访问日志交给后台线程写出；未配置时保持标准库的同步写 stderr"""
+        if self.access_log is None:
+            return super().log_message(format, *args)
+        self.access_log.write("%s - - [%s] %s" % (self.address_string(), self.log_date_time_string(), format % args))
+
+    def end_headers(self):
+        self.send_header('Vary', 'Accept-Encoding')
+        super().end_headers()
+
+    def send_head(self):
+        """API 请求交给路由表；静态文件优先从预压缩缓存返回，其余文件补充缓存头后返回"""
+        route = urlsplit(self.path).path
+        if route.startswith('/api/'):
+            return self._send_api(route)
+        if route == METRICS_ROUTE and self.metrics is not None:
+            return self._send_metrics()
+
+        path = Path(self.translate_path(self.path))
+        if path.is_dir() or self.asset_cache is None:
+            return super().send_head()
+
+        asset = self.asset_cache.get(path)
+        if self.metrics is not None:
+            self.metrics.count('asset_cache_lookups', result='hit' if asset is not None else 'uncached')
+        if asset is None:
+            return self._send_plain_file(path)
+        return self._send_cached(asset, self.max_age_for(path, self.cache_max_age))
+
+    def _send_metrics(self):
+        """Prometheus 文本格式的请求指标"""
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        return BytesResponse(body)
+
+    def max_age_for(self, path, default):
+        """带内容哈希的文件名使用一年的 immutable 缓存，其余使用 default"""
+        return IMMUTABLE_MAX_AGE if HASHED_NAME.search(path.name) else default
+
+    def do_POST(self):
+        """POST 只用于 API（批量查询等），请求体为 JSON"""
+        method = API_POST_ROUTES.get(urlsplit(self.path).path)
+        if method is None or self.dataset is None:
+            self.send_error(404, 'Unknown API endpoint')
+            return
+        f = getattr(self, method)()
+        if f:
+            try:
+                self.copyfile(f, self.wfile)
+            finally:
+                f.close()
+
+    def read_json_body(self):
+        """读取 JSON 请求体；大小超限或格式错误时抛出 ValueError"""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_REQUEST_BODY:
+            # 不读取超限的请求体，连接无法复用
+            self.close_connection = True
+            raise ValueError(f"请求体大小必须在 0 到 {MAX_REQUEST_BODY} 字节之间")
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except UnicodeDecodeError as e:
+            raise ValueError(f"请求体不是有效的 JSON: {e}")
+
+    def _send_api(self, route):
+        """分发 /api/ 请求"""
+        method = API_ROUTES.get(route)
+        if method is None or self.dataset is None:
+            self.send_error(404, 'Unknown API endpoint')
+            return None
+        return getattr(self, method)()
+
+    def _api_providers(self):
+        """供应商配置（名称、颜色等，来自 providers-metadata.json），页面据此生成图例、筛选项和配色"""
+        registry = self.dataset.registry
+        return self._send_json({'version': registry.metadata.get('version'), 'providers': registry.public()})
+
+    def _api_nodes(self):
+        """合并后带 provider 标记的全部节点"""
+        return self._send_cached(self.dataset_body(), self.cache_max_age)
+
+    def _api_nodes_changes(self):
+        """节点增量：/api/nodes/changes?since=<版本>&epoch=<epoch>
+        返回 since 之后新增、删除（provider/node_id）和修改的节点；
+        无法提供增量（版本过旧或服务已重启）时返回 reset: true，客户端应重新请求 /api/nodes"""
+        params = parse_qs(urlsplit(self.path).query)
+        try:
+            since = int(query_param(params, 'since', ''))
+        except ValueError:
+            return self._send_json({'error': "since 参数应为整数版本号"}, status=400)
+        return self._send_json(self.change_event(since, query_param(params, 'epoch')))
+
+    def change_event(self, since, epoch=None):
+        """since 之后的合并增量，无法提供时为 reset 事件"""
+        delta = self.changes.since(since, epoch)
+        if delta is None:
+            return {'epoch': self.changes.epoch, 'version': self.changes.version, 'reset': True}
+        delta['reset'] = False
+        return delta
+
+    def _api_nodes_stream(self):
+        """节点变更的 Server-Sent Events 推送：/api/nodes/stream?since=<版本>&epoch=<epoch>
+        连接后先发送 hello 事件（当前 epoch 与版本），之后每次数据集重建发送一个 change 事件，
+        内容与 /api/nodes/changes 相同；事件 id 为 "epoch:版本"，浏览器重连时经 Last-Event-ID 续传"""
+        params = parse_qs(urlsplit(self.path).query)
+        epoch, since = query_param(params, 'epoch'), query_param(params, 'since')
+        last_event_id = self.headers.get('Last-Event-ID')
+        if last_event_id:
+            epoch, _, since = last_event_id.rpartition(':')
+        try:
+            version = int(since) if since else self.changes.version
+        except ValueError:
+            return self._send_json({'error': "since 参数应为整数版本号"}, status=400)
+
+        # 长连接没有 Content-Length，结束时关闭连接
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Connection', 'close')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        if self.command == 'HEAD':
+            return None
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            self.write_event('hello', {'epoch': self.changes.epoch, 'version': self.changes.version},
+                             retry=STREAM_RETRY_MS)
+            while True:
+                if version != self.changes.version or (epoch and epoch != self.changes.epoch):
+                    event = self.change_event(version, epoch or None)
+                    self.write_event('reset' if event['reset'] else 'change', event,
+                                     event_id=f"{event['epoch']}:{event['version']}")
+                    epoch, version = event['epoch'], event['version']
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self.changes.wait(version, min(STREAM_KEEPALIVE, remaining)) == version:
+                    self.wfile.write(b': keep-alive\n\n')
+                    self.wfile.flush()
+        except OSError:
+            # 客户端断开或写超时
+            pass
+        return None
+
+    def write_event(self, event, data, event_id=None, retry=None):
+        """写出一个 SSE 事件"""
+        lines = []
+        if retry is not None:
+            lines.append(f"retry: {retry}")
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event}")
+        lines.append('data: ' + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        self.wfile.write(('\n'.join(lines) + '\n\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def _api_nodes_query(self):
+        """服务端筛选、排序与分页：/api/nodes/query?q=&provider=&status=&country=&sort=&order=&offset=&limit="""
+        params = parse_qs(urlsplit(self.path).query)
+        snapshot = self.dataset.snapshot
+        try:
+            result = snapshot.derived('index', lambda snap: NodeIndex(snap.nodes)).query(
+                search=query_param(params, 'q', ''),
+                providers=query_list(params, 'provider'),
+                statuses=query_list(params, 'status'),
+                countries=query_list(params, 'country'),
+                sort=query_param(params, 'sort'),
+                order=query_param(params, 'order', 'asc'),
+                offset=int(query_param(params, 'offset', 0)),
+                limit=int(query_param(params, 'limit', 20)),
+            )
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+
+        result['version'] = snapshot.version
+        return self._send_json(result)
+
+    def _api_cube(self):
+        """当前数据集的聚合立方体（供应商 × 国家 × 大洲 × 年份 × 状态）"""
+        body = self.dataset.snapshot.derived('cube_body', lambda snap: CompressedBody(
+            json.dumps(build_cube(snap.nodes, snap.providers, source_hash=snap.etag.strip('"')),
+                       ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            'application/json; charset=utf-8', snap.built_at))
+        return self._send_cached(body, self.cache_max_age)
+
+    def _api_clusters(self):
+        """地图聚合点：/api/clusters?level=&bbox=west,south,east,north&provider=
+        level 越大越细，超过最细一级时返回单个节点；不传 bbox 时返回全图"""
+        params = parse_qs(urlsplit(self.path).query)
+        snapshot = self.dataset.snapshot
+        try:
+            bbox = query_param(params, 'bbox')
+            result = snapshot.derived('clusters', lambda snap: ClusterIndex(snap.nodes)).query(
+                int(query_param(params, 'level', 0)),
+                parse_bbox(bbox) if bbox else None,
+                query_list(params, 'provider'),
+            )
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+
+        result['version'] = snapshot.version
+        return self._send_json(result)
+
+    def _api_nodes_bin(self):
+        """列式二进制节点存储（页面的数据引擎以 ArrayBuffer 读取，格式见 scripts/node_store.py）；
+        头部带数据集的 epoch/版本与源数据哈希，与 /api/nodes 的字段一致"""
+        if compile_store is None:
+            self.send_error(501, 'NumPy is required for the binary node store')
+            return None
+        body = self.dataset.snapshot.derived('store_body', lambda snap: CompressedBody(
+            compile_store(snap.nodes, source_hash=snap.source_hash,
+                          dataset={'epoch': snap.epoch, 'version': snap.version}),
+            'application/octet-stream', snap.built_at))
+        return self._send_cached(body, self.cache_max_age)
+
+    def spatial_index(self):
+        """当前快照的空间索引；缺少 NumPy 时返回 None"""
+        if SpatialIndex is None:
+            return None
+        return self.dataset.snapshot.derived('spatial', lambda snap: SpatialIndex(snap.nodes))
+
+    def _api_nodes_nearest(self):
+        """最近区域查询：/api/nodes/nearest?lat=&lon=&k=&radius_km=&limit=&provider=&status=
+        指定 radius_km 时返回半径内的节点（limit 限制数量），否则返回最近的 k 个"""
+        index = self.spatial_index()
+        if index is None:
+            self.send_error(501, 'NumPy is required for spatial queries')
+            return None
+
+        params = parse_qs(urlsplit(self.path).query)
+        try:
+            if query_param(params, 'lat') is None or query_param(params, 'lon') is None:
+                raise ValueError("缺少 lat/lon 参数")
+            lat = float(query_param(params, 'lat'))
+            lon = float(query_param(params, 'lon'))
+            providers = query_list(params, 'provider')
+            statuses = query_list(params, 'status')
+            radius_km = query_param(params, 'radius_km')
+            if radius_km is not None:
+                limit = query_param(params, 'limit')
+                results = index.within(lat, lon, float(radius_km), providers, statuses,
+                                       int(limit) if limit is not None else None)
+            else:
+                results = index.nearest(lat, lon, int(query_param(params, 'k', 5)), providers, statuses)
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+
+        return self._send_json({
+            'version': self.dataset.snapshot.version,
+            'nodes': [dict(node, distance_km=km) for node, km in results],
+        })
+
+    def _api_nearest_batch(self):
+        """批量最近区域查询：POST {"points": [[lat, lon], ...], "k": 5, "radius_km": null,
+        "limit": null, "provider": [...], "status": [...]}，每个坐标返回候选节点的精简记录"""
+        index = self.spatial_index()
+        if index is None:
+            self.send_error(501, 'NumPy is required for spatial queries')
+            return None
+
+        try:
+            request = self.read_json_body()
+            points = [(float(lat), float(lon)) for lat, lon in request.get('points', [])]
+            if len(points) > MAX_BATCH_POINTS:
+                raise ValueError(f"单次最多查询 {MAX_BATCH_POINTS} 个坐标")
+            providers = body_list(request, 'provider')
+            statuses = body_list(request, 'status')
+            if request.get('radius_km') is not None:
+                results = index.within_batch(points, float(request['radius_km']), providers, statuses,
+                                             request.get('limit'))
+            else:
+                results = index.nearest_batch(points, int(request.get('k', 5)), providers, statuses)
+        except (TypeError, ValueError, AttributeError) as e:
+            return self._send_json({'error': str(e)}, status=400)
+
+        return self._send_json({
+            'version': self.dataset.snapshot.version,
+            'results': [
+                [{'node_id': node['node_id'], 'provider': node['provider'], 'name': node['name'],
+                  'distance_km': km} for node, km in matches]
+                for matches in results
+            ],
+        })
+
+    def latency_matrix(self):
+        """当前快照的区域间延迟矩阵；缺少 NumPy 时返回 None"""
+        if LatencyMatrix is None:
+            return None
+        return self.dataset.snapshot.derived('latency', lambda snap: LatencyMatrix.build(snap.nodes))
+
+    def _send_latency(self, query):
+        """用 query(matrix, params) 执行延迟查询并返回 JSON"""
+        matrix = self.latency_matrix()
+        if matrix is None:
+            self.send_error(501, 'NumPy is required for latency estimation')
+            return None
+        params = parse_qs(urlsplit(self.path).query)
+        try:
+            result = query(matrix, params)
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+        result['version'] = self.dataset.snapshot.version
+        return self._send_json(result)
+
+    def _api_latency(self):
+        """两个区域间的估算 RTT：/api/latency?a=aws/us-east-1&b=azure/eastus"""
+        def query(matrix, params):
+            a, b = query_param(params, 'a'), query_param(params, 'b')
+            if a is None or b is None:
+                raise ValueError("缺少 a/b 参数")
+            return matrix.rtt_between(a, b)
+        return self._send_latency(query)
+
+    def _api_latency_pairs(self):
+        """RTT 低于阈值的区域对：/api/latency/pairs?max_ms=10&limit=20&provider=&same_provider=1"""
+        return self._send_latency(lambda matrix, params: {'pairs': matrix.best_pairs(
+            float(query_param(params, 'max_ms', 10)),
+            providers=query_list(params, 'provider'),
+            cross_provider=query_param(params, 'same_provider') not in ('1', 'true'),
+            limit=int(query_param(params, 'limit', 20)),
+        )})
+
+    def _api_latency_failover(self):
+        """各区域的备选区域：/api/latency/failover?region=aws/us-east-1&k=3&provider=&cross_provider=1"""
+        return self._send_latency(lambda matrix, params: {'failover': matrix.failover(
+            int(query_param(params, 'k', 3)),
+            regions=query_list(params, 'region'),
+            providers=query_list(params, 'provider'),
+            cross_provider=query_param(params, 'cross_provider') in ('1', 'true'),
+        )})
+
+    def _api_coverage(self):
+        """供应商组合的覆盖缺口：/api/coverage?provider=aws,azure&max_km=1000&max_ms=&limit=20&cells=1"""
+        if CoverageGrid is None:
+            self.send_error(501, 'NumPy is required for coverage analysis')
+            return None
+        params = parse_qs(urlsplit(self.path).query)
+        coverage = self.dataset.snapshot.derived('coverage', lambda snap: CoverageGrid(snap.nodes))
+        try:
+            max_km, max_ms = query_param(params, 'max_km'), query_param(params, 'max_ms')
+            result = coverage.analyze(
+                query_list(params, 'provider'),
+                max_km=None if max_km is None else float(max_km),
+                max_ms=None if max_ms is None else float(max_ms),
+                limit=int(query_param(params, 'limit', 20)),
+                cells=query_param(params, 'cells') in ('1', 'true'),
+            )
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+        result['version'] = self.dataset.snapshot.version
+        return self._send_json(result)
+
+    def _send_history(self, query):
+        """用 query(history, params) 查询历史快照库并返回 JSON"""
+        if self.history is None:
+            self.send_error(404, 'Snapshot history is disabled')
+            return None
+        params = parse_qs(urlsplit(self.path).query)
+        try:
+            result = query(self.history, params)
+        except ValueError as e:
+            return self._send_json({'error': str(e)}, status=400)
+        result['latest'] = self.history.latest_id()
+        return self._send_json(result)
+
+    def _api_history_snapshots(self):
+        """历史快照列表：/api/history/snapshots?provider="""
+        return self._send_history(lambda history, params: {
+            'snapshots': history.snapshots(query_param(params, 'provider')),
+        })
+
+    def _api_history_counts(self):
+        """按维度分组计数：/api/history/counts?by=provider,launch_year&at=&provider=&country=&status=&from=&to=
+        at 为快照 id（默认最新），from/to 按 launch_date 筛选"""
+        def query(history, params):
+            at = query_param(params, 'at')
+            return {'rows': history.count_by(
+                *query_list(params, 'by'),
+                at=int(at) if at else None,
+                provider=query_list(params, 'provider'),
+                country=query_list(params, 'country'),
+                status=query_list(params, 'status'),
+                launched_from=query_param(params, 'from'),
+                launched_to=query_param(params, 'to'),
+            )}
+        return self._send_history(query)
+
+    def _api_history_changes(self):
+        """快照之后的变更：/api/history/changes?since=<快照 id>&provider="""
+        def query(history, params):
+            since = query_param(params, 'since')
+            if since is None:
+                raise ValueError("缺少 since 参数")
+            return history.changes_since(int(since), query_param(params, 'provider'))
+        return self._send_history(query)
+
+    def dataset_body(self):
+        """当前数据集快照的预压缩响应体（每个版本只序列化和压缩一次）"""
+        return self.dataset.snapshot.derived('nodes_body', lambda snap: CompressedBody(
+            snap.payload, 'application/json; charset=utf-8', snap.built_at, etag=snap.etag))
+
+    def _send_json(self, obj, status=200):
+        """发送动态生成的 JSON 响应，较大时按需 gzip"""
+        body = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        encoding = None
+        if len(body) >= MIN_COMPRESS_SIZE and 'gzip' in parse_accept_encoding(self.headers.get('Accept-Encoding')):
+            body = gzip.compress(body, compresslevel=5, mtime=0)
+            encoding = 'gzip'
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        return BytesResponse(body)
+
+    def _send_cached(self, asset, max_age):
+        """发送内存中的响应体，按 Accept-Encoding 选择预压缩副本"""
+        if self._not_modified(asset.etag, asset.mtime):
+            self._send_not_modified(asset.etag, asset.last_modified, max_age)
+            return None
+
+        accepted = parse_accept_encoding(self.headers.get('Accept-Encoding'))
+        encoding = next((name for name in ('br', 'gzip') if name in asset.encodings and name in accepted), None)
+        body = asset.encodings[encoding] if encoding else asset.body
+        if self.metrics is not None:
+            self.metrics.count('precompressed_responses', encoding=encoding or 'identity')
+
+        self.send_response(200)
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', asset.etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', cache_control(max_age))
+        self.end_headers()
+        return BytesResponse(body)
+
+    def _send_plain_file(self, path):
+        """返回非文本资源（图片等），使用基于 mtime 和大小的弱 ETag"""
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, 'File not found')
+            return None
+
+        try:
+            stat = os.fstat(f.fileno())
+            etag = 'W/"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+            if self._not_modified(etag, stat.st_mtime):
+                f.close()
+                self._send_not_modified(etag, last_modified, self.max_age_for(path, self.static_max_age))
+                return None
+
+            self.send_response(200)
+            self.send_header('Content-Type', guess_content_type(path))
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Cache-Control', cache_control(self.max_age_for(path, self.static_max_age)))
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def _not_modified(self, etag, mtime):
+        """判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            candidates = [tag.strip() for tag in if_none_match.split(',')]
+            strong = etag[2:] if etag.startswith('W/') else etag
+            return '*' in candidates or etag in candidates or strong in candidates
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def _send_not_modified(self, etag, last_modified, max_age):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Cache-Control', cache_control(max_age))
+        self.end_headers()
+
+
+class CountingWriter:
+    """包装连接的写端，累计已发送字节数（包括响应头）"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class BytesResponse:
+    """让内存中的响应体可以走 SimpleHTTPRequestHandler 的 copyfile 流程"""
+
+    def __init__(self, body):
+        self._body = body
+        self._sent = False
+
+    def read(self, size=-1):
+        if self._sent:
+            return b''
+        self._sent = True
+        return self._body
+
+    def close(self):
+        pass
+
+
+def query_param(params, name, default=None):
+    """读取单值查询参数"""
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def query_list(params, name):
+    """读取可重复或逗号分隔的多值查询参数，'all' 视为不筛选"""
+    values = []
+    for value in params.get(name, []):
+        values.extend(v for v in value.split(',') if v and v != 'all')
+    return values
+
+
+def body_list(body, name):
+    """读取 JSON 请求体中的多值字段：字符串视为单个取值，其他非字符串列表抛出 ValueError"""
+    value = body.get(name)
+    if value is None or isinstance(value, str):
+        return [value] if value else None
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{name} 应为字符串或字符串列表")
+    return value
+
+
+def cache_control(max_age):
+    """max_age 为 0 时要求客户端每次用 ETag 重新验证"""
+    if max_age <= 0:
+        return 'no-cache'
+    if max_age >= IMMUTABLE_MAX_AGE:
+        return 'public, max-age=%d, immutable' % max_age
+    return 'public, max-age=%d' % max_age
+
+
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+    """使用固定大小线程池处理连接的 HTTP 服务器"""
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """每个连接一个线程的 HTTP 服务器"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='云基础设施地图 HTTP 服务器')
+    parser.add_argument('--port', '-p', type=int, default=8000, help='监听端口（默认 8000）')
+    parser.add_argument('--bind', '-b', default='', help='绑定地址（默认所有地址）')
+    parser.add_argument('--workers', '-w', type=int, default=0,
+                        help='线程池大小；0 表示每个连接一个线程（默认）')
+    parser.add_argument('--cache-max-age', type=int, default=0,
+                        help='HTML/JSON 等文本资源的 Cache-Control max-age（秒），0 表示每次用 ETag 重新验证')
+    parser.add_argument('--static-max-age', type=int, default=86400,
+                        help='图片等其他静态资源的 Cache-Control max-age（秒）')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                        help='检查数据文件变更的间隔（秒）')
+    parser.add_argument('--no-precompress', action='store_true', help='不在启动时预压缩资源')
+    parser.add_argument('--static-root', type=Path, default=None,
+                        help='静态文件目录（如 scripts/build_dashboard.py 构建的 dist），默认为项目根目录')
+    parser.add_argument('--access-log', default='-',
+                        help='访问日志文件，- 表示标准错误（默认）；日志由后台线程批量写出')
+    parser.add_argument('--no-access-log', action='store_true', help='不记录访问日志')
+    parser.add_argument('--history-db', type=Path, default=None,
+                        help='历史快照库路径（默认 data/snapshots.db），数据文件每次变更都会导入一个新快照')
+    parser.add_argument('--no-history', action='store_true', help='不记录历史快照，/api/history/* 返回 404（库无法打开时也会自动禁用）')
+    return parser.parse_args(argv)
+
+
+def ingest_history(history, project_root, registry=None):
+    """把当前数据文件导入历史快照库；失败时只打印警告，不影响服务"""
+    try:
+        for snapshot in history.ingest(project_root, registry=registry):
+            print(f"🗃️  历史快照 {snapshot['id']}: {snapshot['provider']}（{snapshot['node_count']} 个节点）",
+                  file=sys.stderr)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"⚠️  导入历史快照失败: {e}", file=sys.stderr)
+
+
+def open_history(args, project_root):
+    """打开历史快照库；被禁用或无法打开（如只读目录）时返回 None，服务照常启动"""
+    if args.no_history:
+        return None
+    path = project_root / args.history_db if args.history_db else project_root / 'data' / 'snapshots.db'
+    try:
+        return SnapshotDB(path)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  无法打开历史快照库 {path}，已禁用历史记录: {e}", file=sys.stderr)
+        return None
+
+
+def create_server(args, project_root):
+    """根据命令行参数创建服务器实例"""
+    dataset = NodeDataset(project_root)
+    changes = ChangeLog(dataset.snapshot)
+    # 先注册变更记录再启动监视线程，保证每次重建都被记录
+    dataset.add_listener(changes)
+    history = open_history(args, project_root)
+    if history is not None:
+        ingest_history(history, project_root, dataset.registry)
+        dataset.add_listener(lambda previous, snapshot: ingest_history(history, project_root, dataset.registry))
+    dataset.start_watcher(args.watch_interval)
+
+    static_root = (project_root / args.static_root).resolve() if args.static_root else project_root
+    asset_cache = AssetCache(static_root)
+    access_log = None
+    if not args.no_access_log:
+        stream = sys.stderr if args.access_log == '-' else open(args.access_log, 'a', encoding='utf-8')
+        access_log = AccessLog(stream)
+    metrics = RequestMetrics()
+    metrics.add_gauge(lambda: [
+        ('dataset_version', 'gauge', 'Version of the current node dataset snapshot.', dataset.snapshot.version),
+        ('dataset_nodes', 'gauge', 'Nodes in the current dataset snapshot.', len(dataset.snapshot.nodes)),
+        ('provider_cache_entries', 'gauge', 'Providers whose normalized nodes are held in memory.',
+         len(dataset.registry.loaded())),
+        ('asset_cache_entries', 'gauge', 'Static assets held in memory.', len(asset_cache)),
+        ('asset_cache_reloads_total', 'counter', 'Assets loaded after startup (not preloaded or changed on disk).',
+         asset_cache.reloads),
+        ('access_log_dropped_total', 'counter', 'Access log lines dropped because the writer fell behind.',
+         access_log.dropped if access_log else 0),
+    ])
+
+    handler = type('Handler', (CloudMapRequestHandler,), {
+        'asset_cache': asset_cache,
+        'static_root': str(static_root),
+        'dataset': dataset,
+        'changes': changes,
+        'history': history,
+        'metrics': metrics,
+        'access_log': access_log,
+        'cache_max_age': args.cache_max_age,
+        'static_max_age': args.static_max_age,
+    })
+    if not args.no_precompress:
+        handler.asset_cache.preload()
+
+    address = (args.bind, args.port)
+    if args.workers > 0:
+        return ThreadPoolHTTPServer(address, handler, args.workers)
+    return ThreadingHTTPServer(address, handler)
+
+
+def main(argv=None):
+    args = parse_args(argv)
 
-def main():
-    # 设置端口
-    PORT = 8000
-    
     # 切换到项目根目录
-    project_root = Path(__file__).parent
+    project_root = Path(__file__).parent.resolve()
     os.chdir(project_root)
-    
-    # 创建HTTP服务器
-    Handler = http.server.SimpleHTTPRequestHandler
-    
+
+    httpd = None
     try:
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
+        with create_server(args, project_root) as httpd:
+            host = args.bind or 'localhost'
+            raw, compressed = httpd.RequestHandlerClass.asset_cache.total_bytes()
+            mode = f"线程池 ({args.workers} 个工作线程)" if args.workers > 0 else "每连接一个线程"
+
             print(f"🚀 服务器启动成功!")
-            print(f"📊 访问地址: http://localhost:{PORT}/cloud-infrastructure-map.html")
-            print(f"📁 服务目录: {project_root}")
+            print(f"📊 访问地址: http://{host}:{args.port}/cloud-infrastructure-map.html")
+            print(f"📁 服务目录: {httpd.RequestHandlerClass.static_root}")
+            print(f"🗂️  节点数据: {len(httpd.RequestHandlerClass.dataset.snapshot.nodes)} 个节点 (/api/nodes)")
+            print(f"🧵 并发模式: {mode}")
+            print(f"📈 请求指标: http://{host}:{args.port}/metrics")
+            print(f"🗜️  预压缩资源: {raw / 1024:.0f} KB -> {compressed / 1024:.0f} KB (gzip)"
+                  f"{'，已启用 brotli' if brotli else ''}")
             print(f"⏹️  按 Ctrl+C 停止服务器")
             print("-" * 50)
-            
+
             httpd.serve_forever()
-            
+
     except KeyboardInterrupt:
         print("\n🛑 服务器已停止")
         sys.exit(0)
     except OSError as e:
-        if e.errno == 48:  # Address already in use
-            print(f"❌ 端口 {PORT} 已被占用，请尝试其他端口")
-            print("💡 可以修改 serve.py 中的 PORT 变量")
+        if e.errno == errno.EADDRINUSE:
+            print(f"❌ 端口 {args.port} 已被占用，请尝试其他端口")
+            print("💡 可以使用 --port 参数指定其他端口")
         else:
             print(f"❌ 启动服务器失败: {e}")
         sys.exit(1)
+    finally:
+        if httpd is not None and httpd.RequestHandlerClass.access_log is not None:
+            httpd.RequestHandlerClass.access_log.close()
 
 if __name__ == "__main__":
     main()
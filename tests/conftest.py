@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""测试共用设置：scripts/ 下的模块以同级导入的方式互相引用，这里把该目录加入 sys.path；
+make_node 按节点模式（node_schema.py）规范化构造节点，测试使用与数据文件相同的记录结构"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from node_schema import normalize_node  # noqa: E402
+
+
+def schema_node(node_id='n0', provider='aws', location=None, **fields):
+    """规范化后的节点；location 中的字段与 fields 覆盖默认的原始记录（值为 None 表示缺失）"""
+    raw = {
+        'node_id': node_id,
+        'name': f'节点 {node_id}',
+        'location': dict({'country': '美国', 'region': '东部', 'city': '弗吉尼亚',
+                          'latitude': 38.0, 'longitude': -77.5}, **(location or {})),
+        'data_center': f'数据中心 {node_id}',
+        'availability_zones': 3,
+        'service_types': ['compute'],
+        'status': 'active',
+        'network_info': {'latency': None, 'uptime': None},
+        'launch_date': '2020-01-01T00:00:00',
+    }
+    raw.update(fields)
+    node, errors = normalize_node(raw, provider)
+    assert not errors, errors
+    return node
+
+
+@pytest.fixture
+def make_node():
+    return schema_node
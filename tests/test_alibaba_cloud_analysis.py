@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""分析报告：--stream 与默认路径的输出应逐字节一致"""
+
+import alibaba_cloud_analysis as analysis
+
+PROVIDERS = ['alibaba_cloud', 'aws', 'azure']
+
+
+def _generate(monkeypatch, docs_dir, stream):
+    docs_dir.mkdir()
+    monkeypatch.setattr(analysis, 'DOCS_DIR', docs_dir)
+    analysis.generate_reports(PROVIDERS, stream=stream)
+    return {path.name: path.read_bytes() for path in docs_dir.iterdir()}
+
+
+def test_stream_reports_match_default(monkeypatch, tmp_path):
+    default = _generate(monkeypatch, tmp_path / 'default', stream=False)
+    streamed = _generate(monkeypatch, tmp_path / 'stream', stream=True)
+
+    assert sorted(default) == sorted(streamed)
+    assert len(default) == len(PROVIDERS) * 6
+    for name in default:
+        assert streamed[name] == default[name], name
+
+
+def test_markdown_ties_ordered_by_name(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis, 'DOCS_DIR', tmp_path)
+    overview = {'total_nodes': 0, 'total_availability_zones': 0, 'countries': {}, 'regions': {},
+                'years': {}, 'map_data': []}
+    outputs = []
+    for geographic in ({'亚洲': 3, '欧洲': 5, '北美洲': 3}, {'北美洲': 3, '欧洲': 5, '亚洲': 3}):
+        analysis.generate_markdown_reports(overview, [], geographic, 'test')
+        outputs.append((tmp_path / 'test_geographic.md').read_text(encoding='utf-8'))
+
+    assert outputs[0] == outputs[1]
+    rows = [line.split('|')[1].strip() for line in outputs[0].splitlines()[6:]]
+    assert rows == ['欧洲'] + sorted(['亚洲', '北美洲'])
+
+
+def test_iterator_reports_close_spools(monkeypatch):
+    spools = []
+    original = analysis.RecordSpool
+
+    def tracking_spool():
+        spool = original()
+        spools.append(spool)
+        return spool
+
+    monkeypatch.setattr(analysis, 'RecordSpool', tracking_spool)
+    data = analysis.load_data('alibaba_cloud', stream=True)
+    overview = analysis.create_overview_report(data)
+    timeline = analysis.create_timeline_analysis(analysis.load_data('alibaba_cloud', stream=True))
+
+    assert spools and all(spool._file.closed for spool in spools)
+    assert overview == analysis.create_overview_report(analysis.load_data('alibaba_cloud'))
+    assert timeline == analysis.create_timeline_analysis(analysis.load_data('alibaba_cloud'))
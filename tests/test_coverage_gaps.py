@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""覆盖缺口分析：limit 参数"""
+
+import pytest
+
+from coverage_gaps import CoverageGrid
+
+
+@pytest.fixture
+def coverage(make_node):
+    nodes = [make_node('us-east-1', 'aws'),
+             make_node('westeurope', 'azure', location={'country': '荷兰', 'latitude': 52.4, 'longitude': 4.9})]
+    return CoverageGrid(nodes, rows=30, cols=60)
+
+
+def test_analyze_limit(coverage):
+    assert len(coverage.analyze(limit=3)['countries']) == 3
+    assert coverage.analyze(limit=0)['countries'] == []
+
+
+def test_analyze_rejects_negative_limit(coverage):
+    with pytest.raises(ValueError, match='limit'):
+        coverage.analyze(limit=-5)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""节点数据采集：通过本地模拟上游（stub）端到端拉取"""
+
+import asyncio
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from ingest_nodes import ingest_all, start_stub_server
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# 2025-03-01T12:00:00Z
+UPSTREAM_MTIME = 1740830400
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """只注册 aws 的工作区与一个内容有变化、不带 last_updated 的上游目录"""
+    root = tmp_path / 'root'
+    (root / 'data' / 'aws').mkdir(parents=True)
+    metadata = json.loads((PROJECT_ROOT / 'data' / 'providers-metadata.json').read_text(encoding='utf-8'))
+    metadata['providers'] = {'aws': metadata['providers']['aws']}
+    metadata['display_order'] = ['aws']
+    (root / 'data' / 'providers-metadata.json').write_text(json.dumps(metadata, ensure_ascii=False),
+                                                           encoding='utf-8')
+    shutil.copy(PROJECT_ROOT / 'data' / 'aws' / 'nodes.json', root / 'data' / 'aws' / 'nodes.json')
+
+    document = json.loads((root / 'data' / 'aws' / 'nodes.json').read_text(encoding='utf-8'))
+    upstream_path = tmp_path / 'upstream' / 'aws' / 'nodes.json'
+    upstream_path.parent.mkdir(parents=True)
+    upstream = {'nodes': document['nodes'][1:]}
+    upstream_path.write_text(json.dumps(upstream, ensure_ascii=False), encoding='utf-8')
+    os.utime(upstream_path, (UPSTREAM_MTIME, UPSTREAM_MTIME))
+
+    server, base_url = start_stub_server(tmp_path / 'upstream')
+    yield root, base_url, document
+    server.shutdown()
+    server.server_close()
+
+
+def ingest(root, base_url):
+    return asyncio.run(ingest_all(['aws'], base_url, root=root, retries=0))
+
+
+def test_changed_content_gets_new_last_updated(workspace):
+    root, base_url, previous = workspace
+
+    [result] = ingest(root, base_url)
+    assert result['status'] == 'updated'
+    written = json.loads((root / 'data' / 'aws' / 'nodes.json').read_text(encoding='utf-8'))
+    assert len(written['nodes']) == len(previous['nodes']) - 1
+    assert written['provider'] == previous['provider']
+    assert written['last_updated'] != previous['last_updated']
+    # 上游的 Last-Modified（文件 mtime）换算为本地时间
+    assert written['last_updated'] == datetime.fromtimestamp(UPSTREAM_MTIME).isoformat()
+
+    # 再次拉取时带 If-None-Match，上游返回 304
+    [result] = ingest(root, base_url)
+    assert result['status'] == 'not_modified'
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""区域间延迟矩阵：best_pairs 的 limit 参数"""
+
+import pytest
+
+from latency_matrix import LatencyMatrix
+
+
+@pytest.fixture
+def matrix(make_node):
+    nodes = [
+        make_node('us-east-1', 'aws', location={'latitude': 38.9, 'longitude': -77.4}),
+        make_node('eastus', 'azure', location={'latitude': 37.4, 'longitude': -79.2}),
+        make_node('us-east4', 'google_cloud', location={'latitude': 39.0, 'longitude': -77.5}),
+        make_node('eu-west-1', 'aws', location={'latitude': 53.3, 'longitude': -6.3}),
+    ]
+    return LatencyMatrix.build(nodes, cache_dir=None)
+
+
+def test_best_pairs_limit(matrix):
+    pairs = matrix.best_pairs(10, limit=2)
+    assert len(pairs) == 2
+    assert pairs[0]['rtt_ms'] <= pairs[1]['rtt_ms']
+    assert len(matrix.best_pairs(10, limit=20)) == 3
+
+
+def test_best_pairs_zero_limit_returns_empty(matrix):
+    assert matrix.best_pairs(10, limit=0) == []
+
+
+def test_best_pairs_negative_limit_rejected(matrix):
+    with pytest.raises(ValueError):
+        matrix.best_pairs(10, limit=-1)
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""节点查询索引：缺失启用日期的节点参与排序"""
+
+from node_index import NodeIndex
+
+
+def test_missing_launch_date_sorts_last(make_node):
+    nodes = [make_node('undated', launch_date=None), make_node('recent', launch_date='2022-05-01'),
+             make_node('early', launch_date='2015-03-01')]
+    assert nodes[0]['launch_date'] is None
+    index = NodeIndex(nodes)
+
+    result = index.query(sort='launch_date')
+    assert [node['node_id'] for node in result['nodes']] == ['early', 'recent', 'undated']
+    result = index.query(search='undated', sort='launch_date', order='desc')
+    assert [node['node_id'] for node in result['nodes']] == ['undated']
+
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""列式节点存储：字典编码上限与缺失网络指标的还原"""
+
+import pytest
+
+from node_store import NodeStore, compile_store, encode_nodes
+
+
+def test_dictionary_overflow_raises_value_error(make_node):
+    # status 为 uint8 字典编码，最多 256 种取值；模式只允许少数几种状态，这里在规范化之后改写
+    nodes = [dict(make_node(f'n{i}'), status=f's{i}') for i in range(257)]
+    encode_nodes(nodes[:256])
+    with pytest.raises(ValueError, match='status'):
+        encode_nodes(nodes)
+
+
+def test_missing_network_values_round_trip_as_none(make_node):
+    nodes = [make_node('n0'), make_node('n1', network_info={'latency': 12.5, 'uptime': 99.5})]
+    store = NodeStore(memoryview(compile_store(nodes)))
+
+    assert store.node(0)['network_info'] == {'latency': None, 'uptime': None}
+    assert store.node(1)['network_info'] == {'latency': 12.5, 'uptime': 99.5}
+    restored = store.node(0)
+    for field in ('node_id', 'name', 'provider', 'status', 'launch_date', 'launch_year', 'service_types'):
+        assert restored[field] == nodes[0][field], field
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""空间索引：半径查询的 limit 参数"""
+
+import pytest
+
+from spatial_index import SpatialIndex
+
+
+@pytest.fixture
+def index(make_node):
+    return SpatialIndex([make_node(node_id, location={'latitude': 0.0, 'longitude': lon})
+                         for node_id, lon in (('a', 0.0), ('b', 1.0), ('c', 2.0))])
+
+
+def test_within_batch_limit_keeps_nearest(index):
+    results = index.within_batch([(0.0, 0.0), (0.0, 2.0)], 500, limit=2)
+    assert [[node['node_id'] for node, _ in matches] for matches in results] == [['a', 'b'], ['c', 'b']]
+    assert index.within_batch([(0.0, 0.0)], 500, limit=0) == [[]]
+
+
+@pytest.mark.parametrize('limit', [-1, 1.5, '2', True])
+def test_within_batch_rejects_invalid_limit(index, limit):
+    with pytest.raises(ValueError, match='limit'):
+        index.within_batch([(0.0, 0.0)], 500, limit=limit)
+    with pytest.raises(ValueError, match='limit'):
+        index.within(0.0, 0.0, 500, limit=limit)